@@ -1,42 +1,222 @@
-from fastapi import APIRouter, HTTPException
-from app.models.email import EmailRequest, EmailResponse, EmailStatusResponse, EmailStatus
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from app.models.email import (
+    DeadLetter, DeadLettersPage, EmailRequest, EmailResponse, EmailStatusResponse, EmailStatus, MailMergeJob,
+    MailMergeRowsPage, Priority
+)
 from app.services.email import email_service
+from app.core.executor import ExecutorQueueFullError
+from app.core.config import settings
+from app.services.queue import email_queue
+from app.services.idempotency import idempotency_cache, idempotency_key
+from app.services.mail_merge import (
+    DEFAULT_TEMPLATE, MailMergeError, UnsupportedUploadError, UploadTooLargeError, mail_merge_service
+)
+from app.services.tracking_store import from_epoch
+from app.utils.template import get_render_stats
 from datetime import datetime
+from functools import partial
+from typing import List, Optional
 
 router = APIRouter()
 
 @router.post("/send", response_model=EmailResponse)
-async def send_email(email_request: EmailRequest):
+async def send_email(
+    email_request: EmailRequest,
+    response: Response,
+    queued: Optional[bool] = None,
+    idempotency_key_header: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Send a task notification email.
+
+    With ``queued=true`` (or EMAIL_QUEUE_ENABLED) the email is accepted for
+    background delivery and a 202 with its tracking ID is returned immediately.
+
+    Retries with the same ``Idempotency-Key`` header (or, without one, the same
+    task_id, recipient and subject) get the original response back instead of
+    sending again, with an ``Idempotent-Replayed: true`` header.
     """
     try:
-        response = await email_service.send_task_email(email_request)
-        return response
+        use_queue = queued if queued is not None else settings.EMAIL_QUEUE_ENABLED
+        send = partial(
+            email_service.enqueue_task_email if use_queue else email_service.send_task_email,
+            email_request
+        )
+        result, replayed = await idempotency_cache.run(
+            idempotency_key(email_request, idempotency_key_header), send
+        )
+        if result.status == EmailStatus.PENDING:
+            response.status_code = 202
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
+    except ExecutorQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Email service is busy: {str(e)}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to send email: {str(e)}"
         )
 
+@router.post("/send-batch", response_model=List[EmailResponse])
+async def send_email_batch(email_requests: List[EmailRequest]):
+    """
+    Send many task notification emails using Gmail batch requests.
+    Returns one response per request, in the same order.
+    """
+    try:
+        return await email_service.send_batch_emails(email_requests)
+    except ExecutorQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Email service is busy: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to send email batch: {str(e)}"
+        )
+
+@router.post("/merge", response_model=MailMergeJob, status_code=202)
+async def create_mail_merge(
+    request: Request,
+    subject: str,
+    template: str = DEFAULT_TEMPLATE,
+    priority: Priority = Priority.MEDIUM
+):
+    """
+    Send one template to every recipient of a streamed NDJSON or CSV upload.
+
+    Each row needs a ``to`` address; its other fields (CSV columns) become
+    template variables, and ``subject`` may use them too, e.g. ``{{ task_title }}``.
+    Returns a job ID right away; poll ``/merge/{job_id}`` for progress and
+    ``/merge/{job_id}/rows`` for per-row results.
+    """
+    try:
+        return await mail_merge_service.create_job(
+            request.stream(), request.headers.get("content-type", ""), subject, template, priority
+        )
+    except UnsupportedUploadError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MailMergeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/merge/{job_id}", response_model=MailMergeJob)
+async def get_mail_merge(job_id: str):
+    """
+    Get the state and counters of a mail-merge job.
+    """
+    job = mail_merge_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Mail-merge job {job_id} not found")
+    return job
+
+@router.get("/merge/{job_id}/rows", response_model=MailMergeRowsPage)
+async def get_mail_merge_rows(job_id: str, after: int = 0, limit: int = Query(100, ge=1, le=1000)):
+    """
+    Page through a job's row results in the order they completed.
+    """
+    if mail_merge_service.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Mail-merge job {job_id} not found")
+    rows = mail_merge_service.get_rows(job_id, after, limit)
+    return MailMergeRowsPage(
+        job_id=job_id,
+        rows=[row for _, row in rows],
+        next_after=rows[-1][0] if rows else after
+    )
+
+@router.get("/dead-letters", response_model=DeadLettersPage)
+async def list_dead_letters(after: int = 0, limit: int = Query(100, ge=1, le=1000)):
+    """
+    Page through emails that failed for good, oldest first.
+    """
+    items = email_service.list_dead_letters(after, limit)
+    return DeadLettersPage(
+        dead_letters=[
+            DeadLetter(
+                id=item.id,
+                tracking_id=item.tracking_id,
+                task_id=item.email_request.task_id,
+                to=item.email_request.to,
+                subject=item.email_request.subject,
+                priority=item.email_request.priority,
+                attempts=item.attempts,
+                error=item.last_error,
+                failed_at=from_epoch(item.enqueued_at)
+            )
+            for item in items
+        ],
+        next_after=items[-1].id if items else after
+    )
+
+@router.post("/dead-letters/replay", response_model=List[EmailResponse], status_code=202)
+async def replay_all_dead_letters():
+    """
+    Queue every dead-lettered email for a fresh round of delivery attempts.
+    """
+    return await email_service.replay_dead_letters()
+
+@router.post("/dead-letters/{item_id}/replay", response_model=EmailResponse, status_code=202)
+async def replay_dead_letter(item_id: int):
+    """
+    Queue one dead-lettered email for a fresh round of delivery attempts, keeping its tracking ID.
+    """
+    replayed = await email_service.replay_dead_letters(item_id)
+    if not replayed:
+        raise HTTPException(status_code=404, detail=f"Dead letter {item_id} not found")
+    return replayed[0]
+
+@router.get("/queue/stats")
+async def get_queue_stats():
+    """
+    Get send queue depth, wait time and per-priority latency.
+    """
+    return email_queue.stats()
+
+@router.get("/templates/stats")
+async def get_template_stats():
+    """
+    Get render count and timings per template.
+    """
+    return get_render_stats()
+
+def _optional_datetime(seconds: Optional[float]) -> Optional[datetime]:
+    return from_epoch(seconds) if seconds is not None else None
+
 @router.get("/status/{message_id}", response_model=EmailStatusResponse)
 async def get_email_status(message_id: str):
     """
-    Get the status of a sent email.
+    Get the status of a sent email by Gmail message ID (or tracking ID).
+
+    Emails that were never sent report the time of their last event as ``sent_at``.
     """
     try:
-        status = await email_service.get_email_status(message_id)
-        if status:
-            return EmailStatusResponse(
-                status=status,
-                sent_at=datetime.utcnow(),  # In a real app, this would come from a database
-                delivered_at=datetime.utcnow() if status == EmailStatus.DELIVERED else None
-            )
-        else:
+        summary = await email_service.get_email_status(message_id)
+        if summary is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Email with message_id {message_id} not found"
             )
+        return EmailStatusResponse(
+            status=summary.status,
+            sent_at=from_epoch(summary.sent_at if summary.sent_at is not None else summary.last_event_at),
+            delivered_at=_optional_datetime(summary.delivered_at),
+            error=summary.error,
+            tracking_id=summary.tracking_id,
+            message_id=summary.message_id,
+            opened_at=_optional_datetime(summary.opened_at),
+            clicked_at=_optional_datetime(summary.clicked_at),
+            last_event_at=_optional_datetime(summary.last_event_at),
+            open_count=summary.open_count,
+            click_count=summary.click_count
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1,72 +1,83 @@
 from fastapi import APIRouter, Request, Response
 from fastapi.responses import RedirectResponse
-from datetime import datetime
 from app.services.tracking import tracking_service
-from app.models.email import EmailEvent, EmailStatus, EmailAnalytics
+from app.services.ingest import tracking_ingestor
+from app.models.email import EmailStatus, EmailAnalytics
+from app.core.logging_config import TRACKING_EVENTS_LOGGER
+from app.core.metrics import tracking_requests_total
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
+# Sampled: one line per LOG_TRACKING_SAMPLE_RATE events
+events_logger = logging.getLogger(TRACKING_EVENTS_LOGGER)
+_pixel_requests = tracking_requests_total.labels("pixel")
+_redirect_requests = tracking_requests_total.labels("redirect")
+_analytics_requests = tracking_requests_total.labels("analytics")
+_events_requests = tracking_requests_total.labels("events")
+
+# 1x1 transparent GIF
+PIXEL_GIF = b"\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00\x21\xf9\x04\x01\x00\x00\x00\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02\x44\x01\x00\x3b"
+PIXEL_METADATA = {"source": "pixel"}
+# Built once and reused: the body and headers never change. Caching is
+# disabled so every open reaches us instead of a proxy or browser cache.
+PIXEL_RESPONSE = Response(
+    content=PIXEL_GIF,
+    media_type="image/gif",
+    headers={
+        "Cache-Control": "no-store, no-cache, must-revalidate, private, max-age=0",
+        "Pragma": "no-cache",
+        "Expires": "Thu, 01 Jan 1970 00:00:00 GMT",
+    }
+)
 
 @router.get("/track/{tracking_id}/pixel")
 async def track_open(tracking_id: str, request: Request):
     """Track email opens via a 1x1 transparent pixel."""
-    try:
-        await tracking_service.add_event(
-            tracking_id,
-            EmailEvent(
-                event_type=EmailStatus.OPENED,
-                timestamp=datetime.utcnow(),
-                user_agent=request.headers.get("user-agent"),
-                ip_address=request.client.host,
-                metadata={"source": "pixel"}
-            )
-        )
-        logger.info(f"Open event recorded for email {tracking_id}")
-    except Exception as e:
-        logger.error(f"Error tracking email open: {e}")
-
-    # Return a 1x1 transparent GIF
-    return Response(
-        content=b"\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00\x21\xf9\x04\x01\x00\x00\x00\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02\x44\x01\x00\x3b",
-        media_type="image/gif"
+    _pixel_requests.inc()
+    accepted = tracking_ingestor.push(
+        tracking_id,
+        EmailStatus.OPENED,
+        request.headers.get("user-agent"),
+        request.client.host if request.client else None,
+        PIXEL_METADATA
     )
+    events_logger.info("Open for %s (accepted=%s)", tracking_id, accepted)
+    return PIXEL_RESPONSE
 
 @router.get("/track/{tracking_id}/redirect")
 async def track_click(tracking_id: str, url: str, request: Request):
     """Track email link clicks and redirect to the original URL."""
-    try:
-        await tracking_service.add_event(
-            tracking_id,
-            EmailEvent(
-                event_type=EmailStatus.CLICKED,
-                timestamp=datetime.utcnow(),
-                user_agent=request.headers.get("user-agent"),
-                ip_address=request.client.host,
-                metadata={"clicked_url": url}
-            )
-        )
-        logger.info(f"Click event recorded for email {tracking_id}")
-    except Exception as e:
-        logger.error(f"Error tracking email click: {e}")
-
+    _redirect_requests.inc()
+    accepted = tracking_ingestor.push(
+        tracking_id,
+        EmailStatus.CLICKED,
+        request.headers.get("user-agent"),
+        request.client.host if request.client else None,
+        {"clicked_url": url}
+    )
+    events_logger.info("Click for %s (accepted=%s)", tracking_id, accepted)
     return RedirectResponse(url=url)
 
 @router.get("/analytics")
 async def get_analytics(days: int = 30) -> EmailAnalytics:
     """Get email analytics for the specified time range."""
+    _analytics_requests.inc()
     try:
+        tracking_ingestor.flush()
         return await tracking_service.get_analytics({"days": days})
     except Exception as e:
-        logger.error(f"Error getting analytics: {e}")
+        logger.error("Error getting analytics: %s", e)
         raise
 
 @router.get("/events/{tracking_id}")
 async def get_email_events(tracking_id: str):
     """Get all events for a specific email."""
+    _events_requests.inc()
     try:
-        events = await tracking_service.get_email_events(tracking_id)
-        return {"tracking_id": tracking_id, "events": events}
+        tracking_ingestor.flush()  # Include opens/clicks still in the write-behind buffer
+        records = await tracking_service.get_event_records(tracking_id)
+        return {"tracking_id": tracking_id, "events": [record.to_event() for record in records]}
     except Exception as e:
-        logger.error(f"Error getting email events: {e}")
-        raise 
\ No newline at end of file
+        logger.error("Error getting email events: %s", e)
+        raise
@@ -0,0 +1,96 @@
+import time
+from typing import Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream the circuit breaker considers down."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Fails calls fast while an upstream keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    every call is rejected with ``CircuitOpenError`` for ``reset_timeout``
+    seconds. Then one trial call is let through (half-open): success closes
+    the circuit, failure opens it again. A trial that never reports back
+    stops blocking others after another ``reset_timeout``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a trial call through; 0 when it would now."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def before_call(self) -> None:
+        """Raise ``CircuitOpenError`` if the call should not be made."""
+        state = self.state
+        if state == CLOSED:
+            return
+        now = self._clock()
+        if state == HALF_OPEN and (self._trial_started is None
+                                   or now - self._trial_started >= self.reset_timeout):
+            self._trial_started = now
+            return
+        self.rejected_count += 1
+        raise CircuitOpenError(self.name, self.retry_after() or self.reset_timeout)
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("%s circuit closed", self.name)
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._trial_started is not None or (
+            self._opened_at is None and self._failures >= self.failure_threshold
+        ):
+            if self._opened_at is None:
+                self.opened_count += 1
+                logger.warning("%s circuit opened after %s consecutive failures", self.name, self._failures)
+            self._opened_at = self._clock()
+            self._trial_started = None
+
+    def metrics(self):
+        """Breaker state for /metrics."""
+        labels = {"circuit": self.name}
+        yield "circuit_breaker_open", "gauge", "1 while the circuit rejects calls, 0.5 while half-open.", [
+            (labels, {CLOSED: 0, HALF_OPEN: 0.5, OPEN: 1}[self.state])
+        ]
+        yield "circuit_breaker_opened_total", "counter", "Times the circuit opened.", [
+            (labels, self.opened_count)
+        ]
+        yield "circuit_breaker_rejected_total", "counter", "Calls rejected while the circuit was open.", [
+            (labels, self.rejected_count)
+        ]
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import json
 
@@ -8,6 +8,11 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     PORT: int = int(os.environ.get("PORT", "8001"))
     
+    # Logging settings
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json"
+    LOG_TRACKING_SAMPLE_RATE: float = 0.01  # Share of pixel/click events logged
+    
     # CORS settings
     CORS_ORIGINS: str = '["*"]'
     
@@ -20,6 +25,103 @@ class Settings(BaseSettings):
     EMAIL_SENDER: str
     EMAIL_SENDER_NAME: str = "Task Manager"
     EMAIL_SERVICE_URL: str = "http://localhost:8001"
+    EMAIL_TEXT_ALTERNATIVE: bool = True  # Add a text/plain part generated from the HTML
+    
+    # Transport settings
+    EMAIL_TRANSPORT: str = "gmail"  # "gmail" (Gmail API) or "smtp"
+    
+    # SMTP transport settings
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 587
+    SMTP_USERNAME: str = ""  # No AUTH when empty
+    SMTP_PASSWORD: str = ""
+    SMTP_USE_TLS: bool = True  # STARTTLS after connecting
+    SMTP_USE_SSL: bool = False  # Implicit TLS, usually port 465
+    SMTP_POOL_SIZE: int = 4  # Persistent connections, one per send worker
+    SMTP_SEND_QUEUE_SIZE: int = 64  # Max sends waiting for a connection
+    SMTP_TIMEOUT: float = 30.0
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100  # Reconnect after this many, as many relays cap sessions
+    SMTP_IDLE_TIMEOUT: float = 60.0  # Idle connections older than this are closed, not reused
+    
+    # Gmail send pool settings
+    GMAIL_SEND_WORKERS: int = 8  # Max concurrent Gmail API calls
+    GMAIL_SEND_QUEUE_SIZE: int = 64  # Max sends waiting for a worker
+    GMAIL_HTTP_TIMEOUT: float = 30.0
+    GMAIL_API_ENDPOINT: str = "https://gmail.googleapis.com/"
+    GMAIL_BATCH_SIZE: int = 100  # Messages per batch request, capped at Gmail's limit
+    
+    # Gmail HTTP transport settings
+    GMAIL_TRANSPORT: str = "googleapiclient"  # "googleapiclient" or "httpx"
+    GMAIL_HTTP_MAX_CONNECTIONS: int = 32  # httpx pool size
+    GMAIL_HTTP_MAX_KEEPALIVE: int = 16  # Idle connections kept open
+    GMAIL_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    GMAIL_HTTP2: bool = False  # Requires the h2 package
+    
+    # Gmail quota settings (messages.send costs 100 units)
+    GMAIL_QUOTA_UNITS_PER_SECOND: float = 250.0  # Gmail's per-user limit
+    GMAIL_QUOTA_BURST_UNITS: float = 1000.0
+    GMAIL_MIN_QUOTA_UNITS_PER_SECOND: float = 25.0
+    GMAIL_RATE_LIMIT_RETRIES: int = 5
+    
+    # Gmail OAuth token settings
+    GMAIL_TOKEN_CACHE_PATH: str = "credentials/token.json"  # Access token shared by all workers
+    GMAIL_TOKEN_REFRESH_MARGIN: float = 600.0  # Refresh this many seconds before expiry
+    
+    # Idempotency settings
+    IDEMPOTENCY_TTL_SECONDS: float = 3600.0  # How long a send's response is replayed
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_DERIVE_KEY: bool = True  # Without an Idempotency-Key header, dedupe on task_id + to + subject
+    
+    # Send queue settings
+    EMAIL_QUEUE_ENABLED: bool = False  # Queue every /send by default and return 202
+    EMAIL_QUEUE_DB_PATH: str = "data/email_queue.db"
+    EMAIL_QUEUE_WORKERS: int = 4
+    EMAIL_QUEUE_AGING_SECONDS: float = 30.0  # Waiting this long counts as one priority level
+    EMAIL_QUEUE_LEASE_SECONDS: float = 300.0  # A claimed email is requeued once its worker held it this long
+    
+    # Delivery retry settings
+    EMAIL_RETRY_MAX_ATTEMPTS: int = 5  # Attempts before a failing email is dead-lettered; 1 disables retries
+    EMAIL_RETRY_BASE_DELAY: float = 2.0  # Backoff before the first retry, doubling per attempt, with jitter
+    EMAIL_RETRY_MAX_DELAY: float = 300.0
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive transient send failures that open the circuit
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 30.0  # Sends fail fast this long before one trial send
+    
+    # Health check settings
+    HEALTH_CHECK_INTERVAL: float = 15.0  # Seconds between background readiness checks; probes serve the last result
+    HEALTH_CHECK_TIMEOUT: float = 5.0  # A check taking longer than this counts as failed
+    
+    # Digest settings
+    EMAIL_DIGEST_ENABLED: bool = False  # Merge direct sends to the same recipient into digest emails
+    EMAIL_DIGEST_WINDOW_SECONDS: float = 60.0  # Send once no new notification arrived for this long
+    EMAIL_DIGEST_MAX_DELAY_SECONDS: float = 300.0  # Never hold a notification longer than this
+    EMAIL_DIGEST_MAX_ITEMS: int = 50  # Send as soon as a digest holds this many notifications
+    
+    # Tracking store settings
+    TRACKING_STORE: str = "sqlite"  # "sqlite" or "memory"
+    TRACKING_DB_PATH: str = "data/tracking.db"
+    TRACKING_STORE_BATCH_SIZE: int = 500  # Buffered events per insert transaction
+    TRACKING_STORE_FLUSH_INTERVAL: float = 0.5  # Max seconds an event stays buffered
+    TRACKING_SHARED_STORE: bool = False  # Keep analytics in the SQLite store for uvicorn --workers N
+    TRACKING_SHARED_FLUSH_INTERVAL: float = 0.1  # Shorter, so other workers see events sooner
+    TRACKING_RETENTION_DAYS: float = 90.0  # Emails with no events for this long are evicted; 0 keeps all
+    TRACKING_MAINTENANCE_INTERVAL: float = 600.0  # Seconds between compaction/eviction passes; 0 disables
+    
+    # Mail-merge settings
+    MAIL_MERGE_DB_PATH: str = "data/mail_merge.db"
+    MAIL_MERGE_MAX_UPLOAD_BYTES: int = 104857600  # 100 MB; larger uploads get a 413
+    MAIL_MERGE_SPOOL_MEMORY: int = 1048576  # Upload bytes kept in memory before spooling to disk
+    MAIL_MERGE_CONCURRENCY: int = 8  # Rows of one job rendered and sent at once
+    MAIL_MERGE_QUEUE_SIZE: int = 100  # Parsed rows waiting for a sender; parsing pauses when full
+    MAIL_MERGE_RESULT_BATCH: int = 100  # Row results per SQLite write
+    
+    # Pixel/redirect ingestion settings
+    TRACKING_INGEST_BUFFER_SIZE: int = 100000  # Events beyond this are dropped
+    TRACKING_INGEST_BATCH_SIZE: int = 1000
+    TRACKING_INGEST_FLUSH_INTERVAL: float = 0.2
+    
+    # Template settings
+    TEMPLATE_MODE: Optional[str] = None  # "production" or "development"; follows ENVIRONMENT when unset
+    TEMPLATE_CACHE_DIR: str = "data/template_cache"
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -27,6 +129,10 @@ class Settings(BaseSettings):
         env_file_encoding='utf-8'
     )
     
+    @property
+    def template_production(self) -> bool:
+        return (self.TEMPLATE_MODE or self.ENVIRONMENT) == "production"
+
     @property
     def cors_origins_list(self) -> List[str]:
         try:
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ExecutorQueueFullError(Exception):
+    """Raised when a bounded executor cannot accept more work."""
+
+class BoundedExecutor:
+    """Thread pool with a hard cap on running and queued work items.
+
+    At most ``max_workers`` calls run concurrently and at most ``max_queue``
+    more wait for a free thread. Anything beyond that is rejected right away
+    with ``ExecutorQueueFullError`` instead of piling up behind a slow upstream.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, thread_name_prefix: str = "worker"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._thread_name_prefix = thread_name_prefix
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of calls currently running or waiting for a thread."""
+        return self._pending
+
+    @property
+    def queued(self) -> int:
+        """Number of calls waiting for a free thread."""
+        return max(0, self._pending - self.max_workers)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self._thread_name_prefix
+            )
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)`` on the pool and await its result."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise ExecutorQueueFullError(
+                    f"{self._thread_name_prefix} queue is full "
+                    f"({self.max_workers} running, {self.max_queue} queued)"
+                )
+            self._pending += 1
+            executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker threads."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -1,134 +1,363 @@
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import base64
-from typing import Optional
-import os
-import pickle
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+import asyncio
+import functools
+import json
+from typing import List, Optional, Tuple
 import logging
-import traceback
+import threading
+import time
+import httplib2
+import httpx
 
 from app.core.config import settings
+from app.core.executor import BoundedExecutor, ExecutorQueueFullError
+from app.core.gmail_http import GmailHttpTransport
+from app.core.metrics import register_collector, send_stage_seconds
+from app.core.mime import MessageBuilder
+from app.core.rate_limit import GMAIL_SEND_QUOTA_UNITS, QuotaRateLimiter, gmail_rate_limiter
+from app.core.token_manager import TokenManager, token_manager
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-SCOPES = ['https://www.googleapis.com/auth/gmail.send']
-CREDENTIALS_DIR = 'credentials'
-TOKEN_PATH = os.path.join(CREDENTIALS_DIR, 'token.pickle')
+# Gmail rejects batch requests with more than 100 calls
+GMAIL_MAX_BATCH_SIZE = 100
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+_create_message_stage = send_stage_seconds.labels("create_message")
+_gmail_api_stage = send_stage_seconds.labels("gmail_api")
+
+def _rate_limit_retry_after(error: Exception) -> Tuple[bool, Optional[float]]:
+    """Check whether a Gmail error is a rate-limit response.
+
+    Returns ``(throttled, retry_after_seconds)``.
+    """
+    if not isinstance(error, HttpError):
+        return False, None
+    status = error.resp.status
+    if status == 403:
+        try:
+            errors = json.loads(error.content).get('error', {}).get('errors', [])
+        except (ValueError, AttributeError):
+            errors = []
+        if not any(e.get('reason') in RATE_LIMIT_REASONS for e in errors):
+            return False, None
+    elif status != 429:
+        return False, None
+    try:
+        retry_after = float(error.resp.get('retry-after'))
+    except (TypeError, ValueError):
+        retry_after = None
+    return True, retry_after
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed Gmail call may succeed later: throttling, server errors and network failures."""
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500 or _rate_limit_retry_after(error)[0]
+    return isinstance(error, (OSError, httplib2.HttpLib2Error, httpx.TransportError))
+
+@functools.lru_cache(maxsize=1)
+def gmail_discovery_document() -> dict:
+    """The Gmail v1 discovery document bundled with googleapiclient, parsed once per process."""
+    document = get_static_doc('gmail', 'v1')
+    if document is None:
+        raise RuntimeError("googleapiclient does not bundle the gmail v1 discovery document")
+    return json.loads(document)
 
 class GmailService:
-    def __init__(self):
-        self.service = None
+    """Sends email through the Gmail API.
+
+    Construction is cheap and does no I/O: credentials come from the token
+    manager on first use from a send worker thread, so importing the app
+    never blocks on disk or network.
+    """
+
+    def __init__(self, rate_limiter: QuotaRateLimiter = gmail_rate_limiter,
+                 token_manager: TokenManager = token_manager):
         self.credentials = None
-        self._initialize_service()
+        self.rate_limiter = rate_limiter
+        self.token_manager = token_manager
+        self._managed_credentials = False
+        self.message_builder = MessageBuilder(
+            settings.EMAIL_SENDER_NAME,
+            settings.EMAIL_SENDER,
+            text_alternative=settings.EMAIL_TEXT_ALTERNATIVE
+        )
+        # httplib2 connections are not thread-safe, so every send worker
+        # builds its own authorized client on first use.
+        self._local = threading.local()
+        self.executor = BoundedExecutor(
+            max_workers=settings.GMAIL_SEND_WORKERS,
+            max_queue=settings.GMAIL_SEND_QUEUE_SIZE,
+            thread_name_prefix="gmail-send"
+        )
+        # Single messages go through the pooled httpx transport when selected;
+        # batches always use googleapiclient's batch endpoint.
+        self.http_transport: Optional[GmailHttpTransport] = None
+        if settings.GMAIL_TRANSPORT == "httpx":
+            self.http_transport = GmailHttpTransport(
+                settings.GMAIL_API_ENDPOINT,
+                timeout=settings.GMAIL_HTTP_TIMEOUT,
+                max_connections=settings.GMAIL_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GMAIL_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.GMAIL_HTTP_KEEPALIVE_EXPIRY,
+                max_queue=settings.GMAIL_SEND_QUEUE_SIZE,
+                http2=settings.GMAIL_HTTP2
+            )
+        elif settings.GMAIL_TRANSPORT != "googleapiclient":
+            raise ValueError(f"Unknown GMAIL_TRANSPORT: {settings.GMAIL_TRANSPORT}")
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _ensure_initialized(self):
+        """Load credentials the first time a client is needed."""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            if self.credentials is None:
+                self._initialize_service()
+            self._initialized = True
 
     def _initialize_service(self):
-        """Initialize the Gmail API service."""
-        try:
-            logger.debug("Initializing Gmail service")
-            creds = None
-            
-            # Load credentials from token pickle file if it exists
-            if os.path.exists(TOKEN_PATH):
-                logger.debug("Found token.pickle file, loading credentials")
-                try:
-                    with open(TOKEN_PATH, 'rb') as token:
-                        creds = pickle.load(token)
-                    logger.debug("Successfully loaded credentials from token.pickle")
-                except Exception as e:
-                    logger.error(f"Error loading token.pickle: {e}")
-                    logger.error(traceback.format_exc())
-
-            # If credentials are not valid, refresh them or create new ones
-            if not creds or not creds.valid:
-                logger.debug("Credentials not valid, attempting to refresh or create new ones")
-                if creds and creds.expired and creds.refresh_token:
-                    logger.debug("Refreshing expired credentials")
-                    try:
-                        creds.refresh(Request())
-                        logger.debug("Successfully refreshed credentials")
-                    except Exception as e:
-                        logger.error(f"Error refreshing credentials: {e}")
-                        logger.error(traceback.format_exc())
-                else:
-                    logger.debug("Creating new credentials from refresh token")
-                    try:
-                        creds = Credentials(
-                            None,
-                            refresh_token=settings.GOOGLE_REFRESH_TOKEN,
-                            token_uri="https://oauth2.googleapis.com/token",
-                            client_id=settings.GOOGLE_CLIENT_ID,
-                            client_secret=settings.GOOGLE_CLIENT_SECRET,
-                        )
-                        logger.debug("Successfully created new credentials")
-                    except Exception as e:
-                        logger.error(f"Error creating new credentials: {e}")
-                        logger.error(traceback.format_exc())
-
-                # Save the credentials for future use
-                try:
-                    with open(TOKEN_PATH, 'wb') as token:
-                        pickle.dump(creds, token)
-                    logger.debug("Successfully saved credentials to token.pickle")
-                except Exception as e:
-                    logger.error(f"Error saving token.pickle: {e}")
-                    logger.error(traceback.format_exc())
+        """Use the token manager's shared credentials."""
+        logger.debug("Initializing Gmail service")
+        self.credentials = self.token_manager.credentials
+        self._managed_credentials = True
 
-            try:
-                self.service = build('gmail', 'v1', credentials=creds)
-                logger.debug("Successfully built Gmail service")
-            except Exception as e:
-                logger.error(f"Error building Gmail service: {e}")
-                logger.error(traceback.format_exc())
-                raise
+    def _ensure_fresh_token(self):
+        """Refresh the access token if it is about to expire (normally done in the background)."""
+        if self._managed_credentials:
+            self.token_manager.ensure_fresh()
 
-        except Exception as e:
-            logger.error(f"Error in _initialize_service: {e}")
-            logger.error(traceback.format_exc())
-            raise
+    async def _auth_headers(self) -> dict:
+        """Authorization headers for the httpx transport, refreshing off the event loop if needed."""
+        self._ensure_initialized()
+        if self._managed_credentials and self.token_manager.needs_refresh():
+            await asyncio.to_thread(self.token_manager.ensure_fresh)
+        headers = {}
+        self.credentials.apply(headers)
+        return headers
+
+    def _thread_service(self):
+        """Get the Gmail API client owned by the current worker thread."""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            self._ensure_initialized()
+            logger.debug("Building Gmail client for thread %s", threading.current_thread().name)
+            http = AuthorizedHttp(
+                self.credentials,
+                http=httplib2.Http(timeout=settings.GMAIL_HTTP_TIMEOUT)
+            )
+            service = build_from_document(
+                gmail_discovery_document(),
+                http=http,
+                client_options={'api_endpoint': settings.GMAIL_API_ENDPOINT}
+            )
+            self._local.service = service
+        return service
+
+    def _send_blocking(self, message: dict) -> dict:
+        """Execute the send request. Runs on a send worker thread."""
+        service = self._thread_service()
+        self._ensure_fresh_token()
+        return service.users().messages().send(
+            userId='me',
+            body=message
+        ).execute()
+
+    def _send_batch_blocking(self, messages: List[dict]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """Send up to GMAIL_MAX_BATCH_SIZE messages in one batch HTTP request.
+
+        Returns a ``(message_id, error)`` pair per message, in input order.
+        Runs on a send worker thread.
+        """
+        service = self._thread_service()
+        self._ensure_fresh_token()
+        results: List[Tuple[Optional[str], Optional[Exception]]] = (
+            [(None, RuntimeError("No response received"))] * len(messages)
+        )
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                results[index] = (None, exception)
+            else:
+                results[index] = (response.get('id'), None)
+
+        # The discovery document's batch path ignores api_endpoint overrides,
+        # so build the batch URI ourselves.
+        batch = BatchHttpRequest(
+            callback=callback,
+            batch_uri=settings.GMAIL_API_ENDPOINT.rstrip('/') + '/batch/gmail/v1'
+        )
+        for index, message in enumerate(messages):
+            batch.add(
+                service.users().messages().send(userId='me', body=message),
+                request_id=str(index)
+            )
+        batch.execute()
+        return results
 
     def create_message(self, to: str, subject: str, html_content: str) -> dict:
         """Create a message for an email."""
         try:
-            logger.debug(f"Creating email message for recipient: {to}")
-            message = MIMEMultipart('alternative')
-            message['to'] = to
-            message['from'] = f"{settings.EMAIL_SENDER_NAME} <{settings.EMAIL_SENDER}>"
-            message['subject'] = subject
-
-            html_part = MIMEText(html_content, 'html')
-            message.attach(html_part)
-
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+            logger.debug("Creating email message for recipient: %s", to)
+            raw_message = self.message_builder.build_raw(to, subject, html_content)
             logger.debug("Successfully created email message")
             return {'raw': raw_message}
         except Exception as e:
-            logger.error(f"Error creating message: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error creating message: %s", e)
             raise
 
+    async def _send_once(self, message: dict) -> dict:
+        """Make one send call on the configured transport."""
+        if self.http_transport is not None:
+            return await self.http_transport.send(message, await self._auth_headers())
+        return await self.executor.run(self._send_blocking, message)
+
+    async def _send_with_retry(self, message: dict) -> dict:
+        """Send one message under the rate limiter, retrying throttled attempts."""
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(GMAIL_SEND_QUOTA_UNITS)
+            try:
+                sent_message = await self._send_once(message)
+            except HttpError as e:
+                throttled, retry_after = _rate_limit_retry_after(e)
+                if not throttled or attempt >= settings.GMAIL_RATE_LIMIT_RETRIES:
+                    raise
+                self.rate_limiter.on_throttle(retry_after)
+                attempt += 1
+                continue
+            self.rate_limiter.on_success()
+            return sent_message
+
+    async def send(self, to: str, subject: str, html_content: str) -> Optional[str]:
+        """Send an email message, raising if the Gmail API call fails."""
+        logger.debug("Creating message")
+        started = time.perf_counter()
+        message = self.create_message(to, subject, html_content)
+        created = time.perf_counter()
+        _create_message_stage.observe(created - started)
+        
+        logger.debug("Attempting to send message via Gmail API")
+        sent_message = await self._send_with_retry(message)
+        _gmail_api_stage.observe(time.perf_counter() - created)
+        
+        logger.info("Message sent successfully. Message ID: %s", sent_message.get('id'))
+        return sent_message.get('id')
+
     async def send_message(self, to: str, subject: str, html_content: str) -> Optional[str]:
-        """Send an email message."""
+        """Send an email message. Returns None if sending failed."""
         try:
-            logger.debug("Creating message")
-            message = self.create_message(to, subject, html_content)
-            
-            logger.debug("Attempting to send message via Gmail API")
-            sent_message = self.service.users().messages().send(
-                userId='me',
-                body=message
-            ).execute()
-            
-            logger.info(f"Message sent successfully. Message ID: {sent_message.get('id')}")
-            return sent_message.get('id')
+            return await self.send(to, subject, html_content)
+        except ExecutorQueueFullError:
+            logger.warning("Gmail send queue is full, rejecting message")
+            raise
         except Exception as e:
-            logger.error(f"Error sending message: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Error sending message: %s", e)
             return None
 
-gmail_service = GmailService() 
\ No newline at end of file
+    async def _send_chunk(self, messages: List[dict]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """Send one batch under the rate limiter, retrying throttled items."""
+        results: List[Tuple[Optional[str], Optional[Exception]]] = [(None, None)] * len(messages)
+        pending = list(range(len(messages)))
+        attempt = 0
+        while pending:
+            await self.rate_limiter.acquire(GMAIL_SEND_QUOTA_UNITS * len(pending))
+            try:
+                batch_results = await self.executor.run(
+                    self._send_batch_blocking, [messages[i] for i in pending]
+                )
+            except HttpError as e:
+                # The batch request as a whole was rejected
+                throttled, retry_after = _rate_limit_retry_after(e)
+                if not throttled or attempt >= settings.GMAIL_RATE_LIMIT_RETRIES:
+                    raise
+                self.rate_limiter.on_throttle(retry_after)
+                attempt += 1
+                continue
+
+            retry, retry_after, throttled_any = [], None, False
+            for index, (message_id, error) in zip(pending, batch_results):
+                if error is None:
+                    results[index] = (message_id, None)
+                    continue
+                throttled, item_retry_after = _rate_limit_retry_after(error)
+                if throttled and attempt < settings.GMAIL_RATE_LIMIT_RETRIES:
+                    throttled_any = True
+                    retry.append(index)
+                    if item_retry_after is not None:
+                        retry_after = max(retry_after or 0.0, item_retry_after)
+                else:
+                    results[index] = (None, error)
+            if throttled_any:
+                logger.debug("Retrying %s throttled messages from batch", len(retry))
+                self.rate_limiter.on_throttle(retry_after)
+            else:
+                self.rate_limiter.on_success()
+            pending = retry
+            attempt += 1
+        return results
+
+    async def send_batch(self, emails: List[Tuple[str, str, str]]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """Send many emails through Gmail batch requests.
+
+        Args:
+            emails: ``(to, subject, html_content)`` tuples
+
+        Returns:
+            A ``(message_id, error)`` pair per email, in input order
+        """
+        batch_size = max(1, min(settings.GMAIL_BATCH_SIZE, GMAIL_MAX_BATCH_SIZE))
+        results: List[Tuple[Optional[str], Optional[Exception]]] = []
+        for start in range(0, len(emails), batch_size):
+            chunk = emails[start:start + batch_size]
+            messages = [self.create_message(to, subject, html) for to, subject, html in chunk]
+            logger.debug("Sending batch of %s messages via Gmail API", len(messages))
+            try:
+                results.extend(await self._send_chunk(messages))
+            except ExecutorQueueFullError:
+                logger.warning("Gmail send queue is full, rejecting batch")
+                raise
+            except Exception as e:
+                logger.exception("Error sending batch: %s", e)
+                results.extend([(None, e)] * len(messages))
+        return results
+
+    async def aclose(self):
+        """Close the httpx transport's connection pool."""
+        if self.http_transport is not None:
+            await self.http_transport.aclose()
+
+    def shutdown(self):
+        """Stop the send worker pool."""
+        self.executor.shutdown(wait=True)
+
+    def metrics(self):
+        """Send pool and rate limiter state for /metrics."""
+        limiter = self.rate_limiter
+        yield "gmail_send_pool_pending", "gauge", "Gmail sends running or waiting for a worker.", [
+            ({}, self.executor.pending)
+        ]
+        if self.http_transport is not None:
+            yield "gmail_http_pending", "gauge", "Gmail sends in flight on the httpx transport.", [
+                ({}, self.http_transport.pending)
+            ]
+        yield "gmail_quota_rate_units", "gauge", "Current Gmail quota rate in units per second.", [
+            ({}, limiter.rate)
+        ]
+        yield "gmail_quota_available_units", "gauge", "Gmail quota units available right now.", [
+            ({}, limiter.stats()["available_units"])
+        ]
+        yield "gmail_throttled_total", "counter", "Gmail rate-limit responses.", [
+            ({}, limiter.throttle_count)
+        ]
+
+gmail_service = GmailService()
+register_collector(gmail_service.metrics) 
\ No newline at end of file
@@ -0,0 +1,74 @@
+from typing import Dict, Optional
+import logging
+
+import httpx
+import httplib2
+from googleapiclient.errors import HttpError
+
+from app.core.executor import ExecutorQueueFullError
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SEND_PATH = "gmail/v1/users/me/messages/send"
+
+class GmailHttpTransport:
+    """Calls the Gmail ``users.messages.send`` REST endpoint through a pooled ``httpx.AsyncClient``.
+
+    One client is shared by every send, so connections (and TLS sessions)
+    are kept alive and reused, and sends run on the event loop instead of a
+    worker thread. Error responses are raised as googleapiclient
+    ``HttpError`` so callers handle both transports the same way.
+    """
+
+    def __init__(self, endpoint: str, timeout: float, max_connections: int,
+                 max_keepalive_connections: int, keepalive_expiry: float,
+                 max_queue: int, http2: bool = False):
+        self.url = endpoint.rstrip("/") + "/" + SEND_PATH
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.max_pending = max_connections + max_queue
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("GMAIL_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.pending = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self._client
+
+    async def send(self, message: dict, headers: Dict[str, str]) -> dict:
+        """POST one message. ``headers`` carries the Authorization header.
+
+        Raises ExecutorQueueFullError when every connection is busy and
+        ``max_queue`` sends are already waiting for one.
+        """
+        if self.pending >= self.max_pending:
+            raise ExecutorQueueFullError(f"{self.pending} Gmail sends already in flight")
+        self.pending += 1
+        try:
+            response = await self._get_client().post(self.url, json=message, headers=headers)
+        finally:
+            self.pending -= 1
+        if response.status_code >= 400:
+            info = dict(response.headers)
+            info["status"] = response.status_code
+            raise HttpError(httplib2.Response(info), response.content, uri=self.url)
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,122 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+
+# Logger for per-request tracking events (pixel opens, clicks); sampled
+TRACKING_EVENTS_LOGGER = "app.tracking.events"
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any ``extra`` fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Formatted by StructuredQueueHandler before the record crossed the queue
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that keeps the traceback apart from the message.
+
+    The stock ``prepare`` formats the exception into ``message`` and drops
+    ``exc_info``. This one renders the traceback into ``exc_text`` instead,
+    which formatters on the listener side use as the structured field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class SamplingFilter(logging.Filter):
+    """Lets one record in every ``1 / rate`` through. Warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not self.every:
+            return False
+        with self._lock:
+            self._count += 1
+            return (self._count - 1) % self.every == 0
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging() -> None:
+    """Configure the root logger from settings.
+
+    Records are put on an in-memory queue by the calling thread and written
+    to stdout by a QueueListener thread, so request handlers never block on
+    log I/O. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    formatter: logging.Formatter
+    if settings.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    elif settings.LOG_FORMAT == "text":
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    else:
+        raise ValueError(f"Unknown LOG_FORMAT: {settings.LOG_FORMAT}")
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(StructuredQueueHandler(log_queue))
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    events_logger = logging.getLogger(TRACKING_EVENTS_LOGGER)
+    for log_filter in list(events_logger.filters):
+        if isinstance(log_filter, SamplingFilter):
+            events_logger.removeFilter(log_filter)
+    events_logger.addFilter(SamplingFilter(settings.LOG_TRACKING_SAMPLE_RATE))
+
+    _listener.start()
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
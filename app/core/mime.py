@@ -0,0 +1,124 @@
+import base64
+import binascii
+import re
+import uuid
+from email.header import Header
+from email.utils import formataddr, formatdate, make_msgid
+from html import unescape
+from typing import Optional, Tuple
+
+# RFC 5322 hard limit on line length, excluding the line break
+MAX_LINE_LENGTH = 998
+# Bytes that quoted-printable leaves as-is (printable ASCII except "=", plus space, tab and newline)
+_QP_SAFE = bytes(range(33, 61)) + bytes(range(62, 127)) + b" \t\r\n"
+_LONG_LINE = re.compile(rb"[^\n]{%d}" % (MAX_LINE_LENGTH + 1))
+_INVISIBLE = re.compile(r"<(head|style|script|title)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+_LINK = re.compile(r"<a\b[^>]*?href=[\"'](https?://[^\"']+)[\"'][^>]*>(.*?)</a\s*>", re.S | re.I)
+_BLOCK_TAG = re.compile(r"</?(p|div|br|h[1-6]|li|tr|table|ul|ol)\b[^>]*>", re.I)
+_TAG = re.compile(r"<[^>]+>")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*\n+")
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+
+def choose_transfer_encoding(body: bytes) -> str:
+    """Pick the Content-Transfer-Encoding that produces the fewest bytes.
+
+    Pure ASCII with sane line lengths goes out as-is (7bit). Otherwise
+    quoted-printable costs 3 bytes per unsafe byte plus soft line breaks,
+    and base64 costs 4/3 of everything; whichever is smaller wins.
+    """
+    if body.isascii() and b"\0" not in body and not _LONG_LINE.search(body):
+        return "7bit"
+    unsafe = len(body.translate(None, _QP_SAFE))
+    length = len(body)
+    qp_size = length + 2 * unsafe + 3 * (length // 75)
+    base64_size = 4 * ((length + 2) // 3) + (length // 57)
+    return "quoted-printable" if qp_size <= base64_size else "base64"
+
+def _encode_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "7bit":
+        return body
+    if encoding == "quoted-printable":
+        return binascii.b2a_qp(body, istext=True)
+    return base64.encodebytes(body)
+
+def _encode_header(value: str) -> str:
+    """Header value safe for the wire: no line breaks, RFC 2047 when not plain ASCII."""
+    value = value.replace("\r", " ").replace("\n", " ")
+    if value.isascii() and len(value) < 900:
+        return value
+    return Header(value, "utf-8").encode()
+
+def html_to_text(html: str) -> str:
+    """Plain-text rendering of an HTML email body.
+
+    Regex-based rather than a full HTML parse: our templates are simple and
+    this runs on every send.
+    """
+    text = _INVISIBLE.sub("", html)
+    text = _LINK.sub(_link_text, text)
+    text = _BLOCK_TAG.sub("\n", text)
+    text = unescape(_TAG.sub("", text))
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip() + "\n"
+
+def _link_text(match) -> str:
+    return f"{match.group(2)} ({match.group(1)})"
+
+class MessageBuilder:
+    """Assembles raw MIME messages for the Gmail API.
+
+    Writes the message bytes directly instead of building an ``email``
+    package object tree: the From/MIME-Version headers are formatted once,
+    each part gets the cheapest transfer encoding for its content, and the
+    whole message is joined once and base64url-encoded once.
+    """
+
+    def __init__(self, sender_name: str, sender_email: str, text_alternative: bool = True):
+        self.sender_email = sender_email
+        self.text_alternative = text_alternative
+        self._domain = sender_email.rsplit("@", 1)[-1]
+        self._static_headers = (
+            f"From: {formataddr((sender_name, sender_email))}\n"
+            "MIME-Version: 1.0\n"
+        ).encode("ascii")
+
+    def _part(self, content_type: str, text: str) -> Tuple[bytes, bytes]:
+        body = text.encode("utf-8")
+        encoding = choose_transfer_encoding(body)
+        headers = (
+            f"Content-Type: {content_type}; charset=\"utf-8\"\n"
+            f"Content-Transfer-Encoding: {encoding}\n\n"
+        ).encode("ascii")
+        return headers, _encode_body(body, encoding)
+
+    def make_message_id(self) -> str:
+        """A new Message-ID header value, angle brackets included."""
+        return make_msgid(domain=self._domain)
+
+    def build(self, to: str, subject: str, html_content: str, message_id: Optional[str] = None) -> bytes:
+        """Build the full RFC 5322 message, with a new Message-ID unless one is given."""
+        headers = (
+            f"To: {_encode_header(to)}\n"
+            f"Subject: {_encode_header(subject)}\n"
+            f"Date: {formatdate(localtime=False, usegmt=True)}\n"
+            f"Message-ID: {message_id or make_msgid(domain=self._domain)}\n"
+        ).encode("ascii")
+        html_headers, html_body = self._part("text/html", html_content)
+
+        if not self.text_alternative:
+            return b"".join((self._static_headers, headers, html_headers, html_body))
+
+        text_headers, text_body = self._part("text/plain", html_to_text(html_content))
+        boundary = f"=_{uuid.uuid4().hex}".encode("ascii")
+        return b"".join((
+            self._static_headers,
+            headers,
+            b'Content-Type: multipart/alternative; boundary="', boundary, b'"\n\n',
+            b"--", boundary, b"\n", text_headers, text_body, b"\n",
+            b"--", boundary, b"\n", html_headers, html_body, b"\n",
+            b"--", boundary, b"--\n",
+        ))
+
+    def build_raw(self, to: str, subject: str, html_content: str) -> str:
+        """Build the message and encode it for the Gmail API ``raw`` field."""
+        return base64.urlsafe_b64encode(self.build(to, subject, html_content)).decode("ascii")
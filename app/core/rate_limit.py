@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Dict, Optional
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Quota cost of one users.messages.send call
+GMAIL_SEND_QUOTA_UNITS = 100
+# Back-off used when Gmail throttles us without a Retry-After header
+DEFAULT_THROTTLE_SECONDS = 1.0
+
+class QuotaRateLimiter:
+    """Token bucket measured in Gmail quota units, with adaptive rate.
+
+    Callers reserve units with ``acquire``; if the bucket is short they wait
+    until it has refilled instead of failing. Reservations may push the
+    bucket negative, which queues later callers behind earlier ones without
+    needing a lock.
+
+    The fill rate follows additive-increase/multiplicative-decrease: every
+    throttled response halves it and pauses the bucket for the server's
+    ``Retry-After``, every success nudges it back up towards ``max_rate``.
+    Over time it settles just under the highest rate Gmail accepts.
+    """
+
+    def __init__(self, max_rate: float, burst: float, min_rate: float):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.burst = burst
+        self.rate = max_rate
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self.throttle_count = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    async def acquire(self, units: float = GMAIL_SEND_QUOTA_UNITS) -> float:
+        """Wait until ``units`` quota units are available and take them.
+
+        Returns the number of seconds spent waiting.
+        """
+        start = time.monotonic()
+        self._refill(start)
+        self._tokens -= units
+        delay = max(-self._tokens / self.rate, self._blocked_until - start, 0.0)
+        if delay > 0:
+            logger.debug("Rate limiter delaying %s units by %.3fs", units, delay)
+            await asyncio.sleep(delay)
+        # A throttle response may have arrived while we were waiting
+        while time.monotonic() < self._blocked_until:
+            await asyncio.sleep(self._blocked_until - time.monotonic())
+        return time.monotonic() - start
+
+    def on_success(self) -> None:
+        """Record an accepted call and probe for a higher rate."""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Record a rate-limited call: back off and halve the fill rate."""
+        now = time.monotonic()
+        self._refill(now)
+        self.throttle_count += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        pause = retry_after if retry_after is not None else DEFAULT_THROTTLE_SECONDS
+        self._blocked_until = max(self._blocked_until, now + pause)
+        # Drop any saved-up burst so we come back at the new, lower rate
+        self._tokens = min(self._tokens, 0.0)
+        logger.warning("Gmail rate limit hit, pausing %.1fs and lowering rate to %.0f units/s", pause, self.rate)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate_units_per_second": self.rate,
+            "max_rate_units_per_second": self.max_rate,
+            "available_units": self._tokens,
+            "throttle_count": self.throttle_count,
+        }
+
+gmail_rate_limiter = QuotaRateLimiter(
+    max_rate=settings.GMAIL_QUOTA_UNITS_PER_SECOND,
+    burst=settings.GMAIL_QUOTA_BURST_UNITS,
+    min_rate=settings.GMAIL_MIN_QUOTA_UNITS_PER_SECOND
+)
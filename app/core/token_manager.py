@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import logging
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, each process refreshes on its own
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+# Retry delay for the background refresher after a failed refresh
+REFRESH_RETRY_SECONDS = 30.0
+
+class TokenManager:
+    """Keeps the Gmail access token fresh and shares it across worker processes.
+
+    All Gmail clients share one ``Credentials`` object whose token is updated
+    in place. A background thread refreshes it ``refresh_margin`` seconds
+    before expiry (the margin is larger than google-auth's own expiry skew,
+    so clients never refresh on their own in steady state).
+
+    Refreshes are single-flight: within a process one thread refreshes while
+    the others wait for its result. Across processes the refresh runs under an
+    exclusive lock on ``cache_path + ".lock"``; whoever gets the lock first
+    writes the new token to ``cache_path`` and the rest adopt it instead of
+    refreshing again.
+    """
+
+    def __init__(self, cache_path: str, refresh_margin: float):
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.refresh_count = 0
+        self._credentials: Optional[Credentials] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def credentials(self) -> Credentials:
+        """The shared credentials, created from settings on first access."""
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    credentials = Credentials(
+                        None,
+                        refresh_token=settings.GOOGLE_REFRESH_TOKEN,
+                        token_uri=TOKEN_URI,
+                        client_id=settings.GOOGLE_CLIENT_ID,
+                        client_secret=settings.GOOGLE_CLIENT_SECRET,
+                        scopes=SCOPES,
+                    )
+                    cached = self._read_cache()
+                    if cached is not None:
+                        credentials.token, credentials.expiry = cached
+                    self._credentials = credentials
+        return self._credentials
+
+    def _expires_soon(self, expiry: Optional[datetime]) -> bool:
+        return expiry is None or expiry - timedelta(seconds=self.refresh_margin) <= datetime.utcnow()
+
+    def needs_refresh(self) -> bool:
+        credentials = self.credentials
+        return not credentials.token or self._expires_soon(credentials.expiry)
+
+    def seconds_until_refresh(self) -> float:
+        """Seconds until the token enters the refresh margin (0 if it already has)."""
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return 0.0
+        return max(0.0, (expiry - datetime.utcnow()).total_seconds() - self.refresh_margin)
+
+    def token_expires_in(self) -> Optional[float]:
+        """Seconds the current access token stays valid (negative once expired), or None without a token."""
+        credentials = self.credentials
+        if not credentials.token or credentials.expiry is None:
+            return None
+        return (credentials.expiry - datetime.utcnow()).total_seconds()
+
+    def _read_cache(self) -> Optional[Tuple[str, datetime]]:
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+            return data["token"], datetime.fromisoformat(data["expiry"])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring unreadable token cache %s: %s", self.cache_path, e)
+            return None
+
+    def _write_cache(self, token: str, expiry: datetime) -> None:
+        # Write to a temp file and rename so readers never see a partial file
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"token": token, "expiry": expiry.isoformat()}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _refresh_locked(self) -> None:
+        """Refresh unless another process already did. Caller holds the process lock."""
+        credentials = self.credentials
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cache_path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                cached = self._read_cache()
+                if cached is not None and not self._expires_soon(cached[1]):
+                    credentials.token, credentials.expiry = cached
+                    logger.debug("Adopted access token refreshed by another worker")
+                    return
+                credentials.refresh(Request())
+                self.refresh_count += 1
+                self._write_cache(credentials.token, credentials.expiry)
+                logger.info("Refreshed Gmail access token, valid until %s", credentials.expiry.isoformat())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def ensure_fresh(self) -> None:
+        """Make sure the token is outside the refresh margin. Cheap when it already is."""
+        if not self.needs_refresh():
+            return
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self.needs_refresh():
+                self._refresh_locked()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.ensure_fresh()
+                delay = max(1.0, self.seconds_until_refresh())
+            except Exception as e:
+                logger.error("Background token refresh failed: %s", e)
+                delay = REFRESH_RETRY_SECONDS
+            self._stop.wait(delay)
+
+    def start(self) -> None:
+        """Start refreshing ahead of expiry in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="gmail-token-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+token_manager = TokenManager(settings.GMAIL_TOKEN_CACHE_PATH, settings.GMAIL_TOKEN_REFRESH_MARGIN)
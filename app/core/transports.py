@@ -0,0 +1,342 @@
+from abc import ABC, abstractmethod
+import asyncio
+import re
+import smtplib
+import ssl
+import threading
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+
+from app.core.config import settings
+from app.core.executor import BoundedExecutor, ExecutorQueueFullError
+from app.core.gmail import GmailService, gmail_service, is_transient_error
+from app.core.metrics import register_collector
+from app.core.mime import MessageBuilder
+
+logger = logging.getLogger(__name__)
+
+# SMTP wants CRLF line endings; MessageBuilder writes bare LF
+_EOL = re.compile(rb"\r\n|\n|\r(?!\n)")
+
+class EmailTransport(ABC):
+    """Delivers rendered emails. ``EmailService`` sends through whichever one EMAIL_TRANSPORT selects."""
+
+    @abstractmethod
+    async def send(self, to: str, subject: str, html_content: str) -> Optional[str]:
+        """Send one email and return its message ID, raising if sending failed.
+
+        Raises ``ExecutorQueueFullError`` when the transport cannot take more work.
+        """
+
+    async def send_message(self, to: str, subject: str, html_content: str) -> Optional[str]:
+        """Send one email. Returns its message ID, or None if sending failed."""
+        try:
+            return await self.send(to, subject, html_content)
+        except ExecutorQueueFullError:
+            logger.warning("%s send queue is full, rejecting message", type(self).__name__)
+            raise
+        except Exception as e:
+            logger.exception("Error sending message: %s", e)
+            return None
+
+    def is_transient(self, error: Exception) -> bool:
+        """Whether an error raised by ``send`` may go away if the email is retried later."""
+        return isinstance(error, OSError)
+
+    async def check(self) -> str:
+        """Check the upstream is reachable, raising if not. Returns a short description."""
+        return "no check available"
+
+    @abstractmethod
+    async def send_batch(self, emails: List[Tuple[str, str, str]]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """Send ``(to, subject, html_content)`` emails. Returns a ``(message_id, error)`` pair per email, in order.
+
+        ``error`` is the exception the email failed with, so callers can tell transient failures apart.
+        """
+
+    async def aclose(self) -> None:
+        """Release async resources."""
+
+    def shutdown(self) -> None:
+        """Stop worker threads."""
+
+    def metrics(self):
+        """Transport state for /metrics."""
+        return iter(())
+
+class GmailApiTransport(EmailTransport):
+    """Sends through the Gmail API: one REST call per email, batch requests for many."""
+
+    def __init__(self, service: GmailService):
+        self.service = service
+
+    async def send(self, to: str, subject: str, html_content: str) -> Optional[str]:
+        return await self.service.send(to, subject, html_content)
+
+    async def send_message(self, to: str, subject: str, html_content: str) -> Optional[str]:
+        return await self.service.send_message(to, subject, html_content)
+
+    def is_transient(self, error: Exception) -> bool:
+        return is_transient_error(error)
+
+    async def check(self) -> str:
+        """Open and close a TCP connection to the Gmail API endpoint."""
+        url = urlsplit(settings.GMAIL_API_ENDPOINT)
+        port = url.port or (443 if url.scheme == "https" else 80)
+        _reader, writer = await asyncio.open_connection(url.hostname, port)
+        writer.close()
+        await writer.wait_closed()
+        return f"{url.hostname}:{port} reachable"
+
+    async def send_batch(self, emails: List[Tuple[str, str, str]]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        return await self.service.send_batch(emails)
+
+    async def aclose(self) -> None:
+        await self.service.aclose()
+
+    def shutdown(self) -> None:
+        self.service.shutdown()
+
+class _Connection:
+    __slots__ = ("smtp", "sent", "reused", "idle_since")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.reused = False  # Taken from the idle pool, so the server may have dropped it
+        self.idle_since = 0.0
+
+def _connection_lost(error: Exception) -> bool:
+    """Whether an SMTP error means the connection is gone rather than the message was refused."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    # SMTPException subclasses OSError; plain OSErrors are socket failures
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+class SmtpTransport(EmailTransport):
+    """Sends through an SMTP relay over a pool of persistent, authenticated connections.
+
+    Each send worker thread checks a connection out of the idle pool, sends
+    one message or a whole run of batch messages in that session, and puts
+    it back, so connecting, TLS and AUTH are paid once per connection rather
+    than per email. Connections are retired after ``max_messages`` messages
+    or ``idle_timeout`` idle seconds, and a pooled connection the server has
+    dropped is replaced and the message retried once.
+    """
+
+    def __init__(self, host: str, port: int, username: str = "", password: str = "",
+                 use_tls: bool = True, use_ssl: bool = False, pool_size: int = 4, max_queue: int = 64,
+                 timeout: float = 30.0, max_messages: int = 100, idle_timeout: float = 60.0,
+                 message_builder: Optional[MessageBuilder] = None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.message_builder = message_builder or MessageBuilder(
+            settings.EMAIL_SENDER_NAME,
+            settings.EMAIL_SENDER,
+            text_alternative=settings.EMAIL_TEXT_ALTERNATIVE
+        )
+        # One connection per worker thread at most, so the pool never exceeds pool_size
+        self.executor = BoundedExecutor(max_workers=pool_size, max_queue=max_queue, thread_name_prefix="smtp-send")
+        self.connections_opened = 0
+        self.open_connections = 0
+        self._idle: List[_Connection] = []  # Most recently used last
+        self._lock = threading.Lock()
+
+    def _connect(self) -> _Connection:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                    context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls and not self.use_ssl:
+                smtp.starttls(context=ssl.create_default_context())
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+            self.open_connections += 1
+        logger.debug("Opened SMTP connection to %s:%s", self.host, self.port)
+        return _Connection(smtp)
+
+    def _checkout(self) -> _Connection:
+        """Reuse the most recently used idle connection, or open a new one."""
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self._connect()
+            if now - connection.idle_since < self.idle_timeout:
+                connection.reused = True
+                return connection
+            self._close(connection, quit=True)
+
+    def _checkin(self, connection: _Connection) -> None:
+        if connection.sent >= self.max_messages:
+            self._close(connection, quit=True)
+            return
+        connection.idle_since = time.monotonic()
+        with self._lock:
+            self._idle.append(connection)
+
+    def _close(self, connection: _Connection, quit: bool = False) -> None:
+        try:
+            if quit:
+                connection.smtp.quit()
+            else:
+                connection.smtp.close()
+        except Exception:
+            connection.smtp.close()
+        with self._lock:
+            self.open_connections -= 1
+
+    def _send_blocking(self, messages: List[Tuple[str, str, bytes]]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """Send ``(to, message_id, data)`` messages one after another over one pooled connection.
+
+        Runs on a send worker thread.
+        """
+        results: List[Tuple[Optional[str], Optional[Exception]]] = []
+        connection: Optional[_Connection] = None
+        try:
+            for to, message_id, data in messages:
+                for retry in (False, True):
+                    try:
+                        if connection is None:
+                            connection = self._checkout()
+                        connection.smtp.sendmail(self.message_builder.sender_email, [to], data)
+                        connection.sent += 1
+                        results.append((message_id, None))
+                    except Exception as e:
+                        if connection is not None and _connection_lost(e):
+                            lost, connection = connection, None
+                            self._close(lost)
+                            if (lost.reused or lost.sent) and not retry:
+                                logger.debug("Pooled SMTP connection was dropped, reconnecting")
+                                continue
+                        logger.error("SMTP send to %s failed: %s", to, e)
+                        results.append((None, e))
+                    break
+                if connection is not None and connection.sent >= self.max_messages:
+                    self._checkin(connection)
+                    connection = None
+        finally:
+            if connection is not None:
+                self._checkin(connection)
+        return results
+
+    def _check_blocking(self) -> str:
+        """NOOP on a pooled connection, reconnecting once if the pooled one was dropped."""
+        for retry in (False, True):
+            connection = self._checkout()
+            try:
+                code, reply = connection.smtp.noop()
+            except Exception as e:
+                self._close(connection)
+                if connection.reused and not retry and _connection_lost(e):
+                    continue
+                raise
+            self._checkin(connection)
+            if code != 250:
+                raise smtplib.SMTPResponseException(code, reply)
+            return f"{self.host}:{self.port} answered NOOP"
+
+    async def check(self) -> str:
+        """NOOP over the pool; a connection opened for the check stays pooled for sends."""
+        try:
+            return await self.executor.run(self._check_blocking)
+        except ExecutorQueueFullError:
+            # Every connection is busy sending, which is proof enough
+            return "send pool is saturated"
+
+    def _prepare(self, to: str, subject: str, html_content: str) -> Tuple[str, str, bytes]:
+        header_id = self.message_builder.make_message_id()
+        data = _EOL.sub(b"\r\n", self.message_builder.build(to, subject, html_content, message_id=header_id))
+        # The Message-ID header, without its angle brackets, identifies the email in tracking
+        return to, header_id.strip("<>"), data
+
+    async def send(self, to: str, subject: str, html_content: str) -> Optional[str]:
+        [(message_id, error)] = await self.executor.run(
+            self._send_blocking, [self._prepare(to, subject, html_content)]
+        )
+        if error is not None:
+            raise error
+        return message_id
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(400 <= code < 500 for code, _ in error.recipients.values())
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        return _connection_lost(error)
+
+    async def send_batch(self, emails: List[Tuple[str, str, str]]) -> List[Tuple[Optional[str], Optional[Exception]]]:
+        """Spread the emails over the pool; each share goes out in a single SMTP session."""
+        messages = [self._prepare(to, subject, html) for to, subject, html in emails]
+        per_connection = max(1, -(-len(messages) // self.executor.max_workers))
+        chunks = [messages[start:start + per_connection] for start in range(0, len(messages), per_connection)]
+        results: List[Tuple[Optional[str], Optional[Exception]]] = []
+        for chunk, chunk_results in zip(chunks, await asyncio.gather(
+            *(self.executor.run(self._send_blocking, chunk) for chunk in chunks), return_exceptions=True
+        )):
+            if isinstance(chunk_results, BaseException):
+                logger.error("Error sending SMTP batch: %s", chunk_results)
+                chunk_results = [(None, chunk_results)] * len(chunk)
+            results.extend(chunk_results)
+        return results
+
+    def shutdown(self) -> None:
+        """Stop the send workers and close pooled connections."""
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection, quit=True)
+
+    def metrics(self):
+        yield "smtp_send_pool_pending", "gauge", "SMTP sends running or waiting for a worker.", [
+            ({}, self.executor.pending)
+        ]
+        yield "smtp_open_connections", "gauge", "Open SMTP connections, in use or idle.", [
+            ({}, self.open_connections)
+        ]
+        yield "smtp_connections_opened_total", "counter", "SMTP connections opened.", [
+            ({}, self.connections_opened)
+        ]
+
+def create_transport() -> EmailTransport:
+    """Build the transport selected by EMAIL_TRANSPORT. Does no I/O."""
+    if settings.EMAIL_TRANSPORT == "gmail":
+        return GmailApiTransport(gmail_service)
+    if settings.EMAIL_TRANSPORT == "smtp":
+        return SmtpTransport(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+            use_ssl=settings.SMTP_USE_SSL,
+            pool_size=settings.SMTP_POOL_SIZE,
+            max_queue=settings.SMTP_SEND_QUEUE_SIZE,
+            timeout=settings.SMTP_TIMEOUT,
+            max_messages=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+            idle_timeout=settings.SMTP_IDLE_TIMEOUT
+        )
+    raise ValueError(f"Unknown EMAIL_TRANSPORT: {settings.EMAIL_TRANSPORT}")
+
+email_transport = create_transport()
+register_collector(email_transport.metrics)
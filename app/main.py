@@ -1,12 +1,22 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.transports import email_transport
+from app.core.logging_config import setup_logging, shutdown_logging
+from app.core.metrics import render_metrics
+from app.core.token_manager import token_manager
+from app.services.email import email_service
+from app.services.health import health_checker
+from app.services.queue import email_queue
+from app.services.tracking import tracking_service
+from app.services.ingest import tracking_ingestor
+from app.services.mail_merge import mail_merge_service
 from app.api.v1.endpoints import email, tracking
+from app.utils.template import warmup_templates
 import logging
 import platform
 import sys
-import smtplib
-from email.mime.text import MIMEText
 from datetime import datetime
 
 app = FastAPI(
@@ -28,22 +38,62 @@ app.add_middleware(
 app.include_router(email.router, prefix="/api/v1/email", tags=["email"])
 app.include_router(tracking.router, prefix="/api/v1/tracking", tags=["tracking"])
 
-# Add debug logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_event():
+    setup_logging()
+    warmup_templates()
+    token_manager.start()
+    tracking_service.start()
+    tracking_ingestor.start()
+    email_queue.start_workers(email_service.process_queued, settings.EMAIL_QUEUE_WORKERS)
+    mail_merge_service.start()
+    health_checker.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await health_checker.stop()
+    await mail_merge_service.stop()
+    await email_service.digests.flush_all()
+    await email_queue.stop_workers()
+    email_queue.close()
+    email_transport.shutdown()
+    await email_transport.aclose()
+    token_manager.stop()
+    await tracking_ingestor.stop()
+    await tracking_service.stop()
+    shutdown_logging()
+
 @app.get("/")
 async def root():
     logger.debug("Root endpoint called")
     return {"message": "Task Manager Email Service is running"}
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["metrics"])
+async def metrics():
+    """Prometheus metrics in text exposition format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/live", tags=["health"])
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready", tags=["health"])
+async def readiness():
+    """Readiness probe, served from the last background check; 503 when not ready."""
+    result = health_checker.result
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
 @app.get("/health", tags=["health"])
 async def health_check():
     """
-    Health check endpoint that provides detailed information about the email service
-    and performs a basic SMTP connection test.
+    Health check endpoint that provides detailed information about the email service.
+    Upstream status comes from the cached background checks, so this never connects out.
     """
     logger.debug("Health check endpoint called")
+    readiness = health_checker.result
     
     # System information
     system_info = {
@@ -54,34 +104,18 @@ async def health_check():
     
     # Email configuration (without sensitive data)
     email_config = {
-        "smtp_server": settings.smtp_server,
-        "smtp_port": settings.smtp_port,
-        "sender_email": settings.sender_email,
-        "use_tls": settings.use_tls,
-        "use_ssl": settings.use_ssl,
+        "transport": settings.EMAIL_TRANSPORT,
+        "sender_email": settings.EMAIL_SENDER,
+        "smtp_host": settings.SMTP_HOST,
+        "smtp_port": settings.SMTP_PORT,
+        "use_tls": settings.SMTP_USE_TLS,
+        "use_ssl": settings.SMTP_USE_SSL,
     }
     
-    # Test SMTP connection
-    smtp_test = {"success": False, "message": ""}
-    try:
-        if settings.use_ssl:
-            server = smtplib.SMTP_SSL(settings.smtp_server, settings.smtp_port)
-        else:
-            server = smtplib.SMTP(settings.smtp_server, settings.smtp_port)
-            if settings.use_tls:
-                server.starttls()
-        
-        server.login(settings.smtp_username, settings.smtp_password)
-        smtp_test["success"] = True
-        smtp_test["message"] = "SMTP connection successful"
-        server.quit()
-    except Exception as e:
-        smtp_test["message"] = f"SMTP connection failed: {str(e)}"
-        logger.error(f"SMTP connection test failed: {str(e)}")
-    
     return {
-        "status": "healthy" if smtp_test["success"] else "unhealthy",
+        "status": "healthy" if readiness["ready"] else "unhealthy",
         "system_info": system_info,
         "email_config": email_config,
-        "smtp_test": smtp_test,
-    } 
\ No newline at end of file
+        "circuit_breaker": email_service.breaker.state,
+        "readiness": readiness,
+    }
@@ -66,4 +66,57 @@ class EmailStatusResponse(BaseModel):
     status: EmailStatus
     sent_at: datetime
     delivered_at: Optional[datetime] = None
-    error: Optional[str] = None 
\ No newline at end of file
+    error: Optional[str] = None
+    tracking_id: Optional[str] = None
+    message_id: Optional[str] = None
+    opened_at: Optional[datetime] = None  # First open
+    clicked_at: Optional[datetime] = None  # First click
+    last_event_at: Optional[datetime] = None
+    open_count: int = 0
+    click_count: int = 0 
+
+class MailMergeState(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    INTERRUPTED = "interrupted"  # The service stopped before the job finished
+
+class MailMergeJob(BaseModel):
+    job_id: str
+    state: MailMergeState
+    template: str
+    subject: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    rows_read: int = 0
+    sent: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+
+class MailMergeRow(BaseModel):
+    row: int  # 1-based position in the upload, not counting the CSV header
+    to: Optional[str] = None
+    status: EmailStatus
+    tracking_id: Optional[str] = None
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+class MailMergeRowsPage(BaseModel):
+    job_id: str
+    rows: List[MailMergeRow]  # In completion order
+    next_after: int  # Pass as ``after`` to get results completed since this page
+
+class DeadLetter(BaseModel):
+    id: int
+    tracking_id: str
+    task_id: str
+    to: str
+    subject: str
+    priority: Priority
+    attempts: int  # Delivery attempts made before the email was given up on
+    error: Optional[str] = None
+    failed_at: datetime
+
+class DeadLettersPage(BaseModel):
+    dead_letters: List[DeadLetter]
+    next_after: int  # Pass as ``after`` to get the next page
@@ -0,0 +1,176 @@
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.models.email import EmailAnalytics, EmailStatus
+from app.services.tracking_store import from_epoch, repeat_count
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 3600
+PEAK_TIMES = 3
+MAX_FAILURE_REASON_LENGTH = 200
+
+# Per-email flags, set the first time an email reaches a status
+_SENT = 1
+_OPENED = 2
+_CLICKED = 4
+_FAILED = 8
+_FLAGS = {
+    EmailStatus.SENT: _SENT,
+    EmailStatus.OPENED: _OPENED,
+    EmailStatus.CLICKED: _CLICKED,
+    EmailStatus.FAILED: _FAILED,
+}
+
+class _HourBucket:
+    """Counters for one hour of tracking events."""
+    __slots__ = ("sent", "opened", "clicked", "failed", "open_events", "click_events", "failures")
+
+    def __init__(self):
+        self.sent = 0  # Emails first sent in this hour
+        self.opened = 0  # Emails first opened in this hour
+        self.clicked = 0  # Emails first clicked in this hour
+        self.failed = 0  # Emails first failed in this hour
+        self.open_events = 0  # Every open, including repeats
+        self.click_events = 0
+        self.failures: Optional[Dict[str, int]] = None
+
+def build_analytics(sent: int, opened: int, clicked: int, failed: int,
+                    peak_hours: List[int], failures: Dict[str, int]) -> EmailAnalytics:
+    """Turn summed counters into the API model. ``peak_hours`` are bucket numbers, busiest first."""
+    return EmailAnalytics(
+        total_sent=sent,
+        total_delivered=sent,  # Gmail does not report delivery, so sent counts as delivered
+        total_opened=opened,
+        total_clicked=clicked,
+        average_open_rate=opened / sent if sent > 0 else 0,
+        average_click_rate=clicked / sent if sent > 0 else 0,
+        delivery_success_rate=sent / (sent + failed) if sent + failed > 0 else 1.0,
+        peak_times=[from_epoch(hour * BUCKET_SECONDS) for hour in peak_hours],
+        common_failures=dict(sorted(failures.items(), key=lambda item: item[1], reverse=True))
+    )
+
+class AnalyticsAggregator:
+    """Email analytics maintained incrementally as events arrive.
+
+    Keeps one flag set per tracking ID so sent/opened/clicked are counted once
+    per email, plus per-hour buckets so a ``days`` window is answered by
+    summing buckets instead of rescanning events.
+    """
+
+    def __init__(self):
+        self._flags: Dict[str, int] = {}
+        self._buckets: Dict[int, _HourBucket] = {}
+
+    def reset(self) -> None:
+        self._flags = {}
+        self._buckets = {}
+
+    @property
+    def flags(self) -> Dict[str, int]:
+        """Status flags per tracking ID."""
+        return self._flags
+
+    @property
+    def buckets(self) -> Dict[int, _HourBucket]:
+        """Counters per hour number (epoch seconds // BUCKET_SECONDS)."""
+        return self._buckets
+
+    def seed_flags(self, flags: Dict[str, int]) -> None:
+        """Start from already-known per-email flags, so earlier statuses are not counted again."""
+        self._flags.update(flags)
+
+    def record(self, tracking_id: str, event_type: EmailStatus, timestamp: float,
+               metadata: Optional[Dict[str, str]] = None) -> None:
+        """Fold one event into the counters."""
+        hour = int(timestamp // BUCKET_SECONDS)
+        bucket = self._buckets.get(hour)
+        if bucket is None:
+            bucket = self._buckets[hour] = _HourBucket()
+
+        if event_type == EmailStatus.OPENED:
+            bucket.open_events += repeat_count(metadata)
+        elif event_type == EmailStatus.CLICKED:
+            bucket.click_events += repeat_count(metadata)
+
+        flag = _FLAGS.get(event_type)
+        if flag is None:
+            return
+        flags = self._flags.get(tracking_id, 0)
+        if flags & flag:
+            return
+        self._flags[tracking_id] = flags | flag
+
+        if flag == _SENT:
+            bucket.sent += 1
+        elif flag == _OPENED:
+            bucket.opened += 1
+        elif flag == _CLICKED:
+            bucket.clicked += 1
+        else:
+            bucket.failed += 1
+            reason = ((metadata or {}).get("error") or "unknown")[:MAX_FAILURE_REASON_LENGTH]
+            if bucket.failures is None:
+                bucket.failures = {}
+            bucket.failures[reason] = bucket.failures.get(reason, 0) + 1
+
+    def add_rollup(self, hour: int, sent: int, opened: int, clicked: int, failed: int, open_events: int,
+                   click_events: int, failures: Optional[Dict[str, int]] = None) -> None:
+        """Add counters of emails whose events are no longer stored."""
+        bucket = self._buckets.get(hour)
+        if bucket is None:
+            bucket = self._buckets[hour] = _HourBucket()
+        bucket.sent += sent
+        bucket.opened += opened
+        bucket.clicked += clicked
+        bucket.failed += failed
+        bucket.open_events += open_events
+        bucket.click_events += click_events
+        if failures:
+            if bucket.failures is None:
+                bucket.failures = {}
+            for reason, count in failures.items():
+                bucket.failures[reason] = bucket.failures.get(reason, 0) + count
+
+    def forget(self, tracking_ids: Iterable[str]) -> None:
+        """Drop per-email flags of evicted emails; their counts stay in the hourly buckets."""
+        for tracking_id in tracking_ids:
+            self._flags.pop(tracking_id, None)
+
+    def rebuild(self, events: Iterable[Tuple[str, EmailStatus, float, Optional[Dict[str, str]]]]) -> int:
+        """Recompute everything from stored events. Returns the number of events read."""
+        self.reset()
+        count = 0
+        for tracking_id, event_type, timestamp, metadata in events:
+            self.record(tracking_id, event_type, timestamp, metadata)
+            count += 1
+        logger.info("Rebuilt analytics from %s stored events", count)
+        return count
+
+    def snapshot(self, days: Optional[int] = None, now: Optional[float] = None) -> EmailAnalytics:
+        """Analytics for the last ``days`` days, or all time when None."""
+        if days is None:
+            buckets = list(self._buckets.items())
+        else:
+            first_hour = int(((now or time.time()) - days * 86400) // BUCKET_SECONDS)
+            buckets = [(hour, b) for hour, b in self._buckets.items() if hour >= first_hour]
+
+        sent = opened = clicked = failed = 0
+        failures: Dict[str, int] = {}
+        for _, bucket in buckets:
+            sent += bucket.sent
+            opened += bucket.opened
+            clicked += bucket.clicked
+            failed += bucket.failed
+            if bucket.failures:
+                for reason, count in bucket.failures.items():
+                    failures[reason] = failures.get(reason, 0) + count
+
+        busiest = heapq.nlargest(
+            PEAK_TIMES,
+            ((b.open_events + b.click_events, hour) for hour, b in buckets if b.open_events or b.click_events)
+        )
+
+        return build_analytics(sent, opened, clicked, failed, [hour for _, hour in busiest], failures)
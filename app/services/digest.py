@@ -0,0 +1,118 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from app.core.executor import ExecutorQueueFullError
+from app.models.email import EmailRequest
+
+logger = logging.getLogger(__name__)
+
+# Back-off before retrying a digest the send pool had no room for
+BUSY_RETRY_SECONDS = 0.5
+
+# (request, tracking_id) for one notification waiting in a digest
+DigestItem = Tuple[EmailRequest, str]
+
+class _Digest:
+    __slots__ = ("items", "opened_at", "flush_at", "task", "full")
+
+    def __init__(self, now: float):
+        self.items: List[DigestItem] = []
+        self.opened_at = now
+        self.flush_at = now
+        self.task: Optional[asyncio.Task] = None
+        self.full = asyncio.Event()  # Wakes the flush task early once max_items is reached
+
+class DigestCoalescer:
+    """Holds notifications per recipient so several can go out as one digest email.
+
+    A recipient's digest is sent once no new notification has arrived for
+    ``window`` seconds, but never later than ``max_delay`` seconds after its
+    first one, or as soon as it holds ``max_items``. Pending digests live in
+    memory; ``flush_all`` sends them on shutdown.
+    """
+
+    def __init__(self, window: float, max_delay: float, max_items: int,
+                 send: Callable[[List[DigestItem]], Awaitable[str]]):
+        self.window = window
+        self.max_delay = max_delay
+        self.max_items = max_items
+        self.send = send
+        self.digests_sent = 0
+        self.notifications_coalesced = 0
+        self._pending: Dict[str, _Digest] = {}
+
+    @property
+    def pending(self) -> int:
+        """Notifications waiting to be sent."""
+        return sum(len(digest.items) for digest in self._pending.values())
+
+    def add(self, email_request: EmailRequest, tracking_id: str) -> None:
+        """Hold a notification for its recipient's next digest."""
+        key = email_request.to.lower()
+        now = asyncio.get_running_loop().time()
+        digest = self._pending.get(key)
+        if digest is None:
+            digest = self._pending[key] = _Digest(now)
+        digest.items.append((email_request, tracking_id))
+        digest.flush_at = min(now + self.window, digest.opened_at + self.max_delay)
+        if len(digest.items) >= self.max_items:
+            digest.flush_at = now
+            digest.full.set()
+        if digest.task is None:
+            digest.task = asyncio.create_task(self._flush_when_due(key, digest))
+
+    def take(self, recipient: str) -> List[DigestItem]:
+        """Remove and return a recipient's pending notifications, e.g. to send them right away."""
+        digest = self._pending.pop(recipient.lower(), None)
+        if digest is None:
+            return []
+        if digest.task is not None:
+            digest.task.cancel()
+        return digest.items
+
+    async def _flush_when_due(self, key: str, digest: _Digest) -> None:
+        loop = asyncio.get_running_loop()
+        # flush_at moves later as notifications arrive, so re-check after each wait
+        while loop.time() < digest.flush_at:
+            try:
+                await asyncio.wait_for(digest.full.wait(), digest.flush_at - loop.time())
+            except asyncio.TimeoutError:
+                pass
+        if self._pending.get(key) is digest:
+            del self._pending[key]
+        await self._send(digest.items)
+
+    async def _send(self, items: List[DigestItem]) -> None:
+        while True:
+            try:
+                await self.send(items)
+                break
+            except ExecutorQueueFullError:
+                await asyncio.sleep(BUSY_RETRY_SECONDS)
+            except Exception as e:
+                # The send callback records FAILED events for the notifications
+                logger.error("Error sending digest of %s notifications: %s", len(items), e)
+                break
+        self.digests_sent += 1
+        self.notifications_coalesced += len(items)
+
+    async def flush_all(self) -> None:
+        """Send every pending digest now."""
+        pending, self._pending = self._pending, {}
+        for digest in pending.values():
+            if digest.task is not None:
+                digest.task.cancel()
+        await asyncio.gather(*(self._send(digest.items) for digest in pending.values()))
+
+    def metrics(self):
+        """Digest state for /metrics."""
+        yield "email_digest_pending", "gauge", "Notifications waiting for their recipient's digest.", [
+            ({}, self.pending)
+        ]
+        yield "email_digests_sent_total", "counter", "Digest sends, including digests of one.", [
+            ({}, self.digests_sent)
+        ]
+        yield "email_digest_notifications_total", "counter", "Notifications sent through digests.", [
+            ({}, self.notifications_coalesced)
+        ]
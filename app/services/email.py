@@ -1,142 +1,495 @@
 from datetime import datetime
-from typing import Optional
-from app.core.gmail import gmail_service
-from app.models.email import EmailRequest, EmailResponse, EmailStatus, EmailEvent
+import asyncio
+from typing import Dict, List, Optional
+from app.core.transports import email_transport
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.executor import ExecutorQueueFullError
+from app.models.email import EmailRequest, EmailResponse, EmailStatus, EmailEvent, Priority
 from app.utils.template import render_template
+from app.services.digest import DigestCoalescer, DigestItem
 from app.services.tracking import tracking_service
+from app.services.status_index import StatusSummary
+from app.services.queue import QueuedEmail, email_queue, retry_delay
 from app.core.config import settings
-import traceback
+from app.core.metrics import emails_sent_total, register_collector, send_stage_seconds
 import logging
+import time
 import uuid
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+_tracking_id_stage = send_stage_seconds.labels("tracking_id")
+_event_write_stage = send_stage_seconds.labels("event_write")
+_render_stage = send_stage_seconds.labels("render")
+
 class EmailService:
+    def __init__(self):
+        self.digests = DigestCoalescer(
+            window=settings.EMAIL_DIGEST_WINDOW_SECONDS,
+            max_delay=settings.EMAIL_DIGEST_MAX_DELAY_SECONDS,
+            max_items=settings.EMAIL_DIGEST_MAX_ITEMS,
+            send=self.send_digest
+        )
+        self.breaker = CircuitBreaker(
+            "transport",
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS
+        )
+
+    async def start_tracking(self, metadata: Dict[str, str]) -> str:
+        """Create a tracking ID for an email and record its PENDING event."""
+        started = time.perf_counter()
+        tracking_id = await tracking_service.create_tracking_id()
+        created = time.perf_counter()
+        _tracking_id_stage.observe(created - started)
+        await tracking_service.add_event(
+            tracking_id,
+            EmailEvent(
+                event_type=EmailStatus.PENDING,
+                timestamp=datetime.utcnow(),
+                metadata=metadata
+            )
+        )
+        _event_write_stage.observe(time.perf_counter() - created)
+        return tracking_id
+
+    async def _start_tracking(self, email_request: EmailRequest) -> str:
+        return await self.start_tracking({"task_id": email_request.task_id})
+
+    async def record_result(self, tracking_id: str, event_type: EmailStatus, metadata: dict) -> None:
+        """Record the SENT or FAILED event for a send attempt."""
+        started = time.perf_counter()
+        await tracking_service.add_event(
+            tracking_id,
+            EmailEvent(
+                event_type=event_type,
+                timestamp=datetime.utcnow(),
+                metadata=metadata
+            )
+        )
+        _event_write_stage.observe(time.perf_counter() - started)
+        emails_sent_total.labels(event_type.value).inc()
+
+    async def _render_task_email(self, email_request: EmailRequest, tracking_id: str) -> str:
+        """Render the task notification template for a request."""
+        # Generate tracking pixel and links
+        tracking_pixel = await tracking_service.generate_tracking_pixel(tracking_id)
+        
+        return render_template(
+            "email_templates/task_notification.html",
+            task_title=email_request.task_title,
+            task_description=email_request.task_description,
+            priority=email_request.priority.value,
+            tracking_id=tracking_id,
+            tracking_url=settings.EMAIL_SERVICE_URL,
+            # Add HubSpot fields
+            hubspot_portal_id=email_request.hubspot_portal_id,
+            hubspot_contact_id=email_request.hubspot_contact_id,
+            hubspot_deal_id=email_request.hubspot_deal_id,
+            task_url=email_request.task_url or "#"
+        )
+
+    def _is_transient(self, error: Exception) -> bool:
+        return isinstance(error, CircuitOpenError) or email_transport.is_transient(error)
+
+    async def _transport_send(self, to: str, subject: str, html_content: str) -> Optional[str]:
+        """Send through the transport behind the circuit breaker, raising if sending failed."""
+        self.breaker.before_call()
+        try:
+            message_id = await email_transport.send(to=to, subject=subject, html_content=html_content)
+        except ExecutorQueueFullError:
+            raise
+        except Exception as e:
+            # A permanent error such as a rejected address still means the upstream answered
+            if email_transport.is_transient(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return message_id
+
+    async def _record_sent(self, tracking_id: str, message_id: Optional[str], attempt: int,
+                           metadata: Optional[Dict[str, str]] = None) -> EmailResponse:
+        """Record the outcome of a send call that did not raise."""
+        if message_id:
+            # Record success event
+            await self.record_result(tracking_id, EmailStatus.SENT, {"message_id": message_id, **(metadata or {})})
+            
+            logger.info("Email sent successfully with message_id: %s", message_id)
+            return EmailResponse(
+                status=EmailStatus.SENT,
+                message_id=message_id,
+                tracking_id=tracking_id,
+                timestamp=datetime.utcnow(),
+                delivery_attempts=attempt
+            )
+        else:
+            # Record failure event
+            await self.record_result(tracking_id, EmailStatus.FAILED, {"error": "No message_id received"})
+            
+            logger.error("Email sending failed - no message_id received")
+            return EmailResponse(
+                status=EmailStatus.FAILED,
+                message_id="",
+                tracking_id=tracking_id,
+                timestamp=datetime.utcnow(),
+                delivery_attempts=attempt
+            )
+
+    async def _schedule_retry(self, email_request: EmailRequest, tracking_id: str, attempt: int,
+                              error: Exception) -> EmailResponse:
+        """Persist a transiently failed email for another attempt after a jittered backoff."""
+        delay = retry_delay(attempt, settings.EMAIL_RETRY_BASE_DELAY, settings.EMAIL_RETRY_MAX_DELAY)
+        if isinstance(error, CircuitOpenError):
+            delay = max(delay, error.retry_after)
+        retry_at = time.time() + delay
+        email_queue.put(tracking_id, email_request, attempts=attempt, not_before=retry_at, last_error=str(error))
+        await self._record_retry(tracking_id, attempt, error, retry_at)
+        return EmailResponse(
+            status=EmailStatus.PENDING,
+            message_id="",
+            tracking_id=tracking_id,
+            timestamp=datetime.utcnow(),
+            delivery_attempts=attempt
+        )
+
+    async def _record_retry(self, tracking_id: str, attempt: int, error: Exception, retry_at: float) -> None:
+        logger.warning("Attempt %s for email %s failed, retrying in %.1fs: %s",
+                       attempt, tracking_id, retry_at - time.time(), error)
+        # A PENDING event keeps the email's status unchanged while the failure stays on record
+        await tracking_service.add_event(
+            tracking_id,
+            EmailEvent(
+                event_type=EmailStatus.PENDING,
+                timestamp=datetime.utcnow(),
+                metadata={
+                    "error": str(error),
+                    "attempt": str(attempt),
+                    "retry_at": datetime.utcfromtimestamp(retry_at).isoformat(),
+                }
+            )
+        )
+
+    async def _fail(self, email_request: EmailRequest, tracking_id: str, attempt: int, error: Exception) -> None:
+        """Record a final failure and keep the email as a dead letter for inspection and replay."""
+        await self.record_result(tracking_id, EmailStatus.FAILED, {"error": str(error), "attempts": str(attempt)})
+        email_queue.dead_letter(tracking_id, email_request, attempt, str(error))
+
+    async def _deliver(self, email_request: EmailRequest, tracking_id: str, attempts: int = 0) -> EmailResponse:
+        """Render and send an email whose tracking ID already exists.
+
+        ``attempts`` counts earlier failed attempts. Transient failures are
+        retried from the send queue until EMAIL_RETRY_MAX_ATTEMPTS; anything
+        else raises after the email is recorded as FAILED and dead-lettered.
+        """
+        attempt = attempts + 1
+        # Render the email template
+        try:
+            started = time.perf_counter()
+            html_content = await self._render_task_email(email_request, tracking_id)
+            _render_stage.observe(time.perf_counter() - started)
+            logger.debug("Template rendered successfully")
+        except Exception as template_error:
+            logger.exception("Template rendering error: %s", template_error)
+            await self._fail(email_request, tracking_id, attempt, template_error)
+            raise
+
+        try:
+            logger.debug("Attempting to send email via the transport")
+            message_id = await self._transport_send(email_request.to, email_request.subject, html_content)
+            logger.debug("Transport response - message_id: %s", message_id)
+        except ExecutorQueueFullError:
+            raise
+        except Exception as send_error:
+            if self._is_transient(send_error) and attempt < settings.EMAIL_RETRY_MAX_ATTEMPTS:
+                return await self._schedule_retry(email_request, tracking_id, attempt, send_error)
+            logger.exception("Transport error: %s", send_error)
+            await self._fail(email_request, tracking_id, attempt, send_error)
+            raise
+
+        return await self._record_sent(tracking_id, message_id, attempt)
+
+    async def send_html(self, tracking_id: str, to: str, subject: str, html_content: str) -> EmailResponse:
+        """Send already rendered HTML for a tracked email and record the result.
+
+        There is no request to queue for a later retry, so transient failures
+        are retried in place with the usual backoff until
+        EMAIL_RETRY_MAX_ATTEMPTS, and an open circuit is waited out without
+        using up an attempt. Raises after recording FAILED once sending fails
+        for good.
+        """
+        attempt = 0
+        while True:
+            try:
+                logger.debug("Attempting to send email via the transport")
+                message_id = await self._transport_send(to, subject, html_content)
+                logger.debug("Transport response - message_id: %s", message_id)
+            except ExecutorQueueFullError:
+                raise
+            except CircuitOpenError as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as send_error:
+                attempt += 1
+                if email_transport.is_transient(send_error) and attempt < settings.EMAIL_RETRY_MAX_ATTEMPTS:
+                    delay = retry_delay(attempt, settings.EMAIL_RETRY_BASE_DELAY, settings.EMAIL_RETRY_MAX_DELAY)
+                    await self._record_retry(tracking_id, attempt, send_error, time.time() + delay)
+                    await asyncio.sleep(delay)
+                    continue
+                logger.exception("Transport error: %s", send_error)
+
+                # Record failure event
+                await self.record_result(
+                    tracking_id, EmailStatus.FAILED, {"error": str(send_error), "attempts": str(attempt)}
+                )
+                raise
+            return await self._record_sent(tracking_id, message_id, attempt + 1)
+
     async def send_task_email(self, email_request: EmailRequest) -> EmailResponse:
         """Send a task notification email with tracking."""
         try:
-            logger.debug(f"Starting to send email to: {email_request.to}")
+            logger.debug("Starting to send email to: %s", email_request.to)
             
-            # Generate tracking ID
-            tracking_id = await tracking_service.create_tracking_id()
+            tracking_id = await self._start_tracking(email_request)
             
-            # Record initial event
+            if settings.EMAIL_DIGEST_ENABLED:
+                return await self._coalesce(email_request, tracking_id)
+            return await self._deliver(email_request, tracking_id)
+
+        except ExecutorQueueFullError:
+            raise
+        except Exception as e:
+            logger.exception("Error in send_task_email: %s", e)
+            return EmailResponse(
+                status=EmailStatus.FAILED,
+                message_id="",
+                timestamp=datetime.utcnow()
+            )
+
+    async def _coalesce(self, email_request: EmailRequest, tracking_id: str) -> EmailResponse:
+        """Hold a notification for its recipient's digest, or send the digest now for HIGHEST priority."""
+        if email_request.priority != Priority.HIGHEST:
+            self.digests.add(email_request, tracking_id)
+            return EmailResponse(
+                status=EmailStatus.PENDING,
+                message_id="",
+                tracking_id=tracking_id,
+                timestamp=datetime.utcnow()
+            )
+
+        held = self.digests.take(email_request.to)
+        if not held:
+            return await self._deliver(email_request, tracking_id)
+        try:
+            message_id = await self.send_digest(held + [(email_request, tracking_id)])
+        except ExecutorQueueFullError:
+            # Nothing was sent; the held notifications wait for their next flush
+            for item in held:
+                self.digests.add(*item)
+            raise
+        status = EmailStatus.SENT
+        if not message_id:
+            # Failed, or scheduled for retry; the events recorded for this email say which
+            summary = await tracking_service.get_status(tracking_id)
+            status = summary.status if summary is not None else EmailStatus.FAILED
+        return EmailResponse(
+            status=status,
+            message_id=message_id,
+            tracking_id=tracking_id,
+            timestamp=datetime.utcnow()
+        )
+
+    async def send_digest(self, items: List[DigestItem]) -> str:
+        """Send notifications for one recipient as a single email and return its message ID.
+
+        Every notification keeps its own tracking ID; each records a SENT event
+        carrying the digest's message_id, or a FAILED event. A lone
+        notification goes out as a normal task email.
+        """
+        if len(items) == 1:
+            response = await self._deliver(*items[0])
+            return response.message_id
+
+        tracking_ids = [tracking_id for _, tracking_id in items]
+        try:
+            started = time.perf_counter()
+            html_content = render_template(
+                "email_templates/task_digest.html",
+                tasks=[
+                    {
+                        "task_title": email_request.task_title,
+                        "task_description": email_request.task_description,
+                        "priority": email_request.priority.value,
+                        "tracking_id": tracking_id,
+                        "hubspot_portal_id": email_request.hubspot_portal_id,
+                        "hubspot_contact_id": email_request.hubspot_contact_id,
+                        "hubspot_deal_id": email_request.hubspot_deal_id,
+                        "task_url": email_request.task_url or "#",
+                    }
+                    # Most urgent first, arrival order within a priority
+                    for email_request, tracking_id in sorted(items, key=lambda item: item[0].priority.value)
+                ],
+                tracking_url=settings.EMAIL_SERVICE_URL
+            )
+            _render_stage.observe(time.perf_counter() - started)
+            message_id = await self._transport_send(items[0][0].to, self._digest_subject(items), html_content)
+        except ExecutorQueueFullError:
+            raise
+        except Exception as e:
+            if self._is_transient(e) and settings.EMAIL_RETRY_MAX_ATTEMPTS > 1:
+                # Retries go out as individual task emails from the send queue
+                for email_request, tracking_id in items:
+                    await self._schedule_retry(email_request, tracking_id, 1, e)
+                return ""
+            logger.exception("Digest send error: %s", e)
+            for email_request, tracking_id in items:
+                await self._fail(email_request, tracking_id, 1, e)
+            raise
+
+        if not message_id:
+            logger.error("Digest sending failed - no message_id received")
+            for tracking_id in tracking_ids:
+                await self.record_result(tracking_id, EmailStatus.FAILED, {"error": "No message_id received"})
+            return ""
+
+        metadata = {"message_id": message_id, "digest_size": str(len(items))}
+        for tracking_id in tracking_ids:
+            await self.record_result(tracking_id, EmailStatus.SENT, metadata)
+        logger.info("Digest of %s notifications sent with message_id: %s", len(items), message_id)
+        return message_id
+
+    @staticmethod
+    def _digest_subject(items: List[DigestItem]) -> str:
+        subjects = {email_request.subject for email_request, _ in items}
+        if len(subjects) == 1:
+            return subjects.pop()
+        return f"{len(items)} task updates"
+
+    async def enqueue_task_email(self, email_request: EmailRequest) -> EmailResponse:
+        """Accept a task email for background delivery and return right away."""
+        tracking_id = await self._start_tracking(email_request)
+        email_queue.put(tracking_id, email_request)
+        logger.debug("Queued email %s with priority %s", tracking_id, email_request.priority.value)
+        return EmailResponse(
+            status=EmailStatus.PENDING,
+            message_id="",
+            tracking_id=tracking_id,
+            timestamp=datetime.utcnow()
+        )
+
+    async def process_queued(self, item: QueuedEmail) -> None:
+        """Deliver an email taken off the send queue, which may be a scheduled retry."""
+        try:
+            await self._deliver(item.email_request, item.tracking_id, attempts=item.attempts)
+        except ExecutorQueueFullError:
+            raise
+        except Exception as e:
+            # _deliver has already recorded the FAILED event
+            logger.error("Error delivering queued email %s: %s", item.tracking_id, e)
+
+    def list_dead_letters(self, after: int = 0, limit: int = 100) -> List[QueuedEmail]:
+        """Emails that failed for good, oldest first."""
+        return email_queue.dead_letters(after=after, limit=limit)
+
+    async def replay_dead_letters(self, item_id: Optional[int] = None) -> List[EmailResponse]:
+        """Queue one dead letter, or all of them, for another round of delivery attempts."""
+        responses = []
+        for item in email_queue.replay(item_id):
             await tracking_service.add_event(
-                tracking_id,
+                item.tracking_id,
                 EmailEvent(
                     event_type=EmailStatus.PENDING,
                     timestamp=datetime.utcnow(),
-                    metadata={"task_id": email_request.task_id}
+                    metadata={"replayed": "true", "previous_attempts": str(item.attempts)}
                 )
             )
-            
-            # Generate tracking pixel and links
-            tracking_pixel = await tracking_service.generate_tracking_pixel(tracking_id)
-            
-            # Render the email template
-            try:
-                html_content = render_template(
-                    "email_templates/task_notification.html",
-                    task_title=email_request.task_title,
-                    task_description=email_request.task_description,
-                    priority=email_request.priority.value,
-                    tracking_id=tracking_id,
-                    tracking_url=settings.EMAIL_SERVICE_URL,
-                    # Add HubSpot fields
-                    hubspot_portal_id=email_request.hubspot_portal_id,
-                    hubspot_contact_id=email_request.hubspot_contact_id,
-                    hubspot_deal_id=email_request.hubspot_deal_id,
-                    task_url=email_request.task_url or "#"
-                )
-                logger.debug("Template rendered successfully")
-            except Exception as template_error:
-                logger.error(f"Template rendering error: {template_error}")
-                logger.error(traceback.format_exc())
-                raise
+            responses.append(EmailResponse(
+                status=EmailStatus.PENDING,
+                message_id="",
+                tracking_id=item.tracking_id,
+                timestamp=datetime.utcnow(),
+                delivery_attempts=item.attempts
+            ))
+        return responses
 
-            # Send the email
-            try:
-                logger.debug("Attempting to send email via Gmail service")
-                message_id = await gmail_service.send_message(
-                    to=email_request.to,
-                    subject=email_request.subject,
-                    html_content=html_content
-                )
-                logger.debug(f"Gmail service response - message_id: {message_id}")
-            except Exception as gmail_error:
-                logger.error(f"Gmail service error: {gmail_error}")
-                logger.error(traceback.format_exc())
-                
-                # Record failure event
-                await tracking_service.add_event(
-                    tracking_id,
-                    EmailEvent(
-                        event_type=EmailStatus.FAILED,
-                        timestamp=datetime.utcnow(),
-                        metadata={"error": str(gmail_error)}
-                    )
-                )
-                raise
+    async def send_batch_emails(self, email_requests: List[EmailRequest]) -> List[EmailResponse]:
+        """Send many task notification emails, through Gmail batch requests or pooled SMTP sessions."""
+        logger.debug("Starting batch send of %s emails", len(email_requests))
+        responses: List[Optional[EmailResponse]] = [None] * len(email_requests)
+        pending = []  # (index, tracking_id) for emails that rendered
+        emails = []
 
-            if message_id:
-                # Record success event
-                await tracking_service.add_event(
-                    tracking_id,
-                    EmailEvent(
-                        event_type=EmailStatus.SENT,
-                        timestamp=datetime.utcnow(),
-                        metadata={"message_id": message_id}
-                    )
-                )
-                
-                logger.info(f"Email sent successfully with message_id: {message_id}")
-                return EmailResponse(
-                    status=EmailStatus.SENT,
-                    message_id=message_id,
-                    tracking_id=tracking_id,
-                    timestamp=datetime.utcnow()
-                )
-            else:
-                # Record failure event
-                await tracking_service.add_event(
-                    tracking_id,
-                    EmailEvent(
-                        event_type=EmailStatus.FAILED,
-                        timestamp=datetime.utcnow(),
-                        metadata={"error": "No message_id received"}
-                    )
-                )
-                
-                logger.error("Email sending failed - no message_id received")
-                return EmailResponse(
+        for index, email_request in enumerate(email_requests):
+            tracking_id = await self._start_tracking(email_request)
+            try:
+                html_content = await self._render_task_email(email_request, tracking_id)
+            except Exception as template_error:
+                logger.error("Template rendering error: %s", template_error)
+                await self.record_result(tracking_id, EmailStatus.FAILED, {"error": str(template_error)})
+                responses[index] = EmailResponse(
                     status=EmailStatus.FAILED,
                     message_id="",
                     tracking_id=tracking_id,
-                    timestamp=datetime.utcnow()
+                    timestamp=datetime.utcnow(),
+                    delivery_attempts=1
                 )
+                continue
+            pending.append((index, tracking_id))
+            emails.append((email_request.to, email_request.subject, html_content))
 
-        except Exception as e:
-            logger.error(f"Error in send_task_email: {str(e)}")
-            logger.error(traceback.format_exc())
-            return EmailResponse(
+        try:
+            if emails:
+                self.breaker.before_call()
+        except CircuitOpenError as e:
+            for index, tracking_id in pending:
+                responses[index] = await self._schedule_retry(email_requests[index], tracking_id, 1, e)
+            pending, emails = [], []
+        results = await email_transport.send_batch(emails) if emails else []
+        if results:
+            # As with single sends, only transient errors count against the upstream
+            if any(message_id for message_id, _ in results) or not any(
+                error is not None and email_transport.is_transient(error) for _, error in results
+            ):
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+        for (index, tracking_id), (message_id, error) in zip(pending, results):
+            if message_id:
+                responses[index] = await self._record_sent(tracking_id, message_id, 1)
+                continue
+            error = error or RuntimeError("No message_id received")
+            if self._is_transient(error) and settings.EMAIL_RETRY_MAX_ATTEMPTS > 1:
+                responses[index] = await self._schedule_retry(email_requests[index], tracking_id, 1, error)
+                continue
+            await self._fail(email_requests[index], tracking_id, 1, error)
+            responses[index] = EmailResponse(
                 status=EmailStatus.FAILED,
                 message_id="",
-                timestamp=datetime.utcnow()
+                tracking_id=tracking_id,
+                timestamp=datetime.utcnow(),
+                delivery_attempts=1
             )
 
-    async def get_email_status(self, message_id: str) -> Optional[EmailStatus]:
-        """Get the status of a sent email with tracking events."""
+        logger.info(
+            "Batch send finished: %s/%s sent",
+            sum(1 for r in responses if r.status == EmailStatus.SENT), len(responses)
+        )
+        return responses
+
+    async def get_email_status(self, message_id: str) -> Optional[StatusSummary]:
+        """Get the status summary of an email by message ID, or by tracking ID."""
         try:
-            events = await tracking_service.get_email_events(message_id)
-            if not events:
-                return None
-                
-            # Return the most recent status
-            return events[-1].event_type
+            summary = await tracking_service.get_status_by_message_id(message_id)
+            if summary is None:
+                summary = await tracking_service.get_status(message_id)
+            return summary
         except Exception as e:
-            logger.error(f"Error getting email status: {e}")
+            logger.error("Error getting email status: %s", e)
             return None
 
-email_service = EmailService() 
\ No newline at end of file
+email_service = EmailService()
+
+register_collector(email_service.digests.metrics)
+register_collector(email_service.breaker.metrics)
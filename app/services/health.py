@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+import logging
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+from app.core.token_manager import token_manager
+from app.core.transports import email_transport
+from app.services.tracking import tracking_service
+
+logger = logging.getLogger(__name__)
+
+# A check returns a short description when healthy and raises when not
+Check = Callable[[], Awaitable[str]]
+
+class HealthChecker:
+    """Runs readiness checks in the background and keeps the last result for probes.
+
+    Probes only read ``result``, so they are cheap and never open upstream
+    connections themselves. A result older than three intervals (plus the
+    check timeout) reports not ready, so a stuck checker cannot keep
+    advertising a stale success.
+    """
+
+    def __init__(self, checks: Dict[str, Check], interval: float, timeout: float,
+                 clock: Callable[[], float] = time.time):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self._clock = clock
+        self._result: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+
+    async def _run_check(self, name: str, check: Check) -> Dict:
+        started = time.perf_counter()
+        try:
+            ok, detail = True, await asyncio.wait_for(check(), self.timeout)
+        except asyncio.TimeoutError:
+            ok, detail = False, f"timed out after {self.timeout:g}s"
+        except Exception as e:
+            ok, detail = False, str(e) or type(e).__name__
+        if not ok:
+            logger.warning("Health check %s failed: %s", name, detail)
+        return {"ok": ok, "detail": detail, "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def run_checks(self) -> Dict:
+        """Run every check concurrently and cache the result."""
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._run_check(name, self.checks[name]) for name in names))
+        checks = dict(zip(names, results))
+        self._result = {
+            "ready": all(check["ok"] for check in checks.values()),
+            "checked_at": self._clock(),
+            "checks": checks,
+        }
+        self.runs += 1
+        return self._result
+
+    @property
+    def result(self) -> Dict:
+        """The cached readiness result; not ready before the first run or once stale."""
+        if self._result is None:
+            return {"ready": False, "checked_at": None, "checks": {}, "detail": "Not checked yet"}
+        age = self._clock() - self._result["checked_at"]
+        if age > self.interval * 3 + self.timeout:
+            return {**self._result, "ready": False, "detail": f"Last checked {age:.0f}s ago"}
+        return self._result
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_checks()
+            except Exception:
+                logger.exception("Health checks failed to run")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Check now and then every ``interval`` seconds in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def metrics(self):
+        """Cached readiness for /metrics."""
+        result = self.result
+        yield "health_ready", "gauge", "1 if the last readiness check passed and is fresh.", [
+            ({}, int(result["ready"]))
+        ]
+        yield "health_check_ok", "gauge", "1 if the named check passed on the last run.", [
+            ({"check": name}, int(check["ok"])) for name, check in result["checks"].items()
+        ]
+        yield "health_check_duration_seconds", "gauge", "How long the named check took on the last run.", [
+            ({"check": name}, check["duration_ms"] / 1000) for name, check in result["checks"].items()
+        ]
+        yield "health_check_runs_total", "counter", "Background readiness check runs.", [({}, self.runs)]
+
+async def check_gmail_token() -> str:
+    """Pass while the cached access token is unexpired; never refreshes it."""
+    expires_in = token_manager.token_expires_in()
+    if expires_in is None:
+        raise RuntimeError("No Gmail access token yet")
+    if expires_in <= 0:
+        raise RuntimeError("Gmail access token expired")
+    return f"Valid for {expires_in:.0f}s"
+
+def default_checks() -> Dict[str, Check]:
+    checks: Dict[str, Check] = {
+        "transport": email_transport.check,
+        "tracking_store": tracking_service.check,
+    }
+    if settings.EMAIL_TRANSPORT == "gmail":
+        checks["gmail_token"] = check_gmail_token
+    return checks
+
+health_checker = HealthChecker(default_checks(), settings.HEALTH_CHECK_INTERVAL, settings.HEALTH_CHECK_TIMEOUT)
+register_collector(health_checker.metrics)
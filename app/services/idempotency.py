@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+from app.models.email import EmailRequest, EmailResponse, EmailStatus
+
+logger = logging.getLogger(__name__)
+
+# Responses worth replaying; failures are not cached so a retry can succeed
+REPLAYABLE_STATUSES = {EmailStatus.SENT, EmailStatus.PENDING}
+
+def idempotency_key(email_request: EmailRequest, header_key: Optional[str] = None) -> Optional[str]:
+    """The dedup key for a send: the Idempotency-Key header, else one derived from task, recipient and subject."""
+    if header_key:
+        return "header:" + header_key
+    if not settings.IDEMPOTENCY_DERIVE_KEY:
+        return None
+    digest = hashlib.sha256(
+        "\0".join((email_request.task_id, email_request.to.lower(), email_request.subject)).encode("utf-8")
+    ).hexdigest()
+    return "derived:" + digest
+
+class IdempotencyCache:
+    """Remembers recent send responses so retried requests are not sent twice.
+
+    Completed responses live in an LRU ordered dict for ``ttl_seconds``,
+    capped at ``max_entries``. A request whose key is still being processed
+    waits on the first request's future instead of sending again.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.hits = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, Tuple[float, EmailResponse]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[EmailResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: str, response: EmailResponse) -> None:
+        self._entries[key] = (self.clock() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def run(self, key: Optional[str],
+                  send: Callable[[], Awaitable[EmailResponse]]) -> Tuple[EmailResponse, bool]:
+        """Return ``(response, replayed)``, calling ``send`` only if no response for ``key`` exists."""
+        if key is None:
+            return await send(), False
+
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached, True
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            self.coalesced += 1
+            logger.debug("Waiting on in-flight send for idempotency key %s", key)
+            try:
+                return await asyncio.shield(in_flight), True
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise  # This request was cancelled
+                # The first request was cancelled, e.g. its client went away; send for this one instead
+                logger.debug("In-flight send for idempotency key %s was cancelled, taking over", key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await send()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        except BaseException:
+            # Cancellation is this request's own; waiters retry rather than fail with it
+            future.cancel()
+            raise
+        else:
+            if response.status in REPLAYABLE_STATUSES:
+                self.put(key, response)
+            future.set_result(response)
+            return response, False
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+        }
+
+    def metrics(self):
+        """Replay counts for /metrics."""
+        yield "email_idempotent_replays_total", "counter", "Sends answered from an earlier response.", [
+            ({"source": "cache"}, self.hits), ({"source": "in_flight"}, self.coalesced)
+        ]
+        yield "email_idempotency_entries", "gauge", "Responses held for replay.", [({}, len(self._entries))]
+
+idempotency_cache = IdempotencyCache(settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_TTL_SECONDS)
+register_collector(idempotency_cache.metrics)
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+import logging
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+from app.models.email import EmailStatus
+from app.services.tracking import EmailTrackingService, tracking_service
+from app.services.tracking_store import EventRow
+
+logger = logging.getLogger(__name__)
+
+class TrackingIngestor:
+    """Write-behind buffer between the tracking endpoints and the tracking store.
+
+    Endpoints ``push`` raw event tuples onto a bounded deque (appends are
+    atomic, so no lock is needed) and return immediately. A background task
+    drains the buffer into the tracking service whenever ``batch_size``
+    events are waiting or every ``flush_interval`` seconds, whichever comes
+    first. When the buffer is full new events are dropped and counted rather
+    than slowing the endpoints down.
+    """
+
+    def __init__(self, service: EmailTrackingService, capacity: int, batch_size: int, flush_interval: float):
+        self.service = service
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.ingested = 0
+        self._buffer: Deque[EventRow] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def push(self, tracking_id: str, event_type: EmailStatus, user_agent: Optional[str],
+             ip_address: Optional[str], metadata: Optional[Dict[str, str]]) -> bool:
+        """Buffer one event. Returns False if it was dropped because the buffer is full."""
+        buffer = self._buffer
+        if len(buffer) >= self.capacity:
+            self.dropped += 1
+            return False
+        buffer.append((tracking_id, event_type, time.time(), user_agent, ip_address, metadata))
+        if len(buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def flush(self) -> int:
+        """Move everything buffered into the tracking service. Returns the number of events written."""
+        buffer = self._buffer
+        count = len(buffer)
+        if not count:
+            return 0
+        rows = [buffer.popleft() for _ in range(count)]
+        try:
+            self.service.record_rows(rows)
+        except Exception as e:
+            # Put the batch back in front of newer events for the next flush, as far as the buffer has room
+            keep = max(0, min(count, self.capacity - len(buffer)))
+            buffer.extendleft(reversed(rows[:keep]))
+            self.dropped += count - keep
+            logger.error("Error recording %s tracking events, %s kept for retry: %s", count, keep, e)
+            return 0
+        self.ingested += count
+        return count
+
+    def metrics(self):
+        """Buffer state for /metrics."""
+        yield "tracking_ingest_pending", "gauge", "Tracking events buffered for the store.", [({}, self.pending)]
+        yield "tracking_ingest_events_total", "counter", "Tracking events written to the store.", [
+            ({}, self.ingested)
+        ]
+        yield "tracking_ingest_dropped_total", "counter", "Tracking events dropped because the buffer was full.", [
+            ({}, self.dropped)
+        ]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Error flushing tracking events: %s", e)
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        flushed = self.flush()
+        if flushed:
+            logger.info("Flushed %s buffered tracking events on shutdown", flushed)
+        if self.dropped:
+            logger.warning("Dropped %s tracking events because the ingest buffer was full", self.dropped)
+
+tracking_ingestor = TrackingIngestor(
+    tracking_service,
+    capacity=settings.TRACKING_INGEST_BUFFER_SIZE,
+    batch_size=settings.TRACKING_INGEST_BATCH_SIZE,
+    flush_interval=settings.TRACKING_INGEST_FLUSH_INTERVAL
+)
+register_collector(tracking_ingestor.metrics)
@@ -0,0 +1,428 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from jinja2 import Template, TemplateError
+from pydantic import EmailStr, TypeAdapter, ValidationError
+
+from app.core.config import settings
+from app.core.executor import ExecutorQueueFullError
+from app.core.metrics import register_collector
+from app.models.email import EmailStatus, MailMergeJob, MailMergeRow, MailMergeState, Priority
+from app.services.email import email_service
+from app.services.tracking_store import from_epoch
+from app.utils.template import compile_text_template, env, render_compiled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = "email_templates/task_notification.html"
+TEMPLATE_PREFIX = "email_templates/"
+# Back-off before retrying a row the send pool had no room for
+BUSY_RETRY_SECONDS = 0.5
+# Row results are written at least this often, so progress shows up while sends are slow
+RESULT_FLUSH_SECONDS = 1.0
+UPLOAD_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+_recipient = TypeAdapter(EmailStr)
+
+class MailMergeError(Exception):
+    """The mail-merge request is invalid."""
+
+class UnsupportedUploadError(MailMergeError):
+    """The upload is not NDJSON or CSV."""
+
+class UploadTooLargeError(MailMergeError):
+    """The upload is larger than MAIL_MERGE_MAX_UPLOAD_BYTES."""
+
+# (row, to, status, tracking_id, message_id, error)
+RowResult = Tuple[int, Optional[str], str, Optional[str], Optional[str], Optional[str]]
+
+def read_rows(upload, upload_format: str) -> Iterator[Tuple[int, Optional[str], Dict[str, str], Optional[str]]]:
+    """Parse an uploaded recipient list as ``(row, to, variables, error)``, one row at a time."""
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    if upload_format == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), 1):
+            row.pop(None, None)  # Values beyond the header
+            to = row.pop("to", None)
+            yield row_number, to, {key: value or "" for key, value in row.items()}, None
+        return
+
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield row_number, None, {}, "Invalid JSON"
+            continue
+        if not isinstance(data, dict):
+            yield row_number, None, {}, "Row is not a JSON object"
+            continue
+        to = data.pop("to", None)
+        yield row_number, None if to is None else str(to), {key: "" if value is None else str(value) for key, value in data.items()}, None
+
+class MailMergeStore:
+    """Mail-merge jobs and their per-row results in SQLite."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS mail_merge_jobs (
+                    id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    template TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    finished_at REAL,
+                    rows_read INTEGER NOT NULL DEFAULT 0,
+                    sent INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                );
+                CREATE TABLE IF NOT EXISTS mail_merge_rows (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    row INTEGER NOT NULL,
+                    recipient TEXT,
+                    status TEXT NOT NULL,
+                    tracking_id TEXT,
+                    message_id TEXT,
+                    error TEXT,
+                    PRIMARY KEY (job_id, seq)
+                ) WITHOUT ROWID;
+            """)
+            self._conn = conn
+        return self._conn
+
+    def create_job(self, job_id: str, template: str, subject: str, created_at: float) -> None:
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO mail_merge_jobs (id, state, template, subject, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, MailMergeState.RUNNING.value, template, subject, created_at)
+            )
+
+    def add_results(self, job_id: str, first_seq: int, results: List[RowResult],
+                    rows_read: int, sent: int, failed: int) -> None:
+        """Append row results, numbered from ``first_seq``, and update the job's counters."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT INTO mail_merge_rows "
+                    "(job_id, seq, row, recipient, status, tracking_id, message_id, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(job_id, first_seq + i, *result) for i, result in enumerate(results)]
+                )
+                conn.execute(
+                    "UPDATE mail_merge_jobs SET rows_read = ?, sent = ?, failed = ? WHERE id = ?",
+                    (rows_read, sent, failed, job_id)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def finish_job(self, job_id: str, state: MailMergeState, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._connect().execute(
+                "UPDATE mail_merge_jobs SET state = ?, error = ?, finished_at = ? WHERE id = ?",
+                (state.value, error, time.time(), job_id)
+            )
+
+    def get_job(self, job_id: str) -> Optional[MailMergeJob]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT id, state, template, subject, created_at, finished_at, rows_read, sent, failed, error "
+                "FROM mail_merge_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return MailMergeJob(
+            job_id=row[0],
+            state=MailMergeState(row[1]),
+            template=row[2],
+            subject=row[3],
+            created_at=from_epoch(row[4]),
+            finished_at=from_epoch(row[5]) if row[5] is not None else None,
+            rows_read=row[6],
+            sent=row[7],
+            failed=row[8],
+            error=row[9]
+        )
+
+    def get_rows(self, job_id: str, after: int, limit: int) -> List[Tuple[int, MailMergeRow]]:
+        """Up to ``limit`` results completed after position ``after``, as ``(seq, row)``."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT seq, row, recipient, status, tracking_id, message_id, error FROM mail_merge_rows "
+                "WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit)
+            ).fetchall()
+        return [
+            (seq, MailMergeRow(
+                row=row, to=to, status=EmailStatus(status), tracking_id=tracking_id,
+                message_id=message_id, error=error
+            ))
+            for seq, row, to, status, tracking_id, message_id, error in rows
+        ]
+
+    def recover(self) -> int:
+        """Mark jobs that were running when the process last stopped as interrupted."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE mail_merge_jobs SET state = ?, finished_at = ? WHERE state = ?",
+                (MailMergeState.INTERRUPTED.value, time.time(), MailMergeState.RUNNING.value)
+            )
+        if cursor.rowcount:
+            logger.warning("Marked %s mail-merge jobs interrupted by a restart", cursor.rowcount)
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+@dataclass
+class _Job:
+    id: str
+    upload: tempfile.SpooledTemporaryFile
+    upload_format: str
+    template: Template
+    subject: Template
+    priority: int
+    rows_read: int = 0
+    sent: int = 0
+    failed: int = 0
+    next_seq: int = 1
+    results: List[RowResult] = field(default_factory=list)
+    last_flush: float = field(default_factory=time.monotonic)
+
+class MailMergeService:
+    """Sends one template to every row of an uploaded recipient list.
+
+    The upload is spooled to a temporary file, then a background task parses
+    it row by row into a bounded queue drained by ``concurrency`` senders, so
+    memory use does not depend on the list size. The HTML template and the
+    subject are compiled once per job. Row results are written to SQLite in
+    batches and can be paged by job ID while the job runs.
+    """
+
+    def __init__(self, store: MailMergeStore, concurrency: int, queue_size: int, result_batch: int):
+        self.store = store
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.result_batch = result_batch
+        self.rows_sent = 0
+        self.rows_failed = 0
+        self._jobs: Dict[str, _Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self) -> None:
+        self.store.recover()
+
+    async def stop(self) -> None:
+        """Cancel running jobs; they are marked interrupted."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.store.close()
+
+    async def create_job(self, chunks: AsyncIterator[bytes], content_type: str, subject: str,
+                         template_name: str = DEFAULT_TEMPLATE,
+                         priority: Priority = Priority.MEDIUM) -> MailMergeJob:
+        """Spool an uploaded recipient list and start sending it in the background."""
+        upload_format = UPLOAD_FORMATS.get(content_type.split(";")[0].strip().lower())
+        if upload_format is None:
+            raise UnsupportedUploadError(f"Upload must be one of: {', '.join(UPLOAD_FORMATS)}")
+        if not template_name.startswith(TEMPLATE_PREFIX) or template_name not in env.list_templates():
+            raise MailMergeError(f"Unknown template: {template_name}")
+        try:
+            subject_template = compile_text_template(subject)
+        except TemplateError as e:
+            raise MailMergeError(f"Invalid subject template: {e}")
+
+        upload = tempfile.SpooledTemporaryFile(max_size=settings.MAIL_MERGE_SPOOL_MEMORY)
+        try:
+            size = 0
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > settings.MAIL_MERGE_MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError(
+                        f"Upload is larger than {settings.MAIL_MERGE_MAX_UPLOAD_BYTES} bytes"
+                    )
+                upload.write(chunk)
+            upload.seek(0)
+            if upload_format == "csv":
+                header = next(csv.reader([upload.readline().decode("utf-8-sig", "replace")]), [])
+                if "to" not in header:
+                    raise MailMergeError("CSV header must include a 'to' column")
+                upload.seek(0)
+        except BaseException:
+            upload.close()
+            raise
+
+        job = _Job(
+            id=uuid.uuid4().hex,
+            upload=upload,
+            upload_format=upload_format,
+            template=env.get_template(template_name),
+            subject=subject_template,
+            priority=priority.value
+        )
+        self.store.create_job(job.id, template_name, subject, time.time())
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        logger.info("Started mail-merge job %s (%s bytes of %s)", job.id, size, upload_format)
+        return self.get_job(job.id)
+
+    def get_job(self, job_id: str) -> Optional[MailMergeJob]:
+        """Job state, with live counters while it runs."""
+        result = self.store.get_job(job_id)
+        job = self._jobs.get(job_id)
+        if result is not None and job is not None:
+            result = result.model_copy(update={"rows_read": job.rows_read, "sent": job.sent, "failed": job.failed})
+        return result
+
+    def get_rows(self, job_id: str, after: int = 0, limit: int = 100) -> List[Tuple[int, MailMergeRow]]:
+        return self.store.get_rows(job_id, after, limit)
+
+    async def _run(self, job: _Job) -> None:
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        senders = [asyncio.create_task(self._sender(job, queue)) for _ in range(self.concurrency)]
+        state, error = MailMergeState.COMPLETED, None
+        try:
+            for item in read_rows(job.upload, job.upload_format):
+                job.rows_read = item[0]
+                await queue.put(item)  # Waits while the senders are behind
+            for _ in senders:
+                await queue.put(None)
+            await asyncio.gather(*senders)
+        except asyncio.CancelledError:
+            state = MailMergeState.INTERRUPTED
+            raise
+        except Exception as e:
+            logger.exception("Mail-merge job %s failed", job.id)
+            state, error = MailMergeState.FAILED, str(e)
+        finally:
+            for sender in senders:
+                sender.cancel()
+            await asyncio.gather(*senders, return_exceptions=True)
+            job.upload.close()
+            self._flush_results(job)
+            self.store.finish_job(job.id, state, error)
+            del self._jobs[job.id]
+            del self._tasks[job.id]
+            logger.info("Mail-merge job %s %s: %s sent, %s failed", job.id, state.value, job.sent, job.failed)
+
+    async def _sender(self, job: _Job, queue: asyncio.Queue) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            row_number, to, variables, error = item
+            if error is None:
+                try:
+                    result = await self._send_row(job, row_number, to, variables)
+                except Exception as e:
+                    logger.exception("Mail-merge job %s row %s failed", job.id, row_number)
+                    result = (row_number, to, EmailStatus.FAILED.value, None, None, str(e))
+            else:
+                result = (row_number, to, EmailStatus.FAILED.value, None, None, error)
+            self._record(job, result)
+
+    async def _send_row(self, job: _Job, row_number: int, to: Optional[str],
+                        variables: Dict[str, str]) -> RowResult:
+        try:
+            to = _recipient.validate_python(to)
+        except ValidationError:
+            return row_number, to, EmailStatus.FAILED.value, None, None, "Invalid or missing 'to' address"
+
+        tracking_id = await email_service.start_tracking({"merge_job": job.id, "row": str(row_number)})
+        try:
+            context = {"task_url": "#", **variables}
+            context["priority"] = int(variables.get("priority") or job.priority)
+            context["tracking_id"] = tracking_id
+            context["tracking_url"] = settings.EMAIL_SERVICE_URL
+            subject = job.subject.render(context)
+            html_content = render_compiled(job.template, **context)
+        except Exception as e:
+            await email_service.record_result(tracking_id, EmailStatus.FAILED, {"error": str(e)})
+            return row_number, to, EmailStatus.FAILED.value, tracking_id, None, f"Render failed: {e}"
+
+        while True:
+            try:
+                response = await email_service.send_html(tracking_id, to, subject, html_content)
+                break
+            except ExecutorQueueFullError:
+                await asyncio.sleep(BUSY_RETRY_SECONDS)
+            except Exception as e:
+                # send_html has already retried transient failures and recorded the FAILED event
+                return row_number, to, EmailStatus.FAILED.value, tracking_id, None, str(e)
+        return (
+            row_number, to, response.status.value, tracking_id, response.message_id or None,
+            None if response.status == EmailStatus.SENT else "No message_id received"
+        )
+
+    def _record(self, job: _Job, result: RowResult) -> None:
+        if result[2] == EmailStatus.SENT.value:
+            job.sent += 1
+            self.rows_sent += 1
+        else:
+            job.failed += 1
+            self.rows_failed += 1
+        job.results.append(result)
+        if len(job.results) >= self.result_batch or time.monotonic() - job.last_flush >= RESULT_FLUSH_SECONDS:
+            self._flush_results(job)
+
+    def _flush_results(self, job: _Job) -> None:
+        results, job.results = job.results, []
+        job.last_flush = time.monotonic()
+        self.store.add_results(job.id, job.next_seq, results, job.rows_read, job.sent, job.failed)
+        job.next_seq += len(results)
+
+    def metrics(self):
+        """Job and row counts for /metrics."""
+        yield "mail_merge_jobs_running", "gauge", "Mail-merge jobs in progress.", [({}, len(self._tasks))]
+        yield "mail_merge_rows_total", "counter", "Mail-merge rows processed by outcome.", [
+            ({"status": "sent"}, self.rows_sent), ({"status": "failed"}, self.rows_failed)
+        ]
+
+mail_merge_service = MailMergeService(
+    MailMergeStore(settings.MAIL_MERGE_DB_PATH),
+    concurrency=settings.MAIL_MERGE_CONCURRENCY,
+    queue_size=settings.MAIL_MERGE_QUEUE_SIZE,
+    result_batch=settings.MAIL_MERGE_RESULT_BATCH
+)
+register_collector(mail_merge_service.metrics)
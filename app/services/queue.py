@@ -0,0 +1,354 @@
+import asyncio
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+
+from app.core.config import settings
+from app.core.executor import ExecutorQueueFullError
+from app.core.metrics import register_collector
+from app.core.stats import LatencyStats
+from app.models.email import EmailRequest, Priority
+
+logger = logging.getLogger(__name__)
+
+# How long a worker waits before polling the queue again when it looks empty
+IDLE_POLL_SECONDS = 1.0
+# Back-off before retrying an email the send pool had no room for
+BUSY_RETRY_SECONDS = 0.5
+
+# Columns added after the first release, with their definitions for ALTER TABLE
+_ADDED_COLUMNS = {
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "not_before": "REAL NOT NULL DEFAULT 0",
+    "last_error": "TEXT",
+    "claimed_by": "TEXT",
+    "claimed_at": "REAL NOT NULL DEFAULT 0",
+}
+
+def retry_delay(attempt: int, base: float, cap: float) -> float:
+    """Backoff before the retry after ``attempt`` failed attempts: exponential, capped, with jitter.
+
+    Half the delay is fixed and half random, so retries of emails that
+    failed together spread out without any of them retrying right away.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+@dataclass
+class QueuedEmail:
+    id: int
+    tracking_id: str
+    priority: int
+    enqueued_at: float  # For dead letters, when the email was dead-lettered
+    email_request: EmailRequest
+    attempts: int = 0  # Delivery attempts already made
+    last_error: Optional[str] = None
+
+_ITEM_COLUMNS = "id, tracking_id, priority, enqueued_at, payload, attempts, last_error"
+
+def _item_from_row(row) -> QueuedEmail:
+    return QueuedEmail(
+        id=row[0],
+        tracking_id=row[1],
+        priority=row[2],
+        enqueued_at=row[3],
+        email_request=EmailRequest.model_validate_json(row[4]),
+        attempts=row[5],
+        last_error=row[6]
+    )
+
+class EmailQueue:
+    """Durable priority queue of task emails waiting to be sent.
+
+    Emails are stored in SQLite so accepted work survives a restart. Workers
+    always take the due email with the lowest ``sort_key``, which is
+    ``priority * aging_seconds + enqueued_at``: HIGHEST (1) goes before
+    LOWEST (5), but every ``aging_seconds`` spent waiting counts as one
+    priority level, so low-priority mail cannot starve. Because the aging term
+    grows at the same rate for every row, the key never changes after insert
+    and the next email is a single index lookup.
+
+    Failed sends come back as rows with ``attempts`` set and a ``not_before``
+    time, so scheduled retries survive a restart too. Emails that run out of
+    attempts stay in the table in the ``dead`` state until they are replayed.
+
+    Several processes may share the database, so a claim is a lease: the row
+    records who claimed it and when, and only leases older than
+    ``lease_seconds`` are taken back from a worker that stopped.
+    """
+
+    def __init__(self, db_path: str, aging_seconds: float, lease_seconds: float = 300.0):
+        self.db_path = db_path
+        self.aging_seconds = aging_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._next_recover = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self.wait_time = LatencyStats()
+        self.latency_by_priority: Dict[int, LatencyStats] = {p.value: LatencyStats() for p in Priority}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS email_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tracking_id TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    sort_key REAL NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    payload TEXT NOT NULL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(email_queue)")}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE email_queue ADD COLUMN {column} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_email_queue_next ON email_queue (state, sort_key)")
+            self._conn = conn
+        return self._conn
+
+    def put(self, tracking_id: str, email_request: EmailRequest, attempts: int = 0, not_before: float = 0.0,
+            last_error: Optional[str] = None) -> int:
+        """Persist an email for delivery and wake a worker.
+
+        Retries pass the attempts made so far and the epoch time before which
+        the email must not be sent again.
+        """
+        now = time.time()
+        priority = email_request.priority.value
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT INTO email_queue (tracking_id, priority, enqueued_at, sort_key, payload, attempts, "
+                "not_before, last_error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (tracking_id, priority, now, priority * self.aging_seconds + now,
+                 email_request.model_dump_json(), attempts, not_before, last_error)
+            )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return cursor.lastrowid
+
+    def dead_letter(self, tracking_id: str, email_request: EmailRequest, attempts: int, error: str) -> int:
+        """Keep an email that failed for good so it can be inspected and replayed."""
+        now = time.time()
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT INTO email_queue (tracking_id, priority, enqueued_at, sort_key, state, payload, attempts, "
+                "last_error) VALUES (?, ?, ?, 0, 'dead', ?, ?, ?)",
+                (tracking_id, email_request.priority.value, now, email_request.model_dump_json(), attempts, error)
+            )
+        return cursor.lastrowid
+
+    def claim(self) -> Optional[QueuedEmail]:
+        """Take the next email off the queue, or None if it is empty."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"SELECT {_ITEM_COLUMNS} FROM email_queue "
+                    "WHERE state = 'queued' AND not_before <= ? ORDER BY sort_key LIMIT 1",
+                    (time.time(),)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE email_queue SET state = 'processing', claimed_by = ?, claimed_at = ? WHERE id = ?",
+                        (self.owner, time.time(), row[0])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return _item_from_row(row) if row is not None else None
+
+    def complete(self, item: QueuedEmail) -> None:
+        """Remove a delivered email from the queue."""
+        with self._lock:
+            self._connect().execute("DELETE FROM email_queue WHERE id = ?", (item.id,))
+
+    def release(self, item: QueuedEmail) -> None:
+        """Put a claimed email back so another worker can pick it up."""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE email_queue SET state = 'queued', claimed_by = NULL WHERE id = ?", (item.id,)
+            )
+
+    def recover(self) -> int:
+        """Requeue emails whose lease expired, i.e. claimed by a worker that stopped without finishing them."""
+        now = time.time()
+        self._next_recover = now + self.lease_seconds / 2
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE email_queue SET state = 'queued', claimed_by = NULL "
+                "WHERE state = 'processing' AND claimed_at < ?",
+                (now - self.lease_seconds,)
+            )
+        if cursor.rowcount:
+            logger.info("Requeued %s emails whose worker lease expired", cursor.rowcount)
+        return cursor.rowcount
+
+    def dead_letters(self, after: int = 0, limit: int = 100) -> List[QueuedEmail]:
+        """Dead-lettered emails with an id greater than ``after``, oldest first."""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {_ITEM_COLUMNS} FROM email_queue WHERE state = 'dead' AND id > ? ORDER BY id LIMIT ?",
+                (after, limit)
+            ).fetchall()
+        return [_item_from_row(row) for row in rows]
+
+    def replay(self, item_id: Optional[int] = None) -> List[QueuedEmail]:
+        """Queue one dead-lettered email, or all of them, for a fresh round of delivery attempts.
+
+        Returns the replayed emails as they were before the replay.
+        """
+        now = time.time()
+        where = "state = 'dead'" + (" AND id = ?" if item_id is not None else "")
+        params = (item_id,) if item_id is not None else ()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(f"SELECT {_ITEM_COLUMNS} FROM email_queue WHERE {where}", params).fetchall()
+                conn.execute(
+                    f"UPDATE email_queue SET state = 'queued', attempts = 0, not_before = 0, enqueued_at = ?, "
+                    f"sort_key = priority * ? + ? WHERE {where}",
+                    (now, self.aging_seconds, now) + params
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if rows and self._wakeup is not None:
+            self._wakeup.set()
+        return [_item_from_row(row) for row in rows]
+
+    def depth(self) -> Dict[int, int]:
+        """Number of queued emails per priority."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT priority, COUNT(*) FROM email_queue WHERE state = 'queued' GROUP BY priority"
+            ).fetchall()
+        counts = {p.value: 0 for p in Priority}
+        counts.update(dict(rows))
+        return counts
+
+    def state_counts(self) -> Dict[str, int]:
+        """Emails due now, waiting for a scheduled retry, and dead-lettered."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT SUM(state = 'queued' AND not_before <= ?), SUM(state = 'queued' AND not_before > ?), "
+                "SUM(state = 'dead') FROM email_queue",
+                (time.time(), time.time())
+            ).fetchone()
+        return {"due": row[0] or 0, "retry_scheduled": row[1] or 0, "dead": row[2] or 0}
+
+    def stats(self) -> Dict:
+        """Queue depth, wait time and per-priority latency."""
+        depth = self.depth()
+        counts = self.state_counts()
+        return {
+            "depth": sum(depth.values()),
+            "depth_by_priority": depth,
+            "retry_scheduled": counts["retry_scheduled"],
+            "dead_letters": counts["dead"],
+            "workers": len(self._workers),
+            "wait_time": self.wait_time.as_dict(),
+            "latency_by_priority": {p: s.as_dict() for p, s in self.latency_by_priority.items()},
+        }
+
+    def metrics(self):
+        """Queue depth and latency for /metrics."""
+        yield "email_queue_depth", "gauge", "Emails waiting in the send queue.", [
+            ({"priority": str(priority)}, count) for priority, count in self.depth().items()
+        ]
+        counts = self.state_counts()
+        yield "email_queue_retry_scheduled", "gauge", "Emails waiting for a scheduled retry.", [
+            ({}, counts["retry_scheduled"])
+        ]
+        yield "email_queue_dead_letters", "gauge", "Emails that ran out of delivery attempts.", [
+            ({}, counts["dead"])
+        ]
+        yield "email_queue_wait_seconds_total", "counter", "Total time emails waited before a worker claimed them.", [
+            ({}, self.wait_time.total)
+        ]
+        yield "email_queue_claimed_total", "counter", "Emails claimed by queue workers.", [
+            ({}, self.wait_time.count)
+        ]
+        yield "email_queue_latency_seconds_total", "counter", "Total enqueue-to-delivery time by priority.", [
+            ({"priority": str(priority)}, stats.total) for priority, stats in self.latency_by_priority.items()
+        ]
+        yield "email_queue_delivered_total", "counter", "Emails delivered from the queue by priority.", [
+            ({"priority": str(priority)}, stats.count) for priority, stats in self.latency_by_priority.items()
+        ]
+
+    async def _worker(self, handler: Callable[[QueuedEmail], Awaitable[None]]) -> None:
+        while True:
+            # Clear before claiming so a put() racing with an empty claim
+            # still wakes this worker.
+            self._wakeup.clear()
+            if time.time() >= self._next_recover:
+                self.recover()
+            item = self.claim()
+            if item is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.wait_time.observe(time.time() - item.enqueued_at)
+            try:
+                await handler(item)
+            except ExecutorQueueFullError:
+                self.release(item)
+                await asyncio.sleep(BUSY_RETRY_SECONDS)
+                continue
+            except asyncio.CancelledError:
+                self.release(item)
+                raise
+            except Exception as e:
+                logger.error("Unhandled error delivering queued email %s: %s", item.tracking_id, e)
+            self.complete(item)
+            self.latency_by_priority[item.priority].observe(time.time() - item.enqueued_at)
+
+    def start_workers(self, handler: Callable[[QueuedEmail], Awaitable[None]], count: int) -> None:
+        """Start ``count`` background workers that feed queued emails to ``handler``."""
+        self._wakeup = asyncio.Event()
+        self.recover()
+        for _ in range(count):
+            self._workers.append(asyncio.create_task(self._worker(handler)))
+        logger.info("Started %s email queue workers", count)
+
+    async def stop_workers(self) -> None:
+        """Cancel the workers; emails they were sending go back on the queue."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+email_queue = EmailQueue(
+    settings.EMAIL_QUEUE_DB_PATH, settings.EMAIL_QUEUE_AGING_SECONDS, settings.EMAIL_QUEUE_LEASE_SECONDS
+)
+register_collector(email_queue.metrics)
@@ -0,0 +1,212 @@
+import json
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.models.email import EmailAnalytics, EmailStatus
+from app.services.analytics import BUCKET_SECONDS, PEAK_TIMES, AnalyticsAggregator, build_analytics
+from app.services.status_index import StatusSummary
+from app.services.tracking_store import SQLiteTrackingStore, add_hourly_counts, hourly_tables_sql
+
+logger = logging.getLogger(__name__)
+
+# SQLite allows at most 999 bound parameters per statement
+_LOOKUP_CHUNK = 500
+_STATUS_BY_VALUE = {status.value: status for status in EmailStatus}
+_FLAGGED = {EmailStatus.SENT, EmailStatus.OPENED, EmailStatus.CLICKED, EmailStatus.FAILED}
+# tracking_status columns, in StatusSummary slot order
+_STATUS_COLUMNS = StatusSummary.__slots__
+
+class SharedSQLiteTrackingStore(SQLiteTrackingStore):
+    """SQLite tracking store that also keeps the analytics counters, for running several workers.
+
+    Each worker folds the events it flushes into per-email status flags and
+    hourly counters stored next to the events, in the same transaction. The
+    flags are read under SQLite's write lock, so an email opened in two
+    workers still counts once. ``analytics_snapshot`` sums the hourly rows,
+    which gives every worker the same global answer. Per-email status rows
+    are kept the same way for the status endpoint.
+    """
+
+    shared = True
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = super()._connect()
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tracking_email_flags (
+                    tracking_id TEXT PRIMARY KEY,
+                    flags INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tracking_status (
+                    tracking_id TEXT PRIMARY KEY,
+                    message_id TEXT,
+                    status TEXT NOT NULL,
+                    sent_at REAL,
+                    delivered_at REAL,
+                    opened_at REAL,
+                    clicked_at REAL,
+                    last_event_at REAL,
+                    open_count INTEGER NOT NULL DEFAULT 0,
+                    click_count INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_tracking_status_message ON tracking_status(message_id);
+            """ + hourly_tables_sql("tracking_hourly", "tracking_failures"))
+        return self._conn
+
+    def _load_flags(self, conn: sqlite3.Connection, tracking_ids: List[str]) -> Dict[str, int]:
+        flags: Dict[str, int] = {}
+        for start in range(0, len(tracking_ids), _LOOKUP_CHUNK):
+            chunk = tracking_ids[start:start + _LOOKUP_CHUNK]
+            flags.update(conn.execute(
+                f"SELECT tracking_id, flags FROM tracking_email_flags "
+                f"WHERE tracking_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ))
+        return flags
+
+    def _load_statuses(self, conn: sqlite3.Connection, tracking_ids: List[str]) -> Dict[str, StatusSummary]:
+        summaries: Dict[str, StatusSummary] = {}
+        for start in range(0, len(tracking_ids), _LOOKUP_CHUNK):
+            chunk = tracking_ids[start:start + _LOOKUP_CHUNK]
+            for row in conn.execute(
+                f"SELECT {', '.join(_STATUS_COLUMNS)} FROM tracking_status "
+                f"WHERE tracking_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ):
+                summaries[row[0]] = _summary_from_row(row)
+        return summaries
+
+    def _fold_statuses(self, conn: sqlite3.Connection, events: List[Tuple]) -> None:
+        """Apply parsed events to the stored status rows. Caller holds the write transaction."""
+        summaries = self._load_statuses(conn, list({event[0] for event in events}))
+        for tracking_id, event_type, timestamp, metadata in events:
+            summary = summaries.get(tracking_id)
+            if summary is None:
+                summary = summaries[tracking_id] = StatusSummary(tracking_id)
+            summary.apply(event_type, timestamp, metadata)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO tracking_status ({', '.join(_STATUS_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(_STATUS_COLUMNS))})",
+            [_summary_to_row(summary) for summary in summaries.values()]
+        )
+
+    def _write_aggregates(self, conn: sqlite3.Connection, aggregator: AnalyticsAggregator,
+                          previous_flags: Dict[str, int]) -> None:
+        conn.executemany(
+            "INSERT INTO tracking_email_flags (tracking_id, flags) VALUES (?, ?) "
+            "ON CONFLICT (tracking_id) DO UPDATE SET flags = excluded.flags",
+            [(tid, flags) for tid, flags in aggregator.flags.items() if previous_flags.get(tid) != flags]
+        )
+        add_hourly_counts(conn, aggregator.buckets.items(), "tracking_hourly", "tracking_failures")
+
+    def _fold(self, conn: sqlite3.Connection, events: Iterable[Tuple]) -> int:
+        """Fold serialized event rows into the stored counters. Caller holds the write transaction."""
+        events = _parse_events(events)
+        aggregator = AnalyticsAggregator()
+        previous_flags = self._load_flags(conn, list({event[0] for event in events if event[1] in _FLAGGED}))
+        aggregator.seed_flags(previous_flags)
+        for event in events:
+            aggregator.record(*event)
+        self._write_aggregates(conn, aggregator, previous_flags)
+        self._fold_statuses(conn, events)
+        return len(events)
+
+    def _write_pending(self, conn: sqlite3.Connection) -> None:
+        super()._write_pending(conn)
+        if self._pending_events:
+            self._fold(conn, self._pending_events)
+
+    def backfill_analytics(self) -> int:
+        """Build the counters from stored events if they were never built. Returns events folded.
+
+        Covers databases written before TRACKING_SHARED_STORE was turned on,
+        and status rows for databases written before they existed. Runs under
+        an immediate transaction so only one worker does it.
+        """
+        select_events = (
+            "SELECT tracking_id, event_type, timestamp, user_agent, ip_address, metadata "
+            "FROM tracking_events ORDER BY id"
+        )
+        with self._lock:
+            self.flush()
+            with self._write_transaction() as conn:
+                count = 0
+                if conn.execute("SELECT 1 FROM tracking_hourly LIMIT 1").fetchone() is None:
+                    count = self._fold(conn, conn.execute(select_events))
+                elif conn.execute("SELECT 1 FROM tracking_status LIMIT 1").fetchone() is None:
+                    events = _parse_events(conn.execute(select_events))
+                    self._fold_statuses(conn, events)
+                    count = len(events)
+        if count:
+            logger.info("Backfilled shared analytics from %s stored events", count)
+        return count
+
+    def _evict_rows(self, conn: sqlite3.Connection, tracking_ids: List[str]) -> None:
+        """The hourly counters already include these emails; drop their events, flags and status."""
+        self._delete_emails(conn, tracking_ids)
+        placeholders = ",".join("?" * len(tracking_ids))
+        conn.execute(f"DELETE FROM tracking_email_flags WHERE tracking_id IN ({placeholders})", tracking_ids)
+        conn.execute(f"DELETE FROM tracking_status WHERE tracking_id IN ({placeholders})", tracking_ids)
+
+    def get_status(self, tracking_id: str) -> Optional[StatusSummary]:
+        return self._query_status("tracking_id", tracking_id)
+
+    def get_status_by_message_id(self, message_id: str) -> Optional[StatusSummary]:
+        return self._query_status("message_id", message_id)
+
+    def _query_status(self, column: str, value: str) -> Optional[StatusSummary]:
+        with self._lock:
+            self.flush()
+            row = self._connect().execute(
+                f"SELECT {', '.join(_STATUS_COLUMNS)} FROM tracking_status WHERE {column} = ? LIMIT 1",
+                (value,)
+            ).fetchone()
+        return _summary_from_row(row) if row is not None else None
+
+    def analytics_snapshot(self, days: Optional[int] = None, now: Optional[float] = None) -> EmailAnalytics:
+        """Analytics across all workers for the last ``days`` days, or all time when None."""
+        first_hour = 0
+        if days is not None:
+            first_hour = int(((now or time.time()) - days * 86400) // BUCKET_SECONDS)
+        with self._lock:
+            self.flush()
+            conn = self._connect()
+            sent, opened, clicked, failed = conn.execute(
+                "SELECT COALESCE(SUM(sent), 0), COALESCE(SUM(opened), 0), "
+                "COALESCE(SUM(clicked), 0), COALESCE(SUM(failed), 0) "
+                "FROM tracking_hourly WHERE hour >= ?",
+                (first_hour,)
+            ).fetchone()
+            peak_hours = [hour for hour, in conn.execute(
+                "SELECT hour FROM tracking_hourly WHERE hour >= ? AND open_events + click_events > 0 "
+                "ORDER BY open_events + click_events DESC, hour DESC LIMIT ?",
+                (first_hour, PEAK_TIMES)
+            )]
+            failures = dict(conn.execute(
+                "SELECT reason, SUM(count) FROM tracking_failures WHERE hour >= ? GROUP BY reason",
+                (first_hour,)
+            ).fetchall())
+        return build_analytics(sent, opened, clicked, failed, peak_hours, failures)
+
+def _parse_events(rows: Iterable[Tuple]) -> List[Tuple]:
+    """Serialized event rows as ``(tracking_id, event_type, timestamp, metadata)``."""
+    return [
+        (tracking_id, _STATUS_BY_VALUE[event_type], timestamp, json.loads(metadata) if metadata else None)
+        for tracking_id, event_type, timestamp, _, _, metadata in rows
+    ]
+
+def _summary_from_row(row: Tuple) -> StatusSummary:
+    summary = StatusSummary(row[0])
+    for name, value in zip(_STATUS_COLUMNS[1:], row[1:]):
+        setattr(summary, name, value)
+    summary.status = _STATUS_BY_VALUE[summary.status]
+    return summary
+
+def _summary_to_row(summary: StatusSummary) -> Tuple:
+    return tuple(
+        getattr(summary, name).value if name == "status" else getattr(summary, name)
+        for name in _STATUS_COLUMNS
+    )
@@ -0,0 +1,101 @@
+from typing import Dict, Optional
+
+from app.models.email import EmailStatus
+from app.services.tracking_store import last_seen, repeat_count
+
+# Later stages win when deciding an email's current status, so a pixel load
+# after a click does not turn "clicked" back into "opened". The exception is
+# PENDING after FAILED, which means the email was queued again (a dead-letter
+# replay) and supersedes the failure.
+STATUS_RANK = {
+    EmailStatus.PENDING: 0,
+    EmailStatus.FAILED: 1,
+    EmailStatus.SENT: 2,
+    EmailStatus.DELIVERED: 3,
+    EmailStatus.OPENED: 4,
+    EmailStatus.CLICKED: 5,
+}
+
+class StatusSummary:
+    """Latest state of one email, updated event by event. Timestamps are epoch seconds."""
+    __slots__ = ("tracking_id", "message_id", "status", "sent_at", "delivered_at", "opened_at",
+                 "clicked_at", "last_event_at", "open_count", "click_count", "error")
+
+    def __init__(self, tracking_id: str):
+        self.tracking_id = tracking_id
+        self.message_id: Optional[str] = None
+        self.status = EmailStatus.PENDING
+        self.sent_at: Optional[float] = None
+        self.delivered_at: Optional[float] = None
+        self.opened_at: Optional[float] = None  # First open
+        self.clicked_at: Optional[float] = None  # First click
+        self.last_event_at: Optional[float] = None
+        self.open_count = 0
+        self.click_count = 0
+        self.error: Optional[str] = None
+
+    def apply(self, event_type: EmailStatus, timestamp: float, metadata: Optional[Dict[str, str]]) -> None:
+        if event_type == EmailStatus.PENDING and self.status == EmailStatus.FAILED:
+            self.status = EmailStatus.PENDING
+            self.error = None
+        elif STATUS_RANK[event_type] >= STATUS_RANK[self.status]:
+            self.status = event_type
+        latest = timestamp
+        if event_type == EmailStatus.SENT:
+            self.sent_at = timestamp
+            if metadata and metadata.get("message_id"):
+                self.message_id = metadata["message_id"]
+        elif event_type == EmailStatus.OPENED:
+            # Compacted repeats carry their count and last-seen time in metadata
+            self.open_count += repeat_count(metadata)
+            latest = last_seen(timestamp, metadata)
+            if self.opened_at is None or timestamp < self.opened_at:
+                self.opened_at = timestamp
+        elif event_type == EmailStatus.CLICKED:
+            self.click_count += repeat_count(metadata)
+            latest = last_seen(timestamp, metadata)
+            if self.clicked_at is None or timestamp < self.clicked_at:
+                self.clicked_at = timestamp
+        elif event_type == EmailStatus.DELIVERED:
+            self.delivered_at = timestamp
+        elif event_type == EmailStatus.FAILED:
+            self.error = (metadata or {}).get("error")
+        if self.last_event_at is None or latest > self.last_event_at:
+            self.last_event_at = latest
+
+class StatusIndex:
+    """Per-email status summaries plus a message_id -> tracking_id index, both O(1) to read."""
+
+    def __init__(self):
+        self._summaries: Dict[str, StatusSummary] = {}
+        self._by_message: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def record(self, tracking_id: str, event_type: EmailStatus, timestamp: float,
+               metadata: Optional[Dict[str, str]] = None) -> None:
+        summary = self._summaries.get(tracking_id)
+        if summary is None:
+            summary = self._summaries[tracking_id] = StatusSummary(tracking_id)
+        summary.apply(event_type, timestamp, metadata)
+        if summary.message_id is not None and event_type == EmailStatus.SENT:
+            self._by_message[summary.message_id] = tracking_id
+
+    def reset(self) -> None:
+        self._summaries = {}
+        self._by_message = {}
+
+    def get(self, tracking_id: str) -> Optional[StatusSummary]:
+        return self._summaries.get(tracking_id)
+
+    def get_by_message_id(self, message_id: str) -> Optional[StatusSummary]:
+        tracking_id = self._by_message.get(message_id)
+        return self._summaries.get(tracking_id) if tracking_id is not None else None
+
+    def discard(self, tracking_id: str) -> None:
+        """Forget an email, e.g. when its events are evicted."""
+        summary = self._summaries.pop(tracking_id, None)
+        # Digest notifications share a message_id; only drop the entry if it points here
+        if summary is not None and self._by_message.get(summary.message_id) == tracking_id:
+            del self._by_message[summary.message_id]
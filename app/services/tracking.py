@@ -1,68 +1,175 @@
 from datetime import datetime
+import asyncio
+import time
 import uuid
-from typing import Optional, Dict, List
-from app.models.email import EmailEvent, EmailAnalytics, EmailStatus
+from typing import Iterable, Optional, Dict, List, Tuple
+from app.models.email import EmailEvent, EmailAnalytics
+from app.services.tracking_store import EventRecord, EventRow, TrackingStore, create_tracking_store, to_epoch
+from app.services.analytics import AnalyticsAggregator
+from app.services.status_index import StatusIndex, StatusSummary
 import logging
 from app.core.config import settings
+from app.core.metrics import register_collector
 
 logger = logging.getLogger(__name__)
 
 class EmailTrackingService:
-    def __init__(self):
+    def __init__(self, store: Optional[TrackingStore] = None):
         """Initialize tracking service."""
-        self._events = {}  # In-memory store for development
+        self._store = store or create_tracking_store()
+        self._analytics = AnalyticsAggregator()
+        self._status = StatusIndex()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.compacted_events = 0
+        self.evicted_emails = 0
+
+    async def _flush_loop(self) -> None:
+        interval = (
+            settings.TRACKING_SHARED_FLUSH_INTERVAL if self._store.shared
+            else settings.TRACKING_STORE_FLUSH_INTERVAL
+        )
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._store.flush()
+            except Exception as e:
+                logger.error("Error flushing tracking store: %s", e)
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.TRACKING_MAINTENANCE_INTERVAL)
+            try:
+                await self.run_maintenance()
+            except Exception:
+                logger.exception("Tracking maintenance failed")
+
+    async def run_maintenance(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """Compact repeated opens/clicks and evict emails past TRACKING_RETENTION_DAYS.
+
+        Store work runs in a thread. Evicted emails keep counting towards
+        analytics through the hourly buckets. Returns (events merged away, emails evicted).
+        """
+        compacted = await asyncio.to_thread(self._store.compact)
+        evicted: List[str] = []
+        if settings.TRACKING_RETENTION_DAYS > 0:
+            cutoff = (now or time.time()) - settings.TRACKING_RETENTION_DAYS * 86400
+            evicted = await asyncio.to_thread(self._store.evict, cutoff)
+            if not self._store.shared:
+                self._analytics.forget(evicted)
+                for tracking_id in evicted:
+                    self._status.discard(tracking_id)
+        self.compacted_events += compacted
+        self.evicted_emails += len(evicted)
+        if compacted or evicted:
+            logger.info("Tracking maintenance: %s repeat events compacted, %s emails evicted",
+                        compacted, len(evicted))
+        return compacted, len(evicted)
+
+    def start(self) -> None:
+        """Load analytics and statuses from the store and start flushing buffered events in the background."""
+        if self._store.shared:
+            self._store.backfill_analytics()
+        else:
+            self._status.reset()
+            self._analytics.rebuild(self._index_statuses(self._store.iter_events()))
+            for rollup in self._store.iter_rollups():
+                self._analytics.add_rollup(*rollup)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        if settings.TRACKING_MAINTENANCE_INTERVAL > 0:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    def _index_statuses(self, events: Iterable[Tuple]) -> Iterable[Tuple]:
+        """Pass events through while feeding them to the status index."""
+        for event in events:
+            self._status.record(*event)
+            yield event
+
+    async def stop(self) -> None:
+        """Stop the background tasks and write out everything buffered."""
+        for task in (self._flush_task, self._maintenance_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._flush_task = self._maintenance_task = None
+        self._store.close()
     
+    async def check(self) -> str:
+        """Raise if the tracking store is unusable or its background flush has stopped."""
+        if self._flush_task is not None and self._flush_task.done():
+            raise RuntimeError("Tracking flush task has stopped")
+        await asyncio.to_thread(self._store.check)
+        return f"{type(self._store).__name__} ok"
+
     async def create_tracking_id(self) -> str:
         """Generate a unique tracking ID for an email."""
         tracking_id = str(uuid.uuid4())
-        self._events[tracking_id] = []
+        self._store.register(tracking_id, datetime.utcnow())
         return tracking_id
 
     async def add_event(self, tracking_id: str, event: EmailEvent) -> bool:
         """Record an email event."""
         try:
-            if tracking_id not in self._events:
-                self._events[tracking_id] = []
-            
-            self._events[tracking_id].append(event)
-            logger.info(f"Email event recorded for {tracking_id}: {event.event_type}")
+            timestamp = to_epoch(event.timestamp)
+            self._store.add_events([(
+                tracking_id, event.event_type, timestamp, event.user_agent, event.ip_address, event.metadata
+            )])
+            if not self._store.shared:
+                self._analytics.record(tracking_id, event.event_type, timestamp, event.metadata)
+                self._status.record(tracking_id, event.event_type, timestamp, event.metadata)
+            logger.info("Email event recorded for %s: %s", tracking_id, event.event_type)
             return True
             
         except Exception as e:
-            logger.error(f"Error recording email event: {e}")
+            logger.error("Error recording email event: %s", e)
             return False
 
+    def record_rows(self, rows: List[EventRow]) -> None:
+        """Record a batch of raw events, as produced by the ingest buffer."""
+        self._store.add_events(rows)
+        if self._store.shared:
+            return
+        for tracking_id, event_type, timestamp, _, _, metadata in rows:
+            self._analytics.record(tracking_id, event_type, timestamp, metadata)
+            self._status.record(tracking_id, event_type, timestamp, metadata)
+
     async def get_email_events(self, tracking_id: str) -> List[EmailEvent]:
         """Get all events for a specific email."""
         try:
-            return self._events.get(tracking_id, [])
+            return self._store.get_events(tracking_id)
+        except Exception as e:
+            logger.error("Error fetching email events: %s", e)
+            return []
+
+    async def get_event_records(self, tracking_id: str) -> List[EventRecord]:
+        """Get all events for a specific email in compact form."""
+        try:
+            return self._store.get_records(tracking_id)
         except Exception as e:
-            logger.error(f"Error fetching email events: {e}")
+            logger.error("Error fetching email events: %s", e)
             return []
 
+    async def get_status(self, tracking_id: str) -> Optional[StatusSummary]:
+        """Current status summary for an email, without reading its events."""
+        if self._store.shared:
+            return self._store.get_status(tracking_id)
+        return self._status.get(tracking_id)
+
+    async def get_status_by_message_id(self, message_id: str) -> Optional[StatusSummary]:
+        """Status summary for the email Gmail accepted as ``message_id``."""
+        if self._store.shared:
+            return self._store.get_status_by_message_id(message_id)
+        return self._status.get_by_message_id(message_id)
+
     async def get_analytics(self, time_range: Optional[Dict] = None) -> EmailAnalytics:
-        """Get email analytics."""
+        """Get email analytics, optionally limited to the last ``days`` days."""
         try:
-            total_sent = sum(1 for events in self._events.values() 
-                           if any(e.event_type == EmailStatus.SENT for e in events))
-            total_opened = sum(1 for events in self._events.values() 
-                             if any(e.event_type == EmailStatus.OPENED for e in events))
-            total_clicked = sum(1 for events in self._events.values() 
-                              if any(e.event_type == EmailStatus.CLICKED for e in events))
-            
-            return EmailAnalytics(
-                total_sent=total_sent,
-                total_delivered=total_sent,  # Assuming all sent are delivered for now
-                total_opened=total_opened,
-                total_clicked=total_clicked,
-                average_open_rate=total_opened/total_sent if total_sent > 0 else 0,
-                average_click_rate=total_clicked/total_sent if total_sent > 0 else 0,
-                delivery_success_rate=1.0,  # Assuming 100% delivery for now
-                peak_times=[datetime.utcnow()],
-                common_failures={}
-            )
+            days = (time_range or {}).get("days")
+            if self._store.shared:
+                return self._store.analytics_snapshot(days=days)
+            return self._analytics.snapshot(days=days)
         except Exception as e:
-            logger.error(f"Error generating analytics: {e}")
+            logger.error("Error generating analytics: %s", e)
             raise
 
     async def generate_tracking_pixel(self, tracking_id: str) -> str:
@@ -73,4 +180,16 @@ class EmailTrackingService:
         """Generate a tracking link."""
         return f"{settings.EMAIL_SERVICE_URL}/api/v1/tracking/track/{tracking_id}/redirect?url={original_url}"
 
-tracking_service = EmailTrackingService() 
\ No newline at end of file
+    def metrics(self):
+        """Retention state for /metrics."""
+        yield "tracking_compacted_events_total", "counter", "Repeat opens/clicks merged into counts.", [
+            ({}, self.compacted_events)
+        ]
+        yield "tracking_evicted_emails_total", "counter", "Emails evicted past the retention period.", [
+            ({}, self.evicted_emails)
+        ]
+        if not self._store.shared:
+            yield "tracking_status_entries", "gauge", "Emails held in the status index.", [({}, len(self._status))]
+
+tracking_service = EmailTrackingService()
+register_collector(tracking_service.metrics) 
\ No newline at end of file
@@ -0,0 +1,643 @@
+import json
+import os
+from array import array
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.models.email import EmailEvent, EmailStatus
+
+logger = logging.getLogger(__name__)
+
+# (tracking_id, event_type, epoch seconds, user_agent, ip_address, metadata)
+EventRow = Tuple[str, EmailStatus, float, Optional[str], Optional[str], Optional[Dict[str, str]]]
+
+def to_epoch(timestamp: datetime) -> float:
+    """Convert a naive UTC datetime to epoch seconds."""
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+def from_epoch(seconds: float) -> datetime:
+    """Convert epoch seconds to a naive UTC datetime."""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+# Opens and clicks repeated by the same user agent and IP within one hour
+# (one analytics bucket, so counts never move between buckets) are compacted
+# into the earliest event, with metadata count/first_seen/last_seen.
+REPEAT_TYPES = (EmailStatus.OPENED, EmailStatus.CLICKED)
+REPEAT_WINDOW_SECONDS = 3600
+_REPEAT_KEYS = ("count", "first_seen", "last_seen")
+
+def repeat_count(metadata: Optional[Dict[str, str]]) -> int:
+    """How many original events a stored event stands for."""
+    if metadata and "count" in metadata:
+        return int(metadata["count"])
+    return 1
+
+def last_seen(timestamp: float, metadata: Optional[Dict[str, str]]) -> float:
+    """When the last of the events a stored event stands for happened."""
+    if metadata and "last_seen" in metadata:
+        return to_epoch(datetime.fromisoformat(metadata["last_seen"]))
+    return timestamp
+
+def merge_repeats(events: Iterable[Tuple]) -> List[Tuple]:
+    """Find repeated opens/clicks among one email's events.
+
+    ``events`` are ``(row_key, event_type, timestamp, user_agent, ip_address, metadata)``.
+    Returns ``(kept_row_key, merged_metadata, removed_row_keys)`` for every group
+    of two or more; the kept row is the earliest one.
+    """
+    groups: Dict[Tuple, List[Tuple]] = {}
+    for event in events:
+        _, event_type, timestamp, user_agent, ip_address, metadata = event
+        base = tuple(sorted(
+            (key, value) for key, value in (metadata or {}).items() if key not in _REPEAT_KEYS
+        ))
+        group_key = (event_type, user_agent, ip_address, int(timestamp // REPEAT_WINDOW_SECONDS), base)
+        groups.setdefault(group_key, []).append(event)
+
+    merged = []
+    for group_key, group in groups.items():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda event: event[2])
+        metadata = dict(group_key[4])
+        metadata["count"] = str(sum(repeat_count(event[5]) for event in group))
+        metadata["first_seen"] = from_epoch(group[0][2]).isoformat()
+        metadata["last_seen"] = from_epoch(max(last_seen(event[2], event[5]) for event in group)).isoformat()
+        merged.append((group[0][0], metadata, [event[0] for event in group[1:]]))
+    return merged
+
+def hourly_tables_sql(hourly_table: str, failures_table: str) -> str:
+    """DDL for a pair of hourly analytics counter tables."""
+    return f"""
+        CREATE TABLE IF NOT EXISTS {hourly_table} (
+            hour INTEGER PRIMARY KEY,
+            sent INTEGER NOT NULL DEFAULT 0,
+            opened INTEGER NOT NULL DEFAULT 0,
+            clicked INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            open_events INTEGER NOT NULL DEFAULT 0,
+            click_events INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS {failures_table} (
+            hour INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (hour, reason)
+        );
+    """
+
+def add_hourly_counts(conn: sqlite3.Connection, buckets: Iterable[Tuple], hourly_table: str,
+                      failures_table: str) -> None:
+    """Add ``(hour, bucket)`` analytics counters to a pair of hourly tables."""
+    buckets = list(buckets)
+    conn.executemany(
+        f"INSERT INTO {hourly_table} (hour, sent, opened, clicked, failed, open_events, click_events) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (hour) DO UPDATE SET "
+        "sent = sent + excluded.sent, opened = opened + excluded.opened, "
+        "clicked = clicked + excluded.clicked, failed = failed + excluded.failed, "
+        "open_events = open_events + excluded.open_events, "
+        "click_events = click_events + excluded.click_events",
+        [(hour, b.sent, b.opened, b.clicked, b.failed, b.open_events, b.click_events) for hour, b in buckets]
+    )
+    conn.executemany(
+        f"INSERT INTO {failures_table} (hour, reason, count) VALUES (?, ?, ?) "
+        "ON CONFLICT (hour, reason) DO UPDATE SET count = count + excluded.count",
+        [
+            (hour, reason, count)
+            for hour, b in buckets if b.failures
+            for reason, count in b.failures.items()
+        ]
+    )
+
+class EventRecord:
+    """A stored event in compact form; converted to EmailEvent only for API responses."""
+    __slots__ = ("event_type", "timestamp", "user_agent", "ip_address", "metadata")
+
+    def __init__(self, event_type: EmailStatus, timestamp: float, user_agent: Optional[str],
+                 ip_address: Optional[str], metadata: Optional[Dict[str, str]]):
+        self.event_type = event_type
+        self.timestamp = timestamp
+        self.user_agent = user_agent
+        self.ip_address = ip_address
+        self.metadata = metadata
+
+    def to_event(self) -> EmailEvent:
+        return EmailEvent(
+            event_type=self.event_type,
+            timestamp=from_epoch(self.timestamp),
+            user_agent=self.user_agent,
+            ip_address=self.ip_address,
+            metadata=dict(self.metadata) if self.metadata else None
+        )
+
+class TrackingStore(ABC):
+    """Storage backend for email tracking events."""
+
+    # True when the store keeps analytics itself, shared by every worker process
+    shared = False
+
+    @abstractmethod
+    def register(self, tracking_id: str, created_at: datetime) -> None:
+        """Record a newly created tracking ID."""
+
+    @abstractmethod
+    def add_events(self, rows: List[EventRow]) -> None:
+        """Store events given as EventRow tuples."""
+
+    @abstractmethod
+    def get_records(self, tracking_id: str) -> List[EventRecord]:
+        """All events for a tracking ID, oldest first."""
+
+    def get_events(self, tracking_id: str) -> List[EmailEvent]:
+        """All events for a tracking ID as API models."""
+        return [record.to_event() for record in self.get_records(tracking_id)]
+
+    @abstractmethod
+    def iter_events(self) -> Iterator[Tuple[str, EmailStatus, float, Optional[Dict[str, str]]]]:
+        """Every stored event as ``(tracking_id, event_type, epoch seconds, metadata)``."""
+
+    def iter_rollups(self) -> Iterator[Tuple]:
+        """Hourly counters of evicted emails as ``(hour, sent, opened, clicked, failed,
+        open_events, click_events, failures)``, for rebuilding analytics."""
+        return iter(())
+
+    @abstractmethod
+    def compact(self) -> int:
+        """Merge repeated opens/clicks added since the last call. Returns the number of events removed."""
+
+    @abstractmethod
+    def evict(self, cutoff: float) -> List[str]:
+        """Delete emails with no events since ``cutoff`` (epoch seconds). Returns their tracking IDs."""
+
+    def check(self) -> None:
+        """Raise if the store cannot be used."""
+
+    def flush(self) -> None:
+        """Write out any buffered events."""
+
+    def close(self) -> None:
+        """Flush and release resources."""
+        self.flush()
+
+class _InternTable:
+    """Maps repeated values (user agents, IPs, metadata) to small integer codes."""
+    __slots__ = ("_codes", "values")
+
+    def __init__(self):
+        self._codes: Dict = {None: 0}
+        self.values: List = [None]
+
+    def code(self, value, key=None) -> int:
+        key = value if key is None else key
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def remap(self, codes: array, values: List, keyed: bool = False) -> array:
+        """Re-intern ``codes`` that index into an old table's ``values``."""
+        return array("I", (
+            self.code(values[code], tuple(sorted(values[code].items())) if keyed and code else None)
+            for code in codes
+        ))
+
+class _EventColumns:
+    """Events for one tracking ID, one typed array per field."""
+    __slots__ = ("timestamps", "types", "user_agents", "ip_addresses", "metadata", "repeats")
+
+    def __init__(self):
+        self.timestamps = array("d")
+        self.types = array("B")
+        self.user_agents = array("I")
+        self.ip_addresses = array("I")
+        self.metadata = array("I")
+        self.repeats: Optional[Dict[int, Dict[str, str]]] = None  # Event index -> compacted metadata
+
+_EVENT_TYPES = list(EmailStatus)
+_REPEAT_VALUES = tuple(event_type.value for event_type in REPEAT_TYPES)
+# SQLite allows at most 999 bound parameters per statement
+_LOOKUP_CHUNK = 500
+_EVENT_TYPE_CODES = {event_type: code for code, event_type in enumerate(_EVENT_TYPES)}
+_REPEAT_TYPE_CODES = {_EVENT_TYPE_CODES[event_type] for event_type in REPEAT_TYPES}
+
+class InMemoryTrackingStore(TrackingStore):
+    """Keeps events in process memory in a compact columnar layout.
+
+    Each tracking ID gets typed arrays for timestamp, event type and interned
+    user agent / IP / metadata codes, so an event costs ~21 bytes instead of
+    a full pydantic model. Image proxies that hit the pixel over and over
+    share the same interned strings. Lost on restart; meant for tests,
+    development and single-process deployments.
+
+    ``compact`` and ``evict`` run from a worker thread, so access is locked.
+    """
+
+    def __init__(self):
+        self._emails: Dict[str, _EventColumns] = {}
+        self._user_agents = _InternTable()
+        self._ip_addresses = _InternTable()
+        self._metadata = _InternTable()
+        self._uncompacted: set = set()  # Tracking IDs with opens/clicks since the last compact()
+        self._lock = threading.Lock()
+
+    def _columns(self, tracking_id: str) -> _EventColumns:
+        columns = self._emails.get(tracking_id)
+        if columns is None:
+            columns = self._emails[tracking_id] = _EventColumns()
+        return columns
+
+    def register(self, tracking_id: str, created_at: datetime) -> None:
+        with self._lock:
+            self._columns(tracking_id)
+
+    def add_events(self, rows: List[EventRow]) -> None:
+        with self._lock:
+            for tracking_id, event_type, timestamp, user_agent, ip_address, metadata in rows:
+                columns = self._columns(tracking_id)
+                type_code = _EVENT_TYPE_CODES[event_type]
+                columns.timestamps.append(timestamp)
+                columns.types.append(type_code)
+                columns.user_agents.append(self._user_agents.code(user_agent))
+                columns.ip_addresses.append(self._ip_addresses.code(ip_address))
+                columns.metadata.append(
+                    self._metadata.code(metadata, tuple(sorted(metadata.items()))) if metadata else 0
+                )
+                if type_code in _REPEAT_TYPE_CODES:
+                    self._uncompacted.add(tracking_id)
+
+    def _event_metadata(self, columns: _EventColumns) -> List[Optional[Dict[str, str]]]:
+        metadata = self._metadata.values
+        values = [metadata[code] for code in columns.metadata]
+        if columns.repeats:
+            for index, merged in columns.repeats.items():
+                values[index] = merged
+        return values
+
+    def get_records(self, tracking_id: str) -> List[EventRecord]:
+        with self._lock:
+            columns = self._emails.get(tracking_id)
+            if columns is None:
+                return []
+            user_agents = self._user_agents.values
+            ip_addresses = self._ip_addresses.values
+            return [
+                EventRecord(_EVENT_TYPES[type_code], timestamp, user_agents[ua], ip_addresses[ip], meta)
+                for timestamp, type_code, ua, ip, meta in zip(
+                    columns.timestamps, columns.types, columns.user_agents,
+                    columns.ip_addresses, self._event_metadata(columns)
+                )
+            ]
+
+    def iter_events(self) -> Iterator[Tuple[str, EmailStatus, float, Optional[Dict[str, str]]]]:
+        for tracking_id, columns in list(self._emails.items()):
+            for timestamp, type_code, meta in zip(columns.timestamps, columns.types, self._event_metadata(columns)):
+                yield tracking_id, _EVENT_TYPES[type_code], timestamp, meta
+
+    def _compact_columns(self, columns: _EventColumns) -> int:
+        user_agents = self._user_agents.values
+        ip_addresses = self._ip_addresses.values
+        metadata = self._event_metadata(columns)
+        merged = merge_repeats(
+            (index, type_code, columns.timestamps[index], user_agents[columns.user_agents[index]],
+             ip_addresses[columns.ip_addresses[index]], metadata[index])
+            for index, type_code in enumerate(columns.types) if type_code in _REPEAT_TYPE_CODES
+        )
+        if not merged:
+            return 0
+        removed = {index for _, _, indexes in merged for index in indexes}
+        repeats = dict(columns.repeats or {})
+        repeats.update((index, merged_metadata) for index, merged_metadata, _ in merged)
+        kept = [index for index in range(len(columns.types)) if index not in removed]
+        for name in ("timestamps", "types", "user_agents", "ip_addresses", "metadata"):
+            values = getattr(columns, name)
+            setattr(columns, name, array(values.typecode, (values[index] for index in kept)))
+        columns.repeats = {
+            new_index: repeats[index] for new_index, index in enumerate(kept) if index in repeats
+        } or None
+        return len(removed)
+
+    def compact(self) -> int:
+        with self._lock:
+            tracking_ids, self._uncompacted = self._uncompacted, set()
+            removed = 0
+            for tracking_id in tracking_ids:
+                columns = self._emails.get(tracking_id)
+                if columns is not None:
+                    removed += self._compact_columns(columns)
+            return removed
+
+    def evict(self, cutoff: float) -> List[str]:
+        with self._lock:
+            evicted = [
+                tracking_id for tracking_id, columns in self._emails.items()
+                if not columns.timestamps or max(columns.timestamps) < cutoff
+            ]
+            for tracking_id in evicted:
+                del self._emails[tracking_id]
+                self._uncompacted.discard(tracking_id)
+            if evicted:
+                self._reintern()
+            return evicted
+
+    def _reintern(self) -> None:
+        """Rebuild the intern tables so values only evicted emails used are released."""
+        user_agents, ip_addresses, metadata = _InternTable(), _InternTable(), _InternTable()
+        for columns in self._emails.values():
+            columns.user_agents = user_agents.remap(columns.user_agents, self._user_agents.values)
+            columns.ip_addresses = ip_addresses.remap(columns.ip_addresses, self._ip_addresses.values)
+            columns.metadata = metadata.remap(columns.metadata, self._metadata.values, keyed=True)
+        self._user_agents, self._ip_addresses, self._metadata = user_agents, ip_addresses, metadata
+
+class SQLiteTrackingStore(TrackingStore):
+    """Tracking events in an embedded SQLite database.
+
+    Writes are buffered and inserted in one transaction once ``batch_size``
+    events are waiting or the oldest has waited ``flush_interval`` seconds.
+    Reads flush first, so callers always see their own writes. Evicted
+    emails are rolled up into hourly counters so analytics survive them.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 500, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._compacted_through = 0  # Highest event id already considered by compact()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._pending_emails: List[Tuple[str, float]] = []
+        self._pending_events: List[Tuple] = []
+        self._oldest_pending = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tracking_emails (
+                    tracking_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tracking_events (
+                    id INTEGER PRIMARY KEY,
+                    tracking_id TEXT NOT NULL,
+                    event_type TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    user_agent TEXT,
+                    ip_address TEXT,
+                    metadata TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_tracking_events_tracking_id
+                    ON tracking_events (tracking_id, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_tracking_events_type
+                    ON tracking_events (event_type, timestamp, tracking_id);
+                CREATE INDEX IF NOT EXISTS idx_tracking_events_timestamp
+                    ON tracking_events (timestamp);
+                CREATE INDEX IF NOT EXISTS idx_tracking_emails_created_at
+                    ON tracking_emails (created_at);
+            """ + hourly_tables_sql("tracking_rollup_hourly", "tracking_rollup_failures"))
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _write_transaction(self):
+        """An immediate transaction, so workers sharing the database take turns writing."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _maybe_flush(self) -> None:
+        pending = len(self._pending_events) + len(self._pending_emails)
+        if pending >= self.batch_size or time.monotonic() - self._oldest_pending >= self.flush_interval:
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # The rows stay buffered and go out with the next flush, so the caller's write still counts
+                logger.warning("Error flushing tracking events, will retry: %s", e)
+
+    def _mark_pending(self) -> None:
+        if not self._pending_events and not self._pending_emails:
+            self._oldest_pending = time.monotonic()
+
+    def register(self, tracking_id: str, created_at: datetime) -> None:
+        with self._lock:
+            self._mark_pending()
+            self._pending_emails.append((tracking_id, to_epoch(created_at)))
+            self._maybe_flush()
+
+    def add_events(self, rows: List[EventRow]) -> None:
+        with self._lock:
+            self._mark_pending()
+            self._pending_events.extend(
+                (
+                    tracking_id,
+                    event_type.value,
+                    timestamp,
+                    user_agent,
+                    ip_address,
+                    json.dumps(metadata) if metadata else None,
+                )
+                for tracking_id, event_type, timestamp, user_agent, ip_address, metadata in rows
+            )
+            self._maybe_flush()
+
+    def check(self) -> None:
+        with self._lock:
+            self._connect().execute("SELECT 1").fetchone()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending_events and not self._pending_emails:
+                return
+            conn = self._connect()
+            with conn:
+                self._write_pending(conn)
+            logger.debug("Flushed %s tracking events to SQLite", len(self._pending_events))
+            self._pending_emails = []
+            self._pending_events = []
+
+    def _write_pending(self, conn: sqlite3.Connection) -> None:
+        """Insert the buffered rows. Runs inside the flush transaction."""
+        if self._pending_emails:
+            conn.executemany(
+                "INSERT OR IGNORE INTO tracking_emails (tracking_id, created_at) VALUES (?, ?)",
+                self._pending_emails
+            )
+        if self._pending_events:
+            conn.executemany(
+                "INSERT INTO tracking_events "
+                "(tracking_id, event_type, timestamp, user_agent, ip_address, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._pending_events
+            )
+
+    def get_records(self, tracking_id: str) -> List[EventRecord]:
+        with self._lock:
+            self.flush()
+            rows = self._connect().execute(
+                "SELECT event_type, timestamp, user_agent, ip_address, metadata FROM tracking_events "
+                "WHERE tracking_id = ? ORDER BY timestamp, id",
+                (tracking_id,)
+            ).fetchall()
+        return [
+            EventRecord(
+                EmailStatus(event_type),
+                timestamp,
+                user_agent,
+                ip_address,
+                json.loads(metadata) if metadata else None
+            )
+            for event_type, timestamp, user_agent, ip_address, metadata in rows
+        ]
+
+    def iter_events(self) -> Iterator[Tuple[str, EmailStatus, float, Optional[Dict[str, str]]]]:
+        with self._lock:
+            self.flush()
+            rows = self._connect().execute(
+                "SELECT tracking_id, event_type, timestamp, metadata FROM tracking_events ORDER BY id"
+            )
+            for tracking_id, event_type, timestamp, metadata in rows:
+                yield tracking_id, EmailStatus(event_type), timestamp, json.loads(metadata) if metadata else None
+
+    def iter_rollups(self) -> Iterator[Tuple]:
+        with self._lock:
+            self.flush()
+            conn = self._connect()
+            failures: Dict[int, Dict[str, int]] = {}
+            for hour, reason, count in conn.execute("SELECT hour, reason, count FROM tracking_rollup_failures"):
+                failures.setdefault(hour, {})[reason] = count
+            rows = conn.execute(
+                "SELECT hour, sent, opened, clicked, failed, open_events, click_events FROM tracking_rollup_hourly"
+            ).fetchall()
+        for row in rows:
+            yield (*row, failures.get(row[0]))
+
+    def compact(self) -> int:
+        with self._lock:
+            self.flush()
+            conn = self._connect()
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM tracking_events").fetchone()[0]
+            tracking_ids = [tracking_id for tracking_id, in conn.execute(
+                "SELECT DISTINCT tracking_id FROM tracking_events WHERE id > ? AND id <= ? AND event_type IN (?, ?)",
+                (self._compacted_through, last_id, *_REPEAT_VALUES)
+            )]
+
+        removed = 0
+        # One short transaction per chunk, so event writes are not held up for long
+        for start in range(0, len(tracking_ids), _LOOKUP_CHUNK):
+            chunk = tracking_ids[start:start + _LOOKUP_CHUNK]
+            with self._lock, self._write_transaction() as conn:
+                emails: Dict[str, List[Tuple]] = {}
+                for row_id, tracking_id, event_type, timestamp, user_agent, ip_address, metadata in conn.execute(
+                    "SELECT id, tracking_id, event_type, timestamp, user_agent, ip_address, metadata "
+                    f"FROM tracking_events WHERE tracking_id IN ({','.join('?' * len(chunk))}) "
+                    "AND event_type IN (?, ?)",
+                    (*chunk, *_REPEAT_VALUES)
+                ):
+                    emails.setdefault(tracking_id, []).append((
+                        row_id, event_type, timestamp, user_agent, ip_address,
+                        json.loads(metadata) if metadata else None
+                    ))
+                updates, deletes = [], []
+                for events in emails.values():
+                    for kept_id, metadata, removed_ids in merge_repeats(events):
+                        updates.append((json.dumps(metadata), kept_id))
+                        deletes.extend((row_id,) for row_id in removed_ids)
+                conn.executemany("UPDATE tracking_events SET metadata = ? WHERE id = ?", updates)
+                conn.executemany("DELETE FROM tracking_events WHERE id = ?", deletes)
+            removed += len(deletes)
+        self._compacted_through = last_id
+        return removed
+
+    def evict(self, cutoff: float) -> List[str]:
+        evicted: List[str] = []
+        while True:
+            with self._lock:
+                self.flush()
+                with self._write_transaction() as conn:
+                    tracking_ids = [tracking_id for tracking_id, in conn.execute(
+                        """
+                        SELECT tracking_id FROM (
+                            SELECT tracking_id FROM tracking_emails WHERE created_at < ?
+                            UNION
+                            SELECT tracking_id FROM tracking_events WHERE timestamp < ?
+                        ) AS old
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM tracking_events
+                            WHERE tracking_id = old.tracking_id AND timestamp >= ?
+                        )
+                        LIMIT ?
+                        """,
+                        (cutoff, cutoff, cutoff, _LOOKUP_CHUNK)
+                    )]
+                    if tracking_ids:
+                        self._evict_rows(conn, tracking_ids)
+            evicted.extend(tracking_ids)
+            if len(tracking_ids) < _LOOKUP_CHUNK:
+                return evicted
+
+    def _evict_rows(self, conn: sqlite3.Connection, tracking_ids: List[str]) -> None:
+        """Roll the emails' events up into the hourly rollup tables, then delete them."""
+        from app.services.analytics import AnalyticsAggregator
+
+        placeholders = ",".join("?" * len(tracking_ids))
+        aggregator = AnalyticsAggregator()
+        for tracking_id, event_type, timestamp, metadata in conn.execute(
+            "SELECT tracking_id, event_type, timestamp, metadata FROM tracking_events "
+            f"WHERE tracking_id IN ({placeholders}) ORDER BY id",
+            tracking_ids
+        ):
+            aggregator.record(
+                tracking_id, EmailStatus(event_type), timestamp, json.loads(metadata) if metadata else None
+            )
+        add_hourly_counts(conn, aggregator.buckets.items(), "tracking_rollup_hourly", "tracking_rollup_failures")
+        self._delete_emails(conn, tracking_ids)
+
+    def _delete_emails(self, conn: sqlite3.Connection, tracking_ids: List[str]) -> None:
+        placeholders = ",".join("?" * len(tracking_ids))
+        conn.execute(f"DELETE FROM tracking_events WHERE tracking_id IN ({placeholders})", tracking_ids)
+        conn.execute(f"DELETE FROM tracking_emails WHERE tracking_id IN ({placeholders})", tracking_ids)
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def create_tracking_store() -> TrackingStore:
+    """Build the tracking store selected by TRACKING_STORE and TRACKING_SHARED_STORE."""
+    if settings.TRACKING_SHARED_STORE:
+        if settings.TRACKING_STORE != "sqlite":
+            raise ValueError("TRACKING_SHARED_STORE requires TRACKING_STORE=sqlite")
+        from app.services.shared_tracking import SharedSQLiteTrackingStore
+        return SharedSQLiteTrackingStore(
+            settings.TRACKING_DB_PATH,
+            batch_size=settings.TRACKING_STORE_BATCH_SIZE,
+            flush_interval=settings.TRACKING_SHARED_FLUSH_INTERVAL
+        )
+    if settings.TRACKING_STORE == "memory":
+        return InMemoryTrackingStore()
+    if settings.TRACKING_STORE == "sqlite":
+        return SQLiteTrackingStore(
+            settings.TRACKING_DB_PATH,
+            batch_size=settings.TRACKING_STORE_BATCH_SIZE,
+            flush_interval=settings.TRACKING_STORE_FLUSH_INTERVAL
+        )
+    raise ValueError(f"Unknown TRACKING_STORE: {settings.TRACKING_STORE}")
@@ -1,12 +1,67 @@
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+from jinja2.sandbox import SandboxedEnvironment
+from typing import Dict, List
 import os
+import time
+import logging
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+from app.core.stats import LatencyStats
+
+logger = logging.getLogger(__name__)
 
-# Initialize Jinja2 environment
 template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
-env = Environment(
-    loader=FileSystemLoader(template_dir),
-    autoescape=True
-)
+
+def _create_environment() -> Environment:
+    """Build the Jinja2 environment for the configured template mode.
+
+    Production mode never stats template files after loading, keeps every
+    compiled template in memory and persists compiled bytecode to disk so
+    new workers skip compilation. Development mode reloads templates when
+    they change on disk.
+    """
+    if settings.template_production:
+        os.makedirs(settings.TEMPLATE_CACHE_DIR, exist_ok=True)
+        return Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=True,
+            auto_reload=False,
+            cache_size=-1,
+            bytecode_cache=FileSystemBytecodeCache(settings.TEMPLATE_CACHE_DIR)
+        )
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        autoescape=True,
+        auto_reload=True
+    )
+
+# Initialize Jinja2 environment
+env = _create_environment()
+# Caller-supplied templates (mail-merge subjects): sandboxed, and plain text so no HTML escaping
+_text_env = SandboxedEnvironment(autoescape=False)
+_render_stats: Dict[str, LatencyStats] = {}
+
+def warmup_templates() -> List[str]:
+    """Load and compile every template so the first send does not pay for it.
+
+    Returns:
+        list: Names of the templates that were loaded
+    """
+    started = time.perf_counter()
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    logger.info("Loaded %s templates in %.3fs", len(names), time.perf_counter() - started)
+    return names
+
+def get_template(template_name: str) -> Template:
+    """Get a compiled template."""
+    return env.get_template(template_name)
+
+def compile_text_template(source: str) -> Template:
+    """Compile a caller-supplied plain-text template, such as a mail-merge subject."""
+    return _text_env.from_string(source)
 
 def render_template(template_name: str, **kwargs) -> str:
     """
@@ -19,5 +74,28 @@ def render_template(template_name: str, **kwargs) -> str:
     Returns:
         str: Rendered HTML content
     """
-    template = env.get_template(template_name)
-    return template.render(**kwargs) 
\ No newline at end of file
+    return render_compiled(env.get_template(template_name), **kwargs)
+
+def render_compiled(template: Template, **kwargs) -> str:
+    """Render an already loaded template, recording its timing under the template name."""
+    started = time.perf_counter()
+    html = template.render(**kwargs)
+    stats = _render_stats.get(template.name)
+    if stats is None:
+        stats = _render_stats[template.name] = LatencyStats()
+    stats.observe(time.perf_counter() - started)
+    return html
+
+def get_render_stats() -> Dict[str, Dict[str, float]]:
+    """Render count and timings per template name."""
+    return {name: stats.as_dict() for name, stats in _render_stats.items()}
+
+def _render_metrics():
+    yield "template_renders_total", "counter", "Template renders by template.", [
+        ({"template": name}, stats.count) for name, stats in _render_stats.items()
+    ]
+    yield "template_render_seconds_total", "counter", "Total template render time by template.", [
+        ({"template": name}, stats.total) for name, stats in _render_stats.items()
+    ]
+
+register_collector(_render_metrics)
@@ -0,0 +1,9 @@
+"""Performance benchmarks. Run a module directly, e.g. ``python -m benchmarks.bench_tracking_memory``."""
+import os
+
+# Settings() requires the Gmail credentials at import time; benchmarks never
+# talk to Gmail, so dummy values are enough.
+os.environ.setdefault("GOOGLE_CLIENT_ID", "bench-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "bench-client-secret")
+os.environ.setdefault("GOOGLE_REFRESH_TOKEN", "bench-refresh-token")
+os.environ.setdefault("EMAIL_SENDER", "bench@example.com")
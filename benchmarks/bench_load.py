@@ -0,0 +1,291 @@
+"""End-to-end load benchmarks against an in-process fake Gmail server.
+
+Runs the real app (startup hooks included) through an in-process ASGI
+client, with Gmail replaced by tests.fake_gmail.FakeGmailServer:
+
+- send:      /api/v1/email/send throughput and latency percentiles per concurrency level
+- ingest:    pixel and redirect requests per second
+- analytics: /api/v1/tracking/analytics latency as the stored event count grows
+- memory:    bytes of tracking state per email
+
+Results are printed as one JSON document (and written to --output), with
+the git revision and parameters, so runs can be diffed between versions.
+
+Usage: python -m benchmarks.bench_load [--suites send,ingest] [--max-events 10000000]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import benchmarks  # noqa: F401  (dummy credentials)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITES = ("send", "ingest", "analytics", "memory")
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def latency_summary(latencies) -> dict:
+    values = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(values, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "mean_ms": round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def send_payload(i: int) -> dict:
+    return {
+        "to": f"user{i}@example.com",
+        "subject": f"Task {i} assigned",
+        "task_id": str(i),
+        "task_title": f"Task {i}",
+        "task_description": "Benchmark task with a short description.",
+        "priority": 3,
+    }
+
+async def run_closed_loop(client, concurrency: int, total: int, make_request):
+    """``concurrency`` workers issue ``total`` requests back to back. Returns (latencies, errors, seconds)."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+async def bench_send(client, args) -> dict:
+    # Task IDs are unique across levels: a repeat would be answered from the idempotency cache, not sent
+    offset = 0
+
+    async def send(client, i):
+        return await client.post("/api/v1/email/send", json=send_payload(offset + i))
+
+    results = []
+    for concurrency in args.concurrency:
+        total = max(args.send_requests, concurrency * 4)
+        latencies, errors, elapsed = await run_closed_loop(client, concurrency, total, send)
+        offset += total
+        results.append({
+            "concurrency": concurrency,
+            "requests": total,
+            "errors": errors,
+            "throughput_rps": round(total / elapsed, 1),
+            **latency_summary(latencies),
+        })
+    return {"gmail_latency_ms": args.gmail_latency * 1000, "gmail_error_rate": args.gmail_error_rate,
+            "levels": results}
+
+async def bench_ingest(client, args) -> dict:
+    from app.services.ingest import tracking_ingestor
+
+    tracking_ids = [f"bench-{i}" for i in range(1000)]
+
+    async def pixel(client, i):
+        return await client.get(f"/api/v1/tracking/track/{tracking_ids[i % 1000]}/pixel",
+                                headers={"user-agent": "bench"})
+
+    async def redirect(client, i):
+        return await client.get(f"/api/v1/tracking/track/{tracking_ids[i % 1000]}/redirect",
+                                params={"url": "https://example.com/task"}, headers={"user-agent": "bench"})
+
+    results = {}
+    for name, request in (("pixel", pixel), ("redirect", redirect)):
+        latencies, errors, elapsed = await run_closed_loop(client, 32, args.ingest_requests, request)
+        results[name] = {
+            "requests": args.ingest_requests,
+            "errors": errors,
+            "rps": round(args.ingest_requests / elapsed, 1),
+            **latency_summary(latencies),
+        }
+    results["dropped_events"] = tracking_ingestor.dropped
+    return results
+
+def synthetic_rows(count: int, emails: int, seed: int = 7):
+    """Sends, opens and clicks spread over the last 30 days."""
+    from app.models.email import EmailStatus
+
+    rng = random.Random(seed)
+    now = time.time()
+    for i in range(count):
+        tracking_id = f"email-{i % emails}"
+        if i < emails:
+            event_type = EmailStatus.SENT
+        else:
+            event_type = EmailStatus.CLICKED if rng.random() < 0.05 else EmailStatus.OPENED
+        yield tracking_id, event_type, now - rng.random() * 30 * 86400, "bench-agent", "10.0.0.1", None
+
+async def bench_analytics(client, args) -> dict:
+    from app.services.tracking import tracking_service
+
+    results = []
+    loaded = 0
+    for size in (10_000, 100_000, 1_000_000, 10_000_000):
+        if size > args.max_events:
+            break
+        rows = list(synthetic_rows(size - loaded, emails=max(1, size // 20), seed=size))
+        started = time.perf_counter()
+        for start in range(0, len(rows), 10_000):
+            tracking_service.record_rows(rows[start:start + 10_000])
+        load_rate = len(rows) / (time.perf_counter() - started)
+        loaded = size
+        del rows
+        latencies = []
+        for _ in range(args.analytics_requests):
+            started = time.perf_counter()
+            response = await client.get("/api/v1/tracking/analytics", params={"days": 30})
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+        results.append({
+            "events": size,
+            "load_events_per_second": round(load_rate),
+            **latency_summary(latencies),
+        })
+    return {"levels": results}
+
+def bench_memory(args) -> dict:
+    """Tracking state per email: a tracking ID plus PENDING, SENT and a few opens."""
+    from app.models.email import EmailStatus
+    from app.services.tracking import EmailTrackingService
+    from app.services.tracking_store import InMemoryTrackingStore
+
+    emails = args.memory_emails
+    rng = random.Random(3)
+    now = time.time()
+    gc.collect()
+    tracemalloc.start()
+    store = InMemoryTrackingStore()
+    service = EmailTrackingService(store=store)
+    for i in range(emails):
+        tracking_id = f"{i:08x}-0000-4000-8000-{rng.getrandbits(48):012x}"
+        store.register(tracking_id, datetime.utcnow())
+        rows = [
+            (tracking_id, EmailStatus.PENDING, now, None, None, {"task_id": str(i)}),
+            (tracking_id, EmailStatus.SENT, now + 1, None, None, {"message_id": f"{i:016x}"}),
+        ]
+        rows.extend(
+            (tracking_id, EmailStatus.OPENED, now + 60 * j, "bench-agent", "10.0.0.1", {"source": "pixel"})
+            for j in range(3)
+        )
+        service.record_rows(rows)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"emails": emails, "events_per_email": 5, "bytes_per_email": round(used / emails, 1)}
+
+async def run_app_suites(suites, args) -> dict:
+    import httpx
+    import app.main
+    from app.core.gmail import gmail_service
+    from google.auth.credentials import AnonymousCredentials
+
+    gmail_service.credentials = AnonymousCredentials()
+    await app.main.app.router.startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name in suites:
+                if name == "send":
+                    results[name] = await bench_send(client, args)
+                elif name == "ingest":
+                    results[name] = await bench_ingest(client, args)
+                elif name == "analytics":
+                    results[name] = await bench_analytics(client, args)
+    finally:
+        await app.main.app.router.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--send-requests", type=int, default=500)
+    parser.add_argument("--ingest-requests", type=int, default=20000)
+    parser.add_argument("--analytics-requests", type=int, default=50)
+    parser.add_argument("--max-events", type=int, default=1_000_000)
+    parser.add_argument("--memory-emails", type=int, default=50_000)
+    parser.add_argument("--gmail-latency", type=float, default=0.05, help="Fake Gmail response time in seconds")
+    parser.add_argument("--gmail-jitter", type=float, default=0.02)
+    parser.add_argument("--gmail-error-rate", type=float, default=0.0)
+    parser.add_argument("--transport", default="googleapiclient", choices=("googleapiclient", "httpx"))
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    suites = [s for s in args.suites.split(",") if s]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    sys.path.insert(0, REPO_ROOT)
+    from tests.fake_gmail import FakeGmailServer
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    with tempfile.TemporaryDirectory() as workdir, FakeGmailServer(
+        latency=args.gmail_latency, jitter=args.gmail_jitter, error_rate=args.gmail_error_rate, seed=42
+    ) as gmail:
+        os.chdir(workdir)
+        # Settings are read at import time, so configure the app before importing it
+        os.environ.update({
+            "GMAIL_API_ENDPOINT": gmail.url,
+            "GMAIL_TRANSPORT": args.transport,
+            "GMAIL_QUOTA_UNITS_PER_SECOND": "1e9",
+            "GMAIL_QUOTA_BURST_UNITS": "1e9",
+            "GMAIL_SEND_QUEUE_SIZE": "1024",
+            "TRACKING_STORE": "memory",
+            "LOG_LEVEL": "CRITICAL",
+        })
+        results = {
+            "benchmark": "bench_load",
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "transport": args.transport,
+        }
+        app_suites = [s for s in suites if s != "memory"]
+        if app_suites:
+            results.update(asyncio.run(run_app_suites(app_suites, args)))
+        if "memory" in suites:
+            results["memory"] = bench_memory(args)
+        results["fake_gmail"] = {"requests": gmail.request_count, "injected_errors": gmail.error_count}
+        os.chdir(REPO_ROOT)
+
+    document = json.dumps(results, indent=2)
+    print(document)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(document + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare the MessageBuilder against the previous MIMEMultipart-based builder.
+
+Usage: python -m benchmarks.bench_mime [--iterations 2000]
+"""
+import argparse
+import base64
+import json
+import timeit
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from app.core.mime import MessageBuilder
+from app.utils.template import render_template
+
+SENDER_NAME = "Task Manager"
+SENDER = "bench@example.com"
+TO = "user@example.com"
+SUBJECT = "New task: Prepare quarterly report"
+
+def legacy_create_message(to: str, subject: str, html_content: str) -> dict:
+    """The builder GmailService used before MessageBuilder."""
+    message = MIMEMultipart('alternative')
+    message['to'] = to
+    message['from'] = f"{SENDER_NAME} <{SENDER}>"
+    message['subject'] = subject
+    message.attach(MIMEText(html_content, 'html'))
+    return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')}
+
+def render() -> str:
+    return render_template(
+        "email_templates/task_notification.html",
+        task_title="Prepare quarterly report",
+        task_description="Collect the numbers from finance and draft the summary for the board.",
+        priority=2,
+        tracking_id="00000000-0000-4000-8000-000000000000",
+        tracking_url="http://localhost:8001",
+        hubspot_portal_id="123",
+        hubspot_contact_id="456",
+        hubspot_deal_id=None,
+        task_url="https://tasks.example.com/123"
+    )
+
+def run(name: str, build, html: str, iterations: int) -> dict:
+    raw = build(TO, SUBJECT, html)["raw"]
+    seconds = min(timeit.repeat(lambda: build(TO, SUBJECT, html), number=iterations, repeat=3))
+    return {
+        "builder": name,
+        "raw_bytes": len(raw),
+        "microseconds_per_message": round(seconds / iterations * 1e6, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    html = render()
+    with_text = MessageBuilder(SENDER_NAME, SENDER, text_alternative=True)
+    html_only = MessageBuilder(SENDER_NAME, SENDER, text_alternative=False)
+    results = [
+        run("legacy_mimemultipart", legacy_create_message, html, args.iterations),
+        run("message_builder_html_only", lambda *a: {"raw": html_only.build_raw(*a)}, html, args.iterations),
+        run("message_builder_with_text", lambda *a: {"raw": with_text.build_raw(*a)}, html, args.iterations),
+    ]
+    print(json.dumps({
+        "benchmark": "mime",
+        "html_bytes": len(html.encode("utf-8")),
+        "iterations": args.iterations,
+        "results": results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
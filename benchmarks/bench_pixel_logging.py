@@ -0,0 +1,113 @@
+"""Measure /track/{id}/pixel throughput under the old and new logging setups.
+
+"legacy" reproduces what the service used to do: root logger at DEBUG with
+a synchronous stream handler and an eagerly formatted log line per event.
+"pipeline" is setup_logging() at INFO with the queue listener and sampled
+event logs. Both write to a scratch file rather than the terminal.
+
+Usage: python -m benchmarks.bench_pixel_logging [--requests 20000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TRACKING_STORE", "memory")
+
+import benchmarks  # noqa: F401,E402  (dummy credentials)
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.api.v1.endpoints import tracking  # noqa: E402
+from app.core import logging_config  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services.ingest import tracking_ingestor  # noqa: E402
+
+# The benchmark client's own request logs are not part of what we measure
+for name in ("httpx", "httpcore"):
+    logging.getLogger(name).setLevel(logging.WARNING)
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(tracking.router, prefix="/api/v1/tracking")
+    return app
+
+def reset_logging() -> None:
+    logging_config.shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    events_logger = logging.getLogger(logging_config.TRACKING_EVENTS_LOGGER)
+    for log_filter in list(events_logger.filters):
+        events_logger.removeFilter(log_filter)
+
+def configure_legacy(log_file) -> None:
+    logging.basicConfig(level=logging.DEBUG, stream=log_file, force=True)
+
+def configure_pipeline(log_file) -> None:
+    stdout = sys.stdout
+    sys.stdout = log_file
+    try:
+        settings.LOG_LEVEL = "INFO"
+        logging_config.setup_logging()
+    finally:
+        sys.stdout = stdout
+
+def legacy_line(tracking_id: str) -> None:
+    # What every pixel hit used to cost: an f-string built and written at DEBUG
+    logging.getLogger("app.services.tracking").debug(f"Email event recorded for {tracking_id}: opened")
+
+async def run(app: FastAPI, requests: int, concurrency: int, legacy: bool) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        per_worker = requests // concurrency
+
+        async def worker(worker_id: int):
+            for i in range(per_worker):
+                tracking_id = f"bench-{worker_id}-{i % 50}"
+                await client.get(f"/api/v1/tracking/track/{tracking_id}/pixel", headers={"user-agent": "bench"})
+                if legacy:
+                    legacy_line(tracking_id)
+                if tracking_ingestor.pending >= 10000:
+                    tracking_ingestor.flush()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    tracking_ingestor.flush()
+    return per_worker * concurrency / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    app = build_app()
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        for mode, configure in (("legacy", configure_legacy), ("pipeline", configure_pipeline)):
+            with open(os.path.join(workdir, f"{mode}.log"), "w") as log_file:
+                configure(log_file)
+                # Warm up routing and the ingest path before timing
+                asyncio.run(run(app, 500, 4, mode == "legacy"))
+                rps = asyncio.run(run(app, args.requests, args.concurrency, mode == "legacy"))
+                reset_logging()
+                log_file.flush()
+                results[mode] = {
+                    "requests_per_second": round(rps),
+                    "log_bytes": os.path.getsize(log_file.name),
+                }
+    results["speedup"] = round(
+        results["pipeline"]["requests_per_second"] / results["legacy"]["requests_per_second"], 2
+    )
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
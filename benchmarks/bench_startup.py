@@ -0,0 +1,72 @@
+"""Measure cold-start latency: importing the app and serving its first request.
+
+Each run is a fresh interpreter in a scratch directory, like a newly
+scheduled container. Usage: python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client_ready = time.perf_counter()
+with TestClient(app.main.app) as client:
+    started_up = time.perf_counter()
+    status = client.get("/api/v1/tracking/analytics").status_code
+    first_response = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_seconds": started_up - client_ready,
+    "first_request_seconds": first_response - started_up,
+    "ready_seconds": (imported - started) + (first_response - client_ready),
+    "status": status,
+}))
+"""
+
+def run_once() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("GOOGLE_CLIENT_ID", "bench-client-id")
+    env.setdefault("GOOGLE_CLIENT_SECRET", "bench-client-secret")
+    env.setdefault("GOOGLE_REFRESH_TOKEN", "bench-refresh-token")
+    env.setdefault("EMAIL_SENDER", "bench@example.com")
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(values):
+    return {
+        "median": round(statistics.median(values), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    print(json.dumps({
+        "benchmark": "startup",
+        "runs": args.runs,
+        "statuses": sorted({r["status"] for r in runs}),
+        **{key: summarize([r[key] for r in runs])
+           for key in ("import_seconds", "startup_seconds", "first_request_seconds", "ready_seconds")},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
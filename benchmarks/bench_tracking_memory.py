@@ -0,0 +1,108 @@
+"""Compare memory used by tracking events: pydantic EmailEvent lists vs the columnar store.
+
+Usage: python -m benchmarks.bench_tracking_memory [--events 1000000] [--emails 10000]
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.models.email import EmailEvent, EmailStatus
+from app.services.tracking_store import InMemoryTrackingStore
+
+# Pixel traffic is dominated by a few image proxies and mail clients
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 5.1; rv:11.0) Gecko Firefox/11.0 (via ggpht.com GoogleImageProxy)",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko)",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Microsoft Office/16.0 (Windows NT 10.0; Microsoft Outlook 16.0.17029; Pro)",
+]
+
+def generate_rows(events: int, emails: int, seed: int = 1):
+    """Yield EventRow tuples; header strings are fresh objects, like per-request headers."""
+    rng = random.Random(seed)
+    tracking_ids = [f"{i:08x}-0000-4000-8000-{rng.getrandbits(48):012x}" for i in range(emails)]
+    ips = [f"66.249.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(200)]
+    start = time.time() - 86400
+    for i in range(events):
+        tracking_id = tracking_ids[i % emails]
+        if i < emails:
+            yield tracking_id, EmailStatus.SENT, start + i * 0.01, None, None, {"message_id": f"{i:016x}"}
+            continue
+        clicked = rng.random() < 0.05
+        yield (
+            tracking_id,
+            EmailStatus.CLICKED if clicked else EmailStatus.OPENED,
+            start + i * 0.01,
+            "".join(rng.choice(USER_AGENTS)),
+            "".join(rng.choice(ips)),
+            {"clicked_url": "https://example.com/task"} if clicked else {"source": "pixel"},
+        )
+
+def measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    began = time.perf_counter()
+    keep = build()
+    elapsed = time.perf_counter() - began
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    gc.collect()
+    return used, elapsed
+
+def build_pydantic(events: int, emails: int):
+    store = {}
+    for tracking_id, event_type, timestamp, user_agent, ip_address, metadata in generate_rows(events, emails):
+        store.setdefault(tracking_id, []).append(EmailEvent(
+            event_type=event_type,
+            timestamp=datetime.utcfromtimestamp(timestamp),
+            user_agent=user_agent,
+            ip_address=ip_address,
+            metadata=metadata,
+        ))
+    return store
+
+def build_columnar(events: int, emails: int):
+    store = InMemoryTrackingStore()
+    batch = []
+    for row in generate_rows(events, emails):
+        batch.append(row)
+        if len(batch) == 1000:
+            store.add_events(batch)
+            batch = []
+    store.add_events(batch)
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--emails", type=int, default=10_000)
+    args = parser.parse_args()
+
+    columnar_bytes, columnar_seconds = measure(lambda: build_columnar(args.events, args.emails))
+    pydantic_bytes, pydantic_seconds = measure(lambda: build_pydantic(args.events, args.emails))
+
+    print(json.dumps({
+        "benchmark": "tracking_memory",
+        "events": args.events,
+        "emails": args.emails,
+        "pydantic": {
+            "bytes": pydantic_bytes,
+            "bytes_per_event": round(pydantic_bytes / args.events, 1),
+            "build_seconds": round(pydantic_seconds, 3),
+        },
+        "columnar": {
+            "bytes": columnar_bytes,
+            "bytes_per_event": round(columnar_bytes / args.events, 1),
+            "build_seconds": round(columnar_seconds, 3),
+        },
+        "reduction": round(pydantic_bytes / columnar_bytes, 1) if columnar_bytes else None,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+# Settings() is created at import time and requires the Gmail credentials.
+# Point everything at dummy values and run from a scratch directory so the
+# tests never read a developer's .env or write into credentials/.
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("GOOGLE_REFRESH_TOKEN", "test-refresh-token")
+os.environ.setdefault("EMAIL_SENDER", "sender@example.com")
+os.chdir(tempfile.mkdtemp(prefix="task-manager-email-tests-"))
+
+import pytest  # noqa: E402
+from google.auth.credentials import AnonymousCredentials  # noqa: E402
+
+from app.core import gmail  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.rate_limit import QuotaRateLimiter  # noqa: E402
+from app.core.transports import GmailApiTransport  # noqa: E402
+from tests.fake_gmail import FakeGmailServer  # noqa: E402
+
+@pytest.fixture
+def fake_gmail(monkeypatch):
+    """A FakeGmailServer that EmailService sends through, with rate limiting out of the way."""
+    with FakeGmailServer() as server:
+        monkeypatch.setattr(settings, "GMAIL_API_ENDPOINT", server.url)
+        service = gmail.GmailService(rate_limiter=QuotaRateLimiter(max_rate=1e9, burst=1e9, min_rate=1e6))
+        service.credentials = AnonymousCredentials()
+        monkeypatch.setattr("app.services.email.email_transport", GmailApiTransport(service))
+        yield server
+        service.shutdown()
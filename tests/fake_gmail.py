@@ -0,0 +1,200 @@
+"""A tiny in-process stand-in for the Gmail REST API.
+
+Implements just enough of ``users.messages.send`` and the ``/batch/gmail/v1``
+multipart endpoint for the service to talk to it over real HTTP. Latency and
+server errors can be injected to simulate a slow or flaky Gmail.
+"""
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from email import message_from_bytes
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+SEND_PATH = "/gmail/v1/users/me/messages/send"
+BATCH_PATH = "/batch/gmail/v1"
+
+class FakeGmailServer:
+    """Args:
+        latency: seconds to wait before answering each HTTP request
+        jitter: extra random delay of up to this many seconds
+        error_rate: fraction of sends answered with ``error_status``
+        error_status: HTTP status used for injected errors
+        seed: seed for the latency and error randomness, for reproducible runs
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self.sent: List[dict] = []  # {"id", "raw", "message"} per accepted send
+        self.request_count = 0
+        self.batch_count = 0
+        self.throttled_count = 0
+        self.error_count = 0
+        self._throttle_remaining = 0
+        self._retry_after = None
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FakeGmailServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def throttle_next(self, count: int, retry_after: float = None) -> None:
+        """Answer the next ``count`` send calls with 429 rateLimitExceeded."""
+        with self._lock:
+            self._throttle_remaining = count
+            self._retry_after = retry_after
+
+    def _take_throttle(self) -> bool:
+        with self._lock:
+            if self._throttle_remaining <= 0:
+                return False
+            self._throttle_remaining -= 1
+            self.throttled_count += 1
+            return True
+
+    def _delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def _take_error(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            if self._random.random() >= self.error_rate:
+                return False
+            self.error_count += 1
+            return True
+
+    def _throttled_body(self) -> dict:
+        return {"error": {
+            "code": 429,
+            "message": "Too many concurrent requests for user",
+            "errors": [{"reason": "rateLimitExceeded", "domain": "usageLimits"}],
+        }}
+
+    def _retry_after_header(self) -> str:
+        if self._retry_after is None:
+            return ""
+        return f"Retry-After: {self._retry_after}\r\n"
+
+    def _accept(self, body: bytes) -> Tuple[int, dict]:
+        """Handle one messages.send call and return (status, json body)."""
+        if self._take_throttle():
+            return 429, self._throttled_body()
+        if self._take_error():
+            return self.error_status, {"error": {
+                "code": self.error_status,
+                "message": "Backend Error",
+                "errors": [{"reason": "backendError", "domain": "global"}],
+            }}
+        payload = json.loads(body or b"{}")
+        raw = payload.get("raw")
+        if not raw:
+            return 400, {"error": {"code": 400, "message": "Missing raw message"}}
+        message_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self.sent.append({
+                "id": message_id,
+                "raw": raw,
+                "message": message_from_bytes(base64.urlsafe_b64decode(raw)),
+            })
+        return 200, {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]}
+
+    def _batch(self, content_type: str, body: bytes) -> Tuple[str, bytes]:
+        """Handle a multipart/mixed batch and build the multipart response."""
+        container = BytesParser().parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+        )
+        boundary = "batch_" + uuid.uuid4().hex
+        parts = []
+        for part in container.get_payload():
+            inner = part.get_payload(decode=False)
+            inner_bytes = inner.encode() if isinstance(inner, str) else inner
+            head, _, inner_body = inner_bytes.replace(b"\r\n", b"\n").partition(b"\n\n")
+            request_line = head.split(b"\n", 1)[0].decode()
+            path = request_line.split(" ")[1].split("?")[0]
+            if path == SEND_PATH:
+                status, result = self._accept(inner_body)
+            else:
+                status, result = 404, {"error": {"code": 404, "message": "Not found"}}
+            content_id = part["Content-ID"].strip()
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n"
+                f"{self._retry_after_header() if status == 429 else ''}\r\n"
+                f"{json.dumps(result)}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return boundary, "".join(parts).encode()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if status == 429 and server._retry_after is not None:
+                    self.send_header("Retry-After", str(server._retry_after))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                path = self.path.split("?")[0]
+                with server._lock:
+                    server.request_count += 1
+                delay = server._delay()
+                if delay:
+                    time.sleep(delay)
+                if path == SEND_PATH:
+                    status, result = server._accept(body)
+                    self._reply(status, json.dumps(result).encode(), "application/json")
+                elif path == BATCH_PATH:
+                    with server._lock:
+                        server.batch_count += 1
+                    boundary, content = server._batch(self.headers["Content-Type"], body)
+                    self._reply(200, content, f"multipart/mixed; boundary={boundary}")
+                else:
+                    self._reply(404, b'{"error": {"code": 404}}', "application/json")
+
+        return Handler
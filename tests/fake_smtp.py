@@ -0,0 +1,122 @@
+"""A tiny in-process SMTP server for transport tests.
+
+Speaks just enough ESMTP (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP,
+QUIT) for ``smtplib`` to deliver to it, and records every session and
+message. Recipients starting with ``reject`` are refused, and the server
+can drop a session after a number of messages, like a relay with a
+per-connection limit.
+"""
+import base64
+import socketserver
+import threading
+from email import message_from_bytes
+from typing import List, Optional
+
+class FakeSmtpServer:
+    """Args:
+        username, password: credentials AUTH PLAIN must match, if set
+        drop_after: silently close a session after this many messages
+    """
+
+    def __init__(self, username: Optional[str] = None, password: Optional[str] = None,
+                 drop_after: Optional[int] = None):
+        self.username = username
+        self.password = password
+        self.drop_after = drop_after
+        self.sent: List[dict] = []  # {"session", "from", "to", "message"} per accepted message
+        self.session_count = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "FakeSmtpServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                with server._lock:
+                    server.session_count += 1
+                    session = server.session_count
+                delivered = 0
+                sender, recipients = None, []
+                authenticated = server.username is None
+                self.reply("220 fake-smtp ready")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command, _, argument = line.decode().strip().partition(" ")
+                    command = command.upper()
+                    if command in ("EHLO", "HELO"):
+                        self.wfile.write(b"250-fake-smtp\r\n250 AUTH PLAIN\r\n")
+                    elif command == "AUTH":
+                        _, _, credentials = argument.partition(" ")
+                        _, user, password = base64.b64decode(credentials).decode().split("\0")
+                        authenticated = (user, password) == (server.username, server.password)
+                        self.reply("235 ok" if authenticated else "535 bad credentials")
+                    elif not authenticated and command in ("MAIL", "RCPT", "DATA"):
+                        self.reply("530 authentication required")
+                    elif command == "MAIL":
+                        sender, recipients = argument.split(":", 1)[1].strip("<>"), []
+                        self.reply("250 ok")
+                    elif command == "RCPT":
+                        recipient = argument.split(":", 1)[1].strip("<>")
+                        if recipient.startswith("reject"):
+                            self.reply("550 no such user")
+                        else:
+                            recipients.append(recipient)
+                            self.reply("250 ok")
+                    elif command == "DATA":
+                        self.reply("354 go ahead")
+                        data = bytearray()
+                        while True:
+                            chunk = self.rfile.readline()
+                            if chunk in (b".\r\n", b""):
+                                break
+                            data += chunk[1:] if chunk.startswith(b"..") else chunk
+                        with server._lock:
+                            server.sent.append({
+                                "session": session,
+                                "from": sender,
+                                "to": recipients,
+                                "message": message_from_bytes(bytes(data)),
+                            })
+                        delivered += 1
+                        self.reply("250 queued")
+                        if server.drop_after is not None and delivered >= server.drop_after:
+                            return
+                    elif command in ("RSET", "NOOP"):
+                        self.reply("250 ok")
+                    elif command == "QUIT":
+                        self.reply("221 bye")
+                        return
+                    else:
+                        self.reply("502 not implemented")
+
+        return Handler
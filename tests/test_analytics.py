@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from app.models.email import EmailStatus
+from app.services.analytics import AnalyticsAggregator
+from app.services.tracking_store import to_epoch
+
+NOW = to_epoch(datetime(2025, 3, 1, 12, 0, 0))
+DAY = 86400
+
+def test_counts_are_unique_per_email():
+    analytics = AnalyticsAggregator()
+    analytics.record("a", EmailStatus.SENT, NOW - 60)
+    for _ in range(5):
+        analytics.record("a", EmailStatus.OPENED, NOW - 30)
+    analytics.record("b", EmailStatus.SENT, NOW - 60)
+
+    result = analytics.snapshot(now=NOW)
+
+    assert result.total_sent == 2
+    assert result.total_opened == 1
+    assert result.average_open_rate == 0.5
+
+def test_days_window_only_sums_recent_buckets():
+    analytics = AnalyticsAggregator()
+    analytics.record("old", EmailStatus.SENT, NOW - 10 * DAY)
+    analytics.record("old", EmailStatus.OPENED, NOW - 10 * DAY + 60)
+    analytics.record("new", EmailStatus.SENT, NOW - DAY)
+
+    assert analytics.snapshot(days=7, now=NOW).total_sent == 1
+    assert analytics.snapshot(days=7, now=NOW).total_opened == 0
+    assert analytics.snapshot(days=30, now=NOW).total_sent == 2
+
+def test_peak_times_and_failures_are_computed():
+    analytics = AnalyticsAggregator()
+    busy_hour = NOW - 3 * 3600
+    for i in range(10):
+        analytics.record(f"e{i}", EmailStatus.OPENED, busy_hour + i)
+    analytics.record("x", EmailStatus.OPENED, NOW - 3600)
+    analytics.record("f1", EmailStatus.FAILED, NOW, {"error": "quota"})
+    analytics.record("f2", EmailStatus.FAILED, NOW, {"error": "quota"})
+    analytics.record("f3", EmailStatus.FAILED, NOW, {"error": "bad address"})
+    analytics.record("s1", EmailStatus.SENT, NOW)
+
+    result = analytics.snapshot(days=1, now=NOW)
+
+    assert result.peak_times[0] == datetime(2025, 3, 1, 9, 0, 0)
+    assert len(result.peak_times) == 2
+    assert result.common_failures == {"quota": 2, "bad address": 1}
+    assert result.delivery_success_rate == 0.25
@@ -0,0 +1,46 @@
+import pytest
+
+from app.core import gmail
+from app.core.config import settings
+from app.models.email import EmailRequest, EmailStatus
+from app.services.email import email_service
+from app.services.tracking import tracking_service
+
+def make_request(i: int) -> EmailRequest:
+    return EmailRequest(
+        to=f"user{i}@example.com",
+        subject=f"Task {i}",
+        task_id=str(i),
+        task_title=f"Task {i}",
+        task_description="Batch test",
+        priority=3,
+    )
+
+@pytest.mark.asyncio
+async def test_send_batch_chunks_by_batch_size(fake_gmail, monkeypatch):
+    monkeypatch.setattr(settings, "GMAIL_BATCH_SIZE", 4)
+    requests = [make_request(i) for i in range(10)]
+
+    responses = await email_service.send_batch_emails(requests)
+
+    assert fake_gmail.batch_count == 3
+    assert [r.status for r in responses] == [EmailStatus.SENT] * 10
+    assert len({r.tracking_id for r in responses}) == 10
+    sent_ids = {m["id"] for m in fake_gmail.sent}
+    assert {r.message_id for r in responses} == sent_ids
+    # Responses line up with requests
+    by_id = {m["id"]: m["message"] for m in fake_gmail.sent}
+    for request, response in zip(requests, responses):
+        assert by_id[response.message_id]["to"] == request.to
+        events = await tracking_service.get_email_events(response.tracking_id)
+        assert [e.event_type for e in events] == [EmailStatus.PENDING, EmailStatus.SENT]
+
+@pytest.mark.asyncio
+async def test_batch_size_is_capped_at_gmail_limit(fake_gmail, monkeypatch):
+    monkeypatch.setattr(settings, "GMAIL_BATCH_SIZE", 500)
+    requests = [make_request(i) for i in range(gmail.GMAIL_MAX_BATCH_SIZE + 1)]
+
+    responses = await email_service.send_batch_emails(requests)
+
+    assert fake_gmail.batch_count == 2
+    assert all(r.status == EmailStatus.SENT for r in responses)
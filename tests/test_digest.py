@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.models.email import EmailRequest, EmailStatus
+from app.services.email import EmailService
+from app.services.tracking import tracking_service
+
+@pytest.fixture(autouse=True)
+def digests_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_DIGEST_ENABLED", True)
+
+def make_service(window: float, max_delay: float, max_items: int = 50) -> EmailService:
+    service = EmailService()
+    service.digests.window = window
+    service.digests.max_delay = max_delay
+    service.digests.max_items = max_items
+    return service
+
+def make_request(i: int, to: str = "user@example.com", priority: int = 3) -> EmailRequest:
+    return EmailRequest(
+        to=to,
+        subject=f"Task {i}",
+        task_id=str(i),
+        task_title=f"Task {i}",
+        task_description="Digest test",
+        priority=priority,
+    )
+
+def html_of(message) -> str:
+    part = next(part for part in message.walk() if part.get_content_type() == "text/html")
+    return part.get_payload(decode=True).decode()
+
+async def sent_event(tracking_id: str):
+    events = await tracking_service.get_email_events(tracking_id)
+    return next(e for e in events if e.event_type != EmailStatus.PENDING)
+
+@pytest.mark.asyncio
+async def test_notifications_within_window_share_one_email(fake_gmail):
+    service = make_service(window=0.1, max_delay=5)
+    responses = [await service.send_task_email(make_request(i)) for i in range(3)]
+    responses.append(await service.send_task_email(make_request(3, to="USER@example.com")))
+    other = await service.send_task_email(make_request(4, to="other@example.com"))
+
+    assert all(r.status == EmailStatus.PENDING for r in responses + [other])
+    assert service.digests.pending == 5
+    await asyncio.sleep(0.4)
+
+    assert len(fake_gmail.sent) == 2
+    by_to = {m["message"]["to"].lower(): m for m in fake_gmail.sent}
+    digest = by_to["user@example.com"]
+    assert digest["message"]["subject"] == "4 task updates"
+    html = html_of(digest["message"])
+    for response in responses:
+        assert f"/track/{response.tracking_id}/pixel" in html
+        event = await sent_event(response.tracking_id)
+        assert event.event_type == EmailStatus.SENT
+        assert event.metadata == {"message_id": digest["id"], "digest_size": "4"}
+    # A digest of one is a normal task notification
+    assert by_to["other@example.com"]["message"]["subject"] == "Task 4"
+    assert (await sent_event(other.tracking_id)).metadata == {"message_id": by_to["other@example.com"]["id"]}
+    assert (service.digests.digests_sent, service.digests.notifications_coalesced) == (2, 5)
+
+@pytest.mark.asyncio
+async def test_max_delay_bounds_a_busy_window(fake_gmail):
+    service = make_service(window=0.15, max_delay=0.3)
+    for i in range(5):
+        await service.send_task_email(make_request(i))
+        await asyncio.sleep(0.1)
+    # New arrivals kept extending the window, but the first is never held past max_delay
+    assert len(fake_gmail.sent) == 1
+    await asyncio.sleep(0.4)
+    assert len(fake_gmail.sent) == 2
+    assert service.digests.pending == 0
+
+@pytest.mark.asyncio
+async def test_highest_priority_sends_held_notifications_now(fake_gmail):
+    service = make_service(window=60, max_delay=60)
+    held = await service.send_task_email(make_request(1, priority=5))
+    urgent = await service.send_task_email(make_request(2, priority=1))
+
+    assert urgent.status == EmailStatus.SENT
+    assert len(fake_gmail.sent) == 1
+    assert fake_gmail.sent[0]["id"] == urgent.message_id
+    html = html_of(fake_gmail.sent[0]["message"])
+    assert html.index("Task 2") < html.index("Task 1")
+    assert (await sent_event(held.tracking_id)).metadata["message_id"] == urgent.message_id
+    assert service.digests.pending == 0
+
+@pytest.mark.asyncio
+async def test_flush_all_and_max_items(fake_gmail):
+    service = make_service(window=60, max_delay=60, max_items=2)
+    await service.send_task_email(make_request(1))
+    await service.send_task_email(make_request(2))
+    await service.send_task_email(make_request(3, to="other@example.com"))
+    await asyncio.sleep(0.1)
+    assert len(fake_gmail.sent) == 1
+
+    await service.digests.flush_all()
+    assert len(fake_gmail.sent) == 2
+    assert service.digests.pending == 0
+
+@pytest.mark.asyncio
+async def test_full_digest_is_sent_without_waiting_out_the_window(fake_gmail):
+    service = make_service(window=60, max_delay=60, max_items=3)
+    await service.send_task_email(make_request(1))
+    await asyncio.sleep(0.05)  # The flush task is now waiting on the window
+    await service.send_task_email(make_request(2))
+    await service.send_task_email(make_request(3))
+    await asyncio.sleep(0.1)
+
+    assert len(fake_gmail.sent) == 1
+    assert fake_gmail.sent[0]["message"]["subject"] == "3 task updates"
+    assert service.digests.pending == 0
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+import pytest
+
+from app.core.executor import BoundedExecutor, ExecutorQueueFullError
+
+@pytest.mark.asyncio
+async def test_runs_off_the_event_loop():
+    executor = BoundedExecutor(max_workers=2, max_queue=2, thread_name_prefix="test")
+    try:
+        name = await executor.run(lambda: threading.current_thread().name)
+        assert name.startswith("test")
+        assert executor.pending == 0
+    finally:
+        executor.shutdown()
+
+@pytest.mark.asyncio
+async def test_rejects_work_beyond_queue_limit():
+    executor = BoundedExecutor(max_workers=1, max_queue=1, thread_name_prefix="test")
+    release = threading.Event()
+    try:
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert executor.pending == 2
+        assert executor.queued == 1
+
+        with pytest.raises(ExecutorQueueFullError):
+            await executor.run(release.wait)
+
+        release.set()
+        assert await running is True
+        assert await queued is True
+        assert executor.pending == 0
+    finally:
+        release.set()
+        executor.shutdown()
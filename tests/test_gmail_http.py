@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+
+from app.core import gmail
+from app.core.config import settings
+from app.core.rate_limit import QuotaRateLimiter
+from tests.fake_gmail import FakeGmailServer
+
+@pytest.fixture
+def httpx_gmail(monkeypatch):
+    with FakeGmailServer() as server:
+        monkeypatch.setattr(settings, "GMAIL_API_ENDPOINT", server.url)
+        monkeypatch.setattr(settings, "GMAIL_TRANSPORT", "httpx")
+        monkeypatch.setattr(settings, "GMAIL_HTTP_MAX_CONNECTIONS", 4)
+        yield server
+
+@pytest.fixture
+def service(httpx_gmail):
+    limiter = QuotaRateLimiter(max_rate=1e9, burst=1e9, min_rate=1e6)
+    service = gmail.GmailService(rate_limiter=limiter)
+    service.credentials = AnonymousCredentials()
+    yield service
+    service.shutdown()
+
+@pytest.mark.asyncio
+async def test_sends_over_pooled_connections(httpx_gmail, service):
+    ids = await asyncio.gather(*(
+        service.send_message(f"user{i}@example.com", f"Task {i}", "<p>Hello</p>") for i in range(20)
+    ))
+    await service.aclose()
+
+    assert all(ids)
+    assert sorted(ids) == sorted(m["id"] for m in httpx_gmail.sent)
+    assert httpx_gmail.sent[0]["message"]["Subject"].startswith("Task ")
+    # The send worker pool is never used on this transport
+    assert service.executor.pending == 0
+
+@pytest.mark.asyncio
+async def test_throttled_send_is_retried(httpx_gmail, service):
+    httpx_gmail.throttle_next(2, retry_after=0)
+
+    message_id = await service.send_message("user@example.com", "Hi", "<p>Hello</p>")
+    await service.aclose()
+
+    assert message_id == httpx_gmail.sent[0]["id"]
+    assert httpx_gmail.throttled_count == 2
+    assert service.rate_limiter.throttle_count == 2
+
+@pytest.mark.asyncio
+async def test_injected_server_errors_fail_the_send(monkeypatch):
+    with FakeGmailServer(error_rate=1.0, seed=1) as server:
+        monkeypatch.setattr(settings, "GMAIL_API_ENDPOINT", server.url)
+        monkeypatch.setattr(settings, "GMAIL_TRANSPORT", "httpx")
+        service = gmail.GmailService(rate_limiter=QuotaRateLimiter(max_rate=1e9, burst=1e9, min_rate=1e6))
+        service.credentials = AnonymousCredentials()
+
+        message_id = await service.send_message("user@example.com", "Hi", "<p>Hello</p>")
+        await service.aclose()
+        service.shutdown()
+
+    assert message_id is None
+    assert server.error_count == 1
+    assert server.sent == []
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main
+from app.core.mime import MessageBuilder
+from app.core.transports import SmtpTransport
+from app.services.health import HealthChecker
+from app.services.tracking_store import SQLiteTrackingStore
+from tests.fake_smtp import FakeSmtpServer
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class CountingCheck:
+    def __init__(self, detail: str = "ok", error: Exception = None, delay: float = 0.0):
+        self.detail = detail
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.detail
+
+@pytest.mark.asyncio
+async def test_checks_run_concurrently_and_results_go_stale():
+    clock = Clock()
+    checker = HealthChecker({
+        "fine": CountingCheck("up", delay=0.1),
+        "broken": CountingCheck(error=ConnectionRefusedError("refused")),
+        "stuck": CountingCheck(delay=10),
+    }, interval=10, timeout=0.2, clock=clock)
+    assert checker.result["ready"] is False
+
+    result = await asyncio.wait_for(checker.run_checks(), 1)
+    checks = result["checks"]
+    assert (checks["fine"]["ok"], checks["fine"]["detail"]) == (True, "up")
+    assert (checks["broken"]["ok"], checks["broken"]["detail"]) == (False, "refused")
+    assert (checks["stuck"]["ok"], checks["stuck"]["detail"]) == (False, "timed out after 0.2s")
+    assert result["ready"] is False
+
+    checker.checks = {"fine": CountingCheck()}
+    assert (await checker.run_checks())["ready"] is True
+    clock.now += 30
+    assert checker.result["ready"] is True
+    clock.now += 1
+    assert checker.result["ready"] is False
+
+def test_probes_serve_the_cached_result(monkeypatch):
+    check = CountingCheck()
+    checker = HealthChecker({"transport": check}, interval=10, timeout=1)
+    monkeypatch.setattr(app.main, "health_checker", checker)
+    client = TestClient(app.main.app)
+
+    assert client.get("/health/live").json() == {"status": "alive"}
+    assert client.get("/health/ready").status_code == 503
+    asyncio.run(checker.run_checks())
+    for _ in range(5):
+        ready = client.get("/health/ready")
+        assert (ready.status_code, ready.json()["checks"]["transport"]["detail"]) == (200, "ok")
+    health = client.get("/health").json()
+    assert (health["status"], health["readiness"]["ready"]) == ("healthy", True)
+    assert "smtp_password" not in str(health).lower()
+    assert check.calls == 1
+
+@pytest.mark.asyncio
+async def test_smtp_check_reuses_pooled_connections():
+    with FakeSmtpServer(username="relay", password="secret") as server:
+        transport = SmtpTransport(
+            server.host, server.port, username="relay", password="secret", use_tls=False,
+            message_builder=MessageBuilder("Task Manager", "tasks@example.com"), pool_size=2,
+        )
+        for _ in range(3):
+            assert "NOOP" in await transport.check()
+        await transport.send_message("user@example.com", "Hi", "<p>Hi</p>")
+        transport.shutdown()
+    assert server.session_count == 1
+    assert len(server.sent) == 1
+
+@pytest.mark.asyncio
+async def test_stopped_smtp_server_fails_the_check():
+    with FakeSmtpServer() as server:
+        host, port = server.host, server.port
+    transport = SmtpTransport(host, port, use_tls=False, message_builder=MessageBuilder("Task Manager", "t@example.com"),
+                              timeout=1)
+    with pytest.raises(OSError):
+        await transport.check()
+    transport.shutdown()
+
+def test_sqlite_store_check(tmp_path):
+    store = SQLiteTrackingStore(str(tmp_path / "tracking.db"))
+    store.check()
+    store.close()
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import email
+from app.models.email import EmailResponse, EmailStatus
+from app.services.idempotency import IdempotencyCache
+
+def response(status: EmailStatus = EmailStatus.SENT, message_id: str = "m1") -> EmailResponse:
+    return EmailResponse(status=status, message_id=message_id, timestamp=datetime.utcnow(), tracking_id="t1")
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_send():
+    cache = IdempotencyCache(max_entries=10, ttl_seconds=60)
+    calls = 0
+
+    async def send():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return response()
+
+    results = await asyncio.gather(*(cache.run("k", send) for _ in range(5)))
+
+    assert calls == 1
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert all(r.message_id == "m1" for r, _ in results)
+    assert cache.coalesced == 4
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_the_send_to_a_waiting_duplicate():
+    cache = IdempotencyCache(max_entries=10, ttl_seconds=60)
+    calls = 0
+
+    async def send():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return response(message_id=f"m{calls}")
+
+    leader = asyncio.create_task(cache.run("k", send))
+    await asyncio.sleep(0.01)
+    duplicates = [asyncio.create_task(cache.run("k", send)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    results = await asyncio.gather(*duplicates)
+    assert leader.cancelled()
+    assert calls == 2
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert all(r.message_id == "m2" for r, _ in results)
+    assert cache.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_entries_expire_and_failures_are_not_cached():
+    clock = Clock()
+    cache = IdempotencyCache(max_entries=10, ttl_seconds=60, clock=clock)
+
+    async def failed():
+        return response(EmailStatus.FAILED, "")
+
+    async def sent():
+        return response()
+
+    assert (await cache.run("k", failed))[1] is False
+    assert (await cache.run("k", sent))[1] is False
+    assert (await cache.run("k", sent))[1] is True
+    clock.now = 61
+    assert (await cache.run("k", sent))[1] is False
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IdempotencyCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", response(message_id="a"))
+    cache.put("b", response(message_id="b"))
+    cache.get("a")
+    cache.put("c", response(message_id="c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").message_id == "a"
+    assert len(cache) == 2
+
+@pytest.fixture
+def client(monkeypatch, fake_gmail):
+    monkeypatch.setattr(email, "idempotency_cache", IdempotencyCache(max_entries=100, ttl_seconds=60))
+    app = FastAPI()
+    app.include_router(email.router, prefix="/api/v1/email")
+    with TestClient(app) as client:
+        client.fake_gmail = fake_gmail
+        yield client
+
+PAYLOAD = {
+    "to": "user@example.com",
+    "subject": "Task assigned",
+    "task_id": "42",
+    "task_title": "Task 42",
+    "task_description": "Retry me",
+    "priority": 3,
+}
+
+def test_retried_send_is_replayed(client):
+    first = client.post("/api/v1/email/send", json=PAYLOAD)
+    retry = client.post("/api/v1/email/send", json=PAYLOAD)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["tracking_id"] == first.json()["tracking_id"]
+    assert len(client.fake_gmail.sent) == 1
+
+def test_idempotency_key_header_takes_precedence(client):
+    first = client.post("/api/v1/email/send", json=PAYLOAD, headers={"Idempotency-Key": "a"})
+    second = client.post("/api/v1/email/send", json=PAYLOAD, headers={"Idempotency-Key": "b"})
+
+    assert "Idempotent-Replayed" not in second.headers
+    assert first.json()["message_id"] != second.json()["message_id"]
+    assert len(client.fake_gmail.sent) == 2
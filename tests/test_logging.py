@@ -0,0 +1,58 @@
+import io
+import json
+import logging
+import logging.handlers
+import sys
+
+from app.core import logging_config
+from app.core.config import settings
+from app.core.logging_config import JsonFormatter, SamplingFilter
+
+def make_record(level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.makeLogRecord({
+        "name": "app.test", "levelno": level, "levelname": logging.getLevelName(level),
+        "msg": "sent %s", "args": ("m1",),
+    })
+    record.__dict__.update(extra)
+    return record
+
+def test_sampling_filter_keeps_one_in_n_and_all_warnings():
+    sampler = SamplingFilter(0.1)
+    kept = sum(sampler.filter(make_record()) for _ in range(100))
+    assert kept == 10
+    assert all(sampler.filter(make_record(logging.WARNING)) for _ in range(5))
+    assert not SamplingFilter(0).filter(make_record())
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(make_record(tracking_id="t1"))
+    entry = json.loads(line)
+    assert entry["message"] == "sent m1"
+    assert entry["level"] == "INFO"
+    assert entry["tracking_id"] == "t1"
+
+def test_setup_logging_writes_through_queue_listener(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", stream)
+    monkeypatch.setattr(settings, "LOG_FORMAT", "json")
+    monkeypatch.setattr(settings, "LOG_LEVEL", "INFO")
+    root = logging.getLogger()
+    previous_level = root.level
+    try:
+        logging_config.setup_logging()
+        logging.getLogger("app.test").debug("hidden")
+        logging.getLogger("app.test").info("visible %s", 1)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("app.test").exception("send failed")
+        logging_config.shutdown_logging()
+    finally:
+        for handler in list(root.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+        root.setLevel(previous_level)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [entry["message"] for entry in lines] == ["visible 1", "send failed"]
+    assert "Traceback" not in lines[1]["message"]
+    assert "ValueError: boom" in lines[1]["exc_info"]
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import email
+from app.core.circuit_breaker import CLOSED, CircuitBreaker
+from app.core.config import settings
+from app.models.email import EmailStatus
+from app.services.email import email_service
+from app.services.mail_merge import MailMergeService, MailMergeStore, read_rows
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, fake_gmail):
+    merge = MailMergeService(MailMergeStore(str(tmp_path / "merge.db")), concurrency=4, queue_size=2,
+                             result_batch=5)
+    monkeypatch.setattr(email, "mail_merge_service", merge)
+    app = FastAPI()
+    app.include_router(email.router, prefix="/api/v1/email")
+    with TestClient(app) as client:
+        client.fake_gmail = fake_gmail
+        yield client
+
+def wait_for_job(client, job_id: str) -> dict:
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/email/merge/{job_id}").json()
+        if job["state"] != "running":
+            return job
+        time.sleep(0.02)
+    raise AssertionError("mail-merge job did not finish")
+
+def all_rows(client, job_id: str) -> list:
+    rows, after = [], 0
+    while True:
+        page = client.get(f"/api/v1/email/merge/{job_id}/rows", params={"after": after, "limit": 10}).json()
+        if not page["rows"]:
+            return rows
+        rows.extend(page["rows"])
+        after = page["next_after"]
+
+def chunked(data: bytes, size: int = 100):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def test_ndjson_merge_renders_every_row(client):
+    lines = [json.dumps({"to": f"user{i}@example.com", "task_title": f"Launch {i}", "task_description": "Soon"})
+             for i in range(20)]
+    lines[5] = "{not json"
+    lines[9] = json.dumps({"to": "not-an-address", "task_title": "x"})
+    response = client.post(
+        "/api/v1/email/merge",
+        params={"subject": "Announcing {{ task_title }}", "priority": 1},
+        content=chunked("\n".join(lines).encode()),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 202
+
+    job = wait_for_job(client, response.json()["job_id"])
+    assert (job["state"], job["rows_read"], job["sent"], job["failed"]) == ("completed", 20, 18, 2)
+
+    rows = all_rows(client, job["job_id"])
+    assert sorted(row["row"] for row in rows) == list(range(1, 21))
+    failed = {row["row"]: row["error"] for row in rows if row["status"] == EmailStatus.FAILED.value}
+    assert failed == {6: "Invalid JSON", 10: "Invalid or missing 'to' address"}
+
+    sent = {m["message"]["to"]: m["message"] for m in client.fake_gmail.sent}
+    message = sent["user3@example.com"]
+    assert message["subject"] == "Announcing Launch 3"
+    html = next(part for part in message.walk() if part.get_content_type() == "text/html")
+    assert "Launch 3" in html.get_payload(decode=True).decode()
+
+def test_csv_merge_and_upload_errors(client, monkeypatch):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["to", "task_title", "task_description"])
+    for i in range(7):
+        writer.writerow([f"user{i}@example.com", f"Task {i}", "From CSV"])
+    response = client.post(
+        "/api/v1/email/merge",
+        params={"subject": "Hello"},
+        content=buffer.getvalue().encode(),
+        headers={"Content-Type": "text/csv; charset=utf-8"}
+    )
+    job = wait_for_job(client, response.json()["job_id"])
+    assert (job["state"], job["sent"]) == ("completed", 7)
+
+    def post(body: bytes, content_type: str, **params):
+        return client.post("/api/v1/email/merge", params={"subject": "Hi", **params}, content=body,
+                           headers={"Content-Type": content_type})
+
+    assert post(b"email,name\n", "text/csv").status_code == 400
+    assert post(b"{}", "application/json").status_code == 415
+    assert post(b"{}", "application/x-ndjson", template="../secrets.html").status_code == 400
+    assert post(b"{}", "application/x-ndjson", subject="{{ broken").status_code == 400
+    monkeypatch.setattr(settings, "MAIL_MERGE_MAX_UPLOAD_BYTES", 10)
+    assert post(b"x" * 11, "application/x-ndjson").status_code == 413
+    assert client.get("/api/v1/email/merge/missing").status_code == 404
+
+def test_merge_rows_wait_out_an_open_circuit_and_retry_transient_errors(client, monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.3)
+    for _ in range(3):
+        breaker.record_failure()
+    monkeypatch.setattr(email_service, "breaker", breaker)
+    monkeypatch.setattr(settings, "EMAIL_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "EMAIL_RETRY_MAX_ATTEMPTS", 10)
+    client.fake_gmail.error_rate, client.fake_gmail.error_status = 0.3, 503
+
+    lines = [json.dumps({"to": f"user{i}@example.com", "task_title": f"Task {i}"}) for i in range(20)]
+    response = client.post("/api/v1/email/merge", params={"subject": "Hi"}, content="\n".join(lines).encode(),
+                           headers={"Content-Type": "application/x-ndjson"})
+    job = wait_for_job(client, response.json()["job_id"])
+
+    assert (job["state"], job["sent"], job["failed"]) == ("completed", 20, 0)
+    assert len(client.fake_gmail.sent) == 20
+    assert client.fake_gmail.error_count > 0
+    assert breaker.state == CLOSED
+
+def test_ndjson_rows_become_string_variables():
+    upload = io.BytesIO(b'{"to": "a@example.com", "n": 1}\n\n{"to": "b@example.com", "n": null}\n[1]\n')
+    rows = read_rows(upload, "ndjson")
+
+    assert next(rows) == (1, "a@example.com", {"n": "1"}, None)
+    assert list(rows) == [(2, "b@example.com", {"n": ""}, None), (3, None, {}, "Row is not a JSON object")]
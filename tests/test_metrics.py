@@ -0,0 +1,40 @@
+from app.core.metrics import Counter, Histogram, Registry, render_metrics
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.register(Histogram("stage_seconds", "Stage time.", ("stage",), buckets=(0.1, 1.0)))
+    render = latency.labels("render")
+    for value in (0.05, 0.5, 0.5, 3.0):
+        render.observe(value)
+
+    text = registry.render()
+
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="render",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="render",le="1"} 3' in text
+    assert 'stage_seconds_bucket{stage="render",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="render"} 4' in text
+    assert 'stage_seconds_sum{stage="render"} 4.05' in text
+
+def test_counters_and_collectors():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("endpoint",)))
+    requests.labels("pixel").inc()
+    requests.labels("pixel").inc(2)
+    registry.register_collector(lambda: [("queue_depth", "gauge", "Depth.", [({"priority": "1"}, 7)])])
+
+    text = registry.render()
+
+    assert 'requests_total{endpoint="pixel"} 3' in text
+    assert '# TYPE queue_depth gauge' in text
+    assert 'queue_depth{priority="1"} 7' in text
+
+def test_app_metrics_include_send_stages_and_collectors():
+    import app.main  # noqa: F401  (registers every collector)
+
+    text = render_metrics()
+
+    assert "# TYPE email_send_stage_seconds histogram" in text
+    assert "# TYPE tracking_requests_total counter" in text
+    assert "gmail_quota_rate_units" in text
+    assert "tracking_ingest_dropped_total" in text
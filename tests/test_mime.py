@@ -0,0 +1,50 @@
+import base64
+from email import message_from_bytes
+from email.policy import default
+
+from app.core.mime import MessageBuilder, choose_transfer_encoding, html_to_text
+
+HTML = """<html><head><style>p { color: red; }</style></head>
+<body><h2>New Task Created</h2><p>Write the docs &amp; ship</p>
+<a href="https://example.com/task">View Task Details</a></body></html>"""
+
+def parse(raw: str):
+    return message_from_bytes(base64.urlsafe_b64decode(raw), policy=default)
+
+def test_builds_parseable_alternative_message():
+    builder = MessageBuilder("Task Manager", "sender@example.com")
+
+    message = parse(builder.build_raw("user@example.com", "Tâche créée", HTML))
+
+    assert message["From"] == "Task Manager <sender@example.com>"
+    assert message["To"] == "user@example.com"
+    assert message["Subject"] == "Tâche créée"
+    assert message.get_content_type() == "multipart/alternative"
+    text, html = message.get_payload()
+    assert html.get_content_type() == "text/html"
+    assert html.get_content() == HTML
+    assert text.get_content_type() == "text/plain"
+    assert "Write the docs & ship" in text.get_content()
+    assert "color: red" not in text.get_content()
+
+def test_html_only_when_text_alternative_disabled():
+    builder = MessageBuilder("Task Manager", "sender@example.com", text_alternative=False)
+
+    message = parse(builder.build_raw("user@example.com", "Hi", HTML))
+
+    assert message.get_content_type() == "text/html"
+    assert message.get_content() == HTML
+
+def test_transfer_encoding_follows_content():
+    assert choose_transfer_encoding(HTML.encode()) == "7bit"
+    assert choose_transfer_encoding(("Descripción de la tarea " * 20).encode()) == "quoted-printable"
+    assert choose_transfer_encoding(("日本語のタスク" * 50).encode()) == "base64"
+    assert choose_transfer_encoding(b"x" * 2000) == "quoted-printable"
+
+def test_non_ascii_bodies_round_trip():
+    builder = MessageBuilder("Task Manager", "sender@example.com", text_alternative=False)
+    for body in ("<p>Descripción = ñandú</p>" * 40, "<p>日本語のタスク</p>" * 40):
+        assert parse(builder.build_raw("user@example.com", "Hi", body)).get_content() == body
+
+def test_html_to_text_keeps_links():
+    assert "View Task Details (https://example.com/task)" in html_to_text(HTML)
@@ -0,0 +1,77 @@
+import time
+import pytest
+
+from app.models.email import EmailRequest, Priority
+from app.services.queue import EmailQueue
+
+def make_request(priority: Priority, task_id: str = "1") -> EmailRequest:
+    return EmailRequest(
+        to="user@example.com",
+        subject="Queued",
+        task_id=task_id,
+        task_title="Queued task",
+        task_description="Queue test",
+        priority=priority,
+    )
+
+@pytest.fixture
+def queue(tmp_path):
+    q = EmailQueue(str(tmp_path / "queue.db"), aging_seconds=30.0)
+    yield q
+    q.close()
+
+def test_claims_in_priority_order(queue):
+    for priority in (Priority.LOWEST, Priority.MEDIUM, Priority.HIGHEST, Priority.HIGH):
+        queue.put(f"t-{priority.value}", make_request(priority))
+
+    claimed = [queue.claim().priority for _ in range(4)]
+
+    assert claimed == [1, 2, 3, 5]
+    assert queue.claim() is None
+
+def test_old_low_priority_mail_ages_ahead(tmp_path, monkeypatch):
+    queue = EmailQueue(str(tmp_path / "queue.db"), aging_seconds=10.0)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now - 45)  # waited 4.5 levels
+    queue.put("old-lowest", make_request(Priority.LOWEST))
+    monkeypatch.setattr(time, "time", lambda: now)
+    queue.put("new-highest", make_request(Priority.HIGHEST))
+
+    assert queue.claim().tracking_id == "old-lowest"
+    queue.close()
+
+def test_survives_restart_and_requeues_in_flight(tmp_path, monkeypatch):
+    path = str(tmp_path / "queue.db")
+    first = EmailQueue(path, aging_seconds=30.0, lease_seconds=60.0)
+    first.put("a", make_request(Priority.HIGH, "a"))
+    first.put("b", make_request(Priority.LOW, "b"))
+    in_flight = first.claim()
+    assert in_flight.tracking_id == "a"
+    first.close()
+
+    second = EmailQueue(path, aging_seconds=30.0, lease_seconds=60.0)
+    # Another worker may still be sending it until the lease runs out
+    assert second.recover() == 0
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert second.recover() == 1
+    assert second.depth()[Priority.HIGH.value] == 1
+    item = second.claim()
+    assert item.tracking_id == "a"
+    assert item.email_request.task_id == "a"
+    second.complete(item)
+    assert second.stats()["depth"] == 1
+    second.close()
+
+def test_starting_workers_leaves_live_leases_alone(tmp_path):
+    path = str(tmp_path / "queue.db")
+    busy = EmailQueue(path, aging_seconds=30.0)
+    busy.put("a", make_request(Priority.HIGH, "a"))
+    busy.claim()
+
+    late = EmailQueue(path, aging_seconds=30.0)
+    assert late.recover() == 0
+    assert late.claim() is None
+    assert late.state_counts() == {"due": 0, "retry_scheduled": 0, "dead": 0}
+    busy.close()
+    late.close()
@@ -0,0 +1,77 @@
+import time
+import pytest
+from google.auth.credentials import AnonymousCredentials
+
+from app.core import gmail
+from app.core.config import settings
+from app.core.rate_limit import QuotaRateLimiter
+from tests.fake_gmail import FakeGmailServer
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_refill():
+    limiter = QuotaRateLimiter(max_rate=1000.0, burst=100.0, min_rate=10.0)
+
+    assert await limiter.acquire(100) < 0.01  # burst available
+    waited = await limiter.acquire(100)
+
+    assert 0.07 < waited < 0.3
+
+@pytest.mark.asyncio
+async def test_throttle_halves_rate_and_honours_retry_after():
+    limiter = QuotaRateLimiter(max_rate=1000.0, burst=1000.0, min_rate=100.0)
+
+    limiter.on_throttle(retry_after=0.1)
+    assert limiter.rate == 500.0
+    start = time.monotonic()
+    await limiter.acquire(1)
+    assert time.monotonic() - start >= 0.09
+
+    for _ in range(10):
+        limiter.on_throttle(retry_after=0)
+    assert limiter.rate == 100.0
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 1000.0
+
+@pytest.fixture
+def throttling_gmail(monkeypatch):
+    with FakeGmailServer() as server:
+        monkeypatch.setattr(settings, "GMAIL_API_ENDPOINT", server.url)
+        limiter = QuotaRateLimiter(max_rate=100000.0, burst=100000.0, min_rate=1000.0)
+        service = gmail.GmailService(rate_limiter=limiter)
+        service.credentials = AnonymousCredentials()
+        yield server, service
+        service.shutdown()
+
+@pytest.mark.asyncio
+async def test_send_message_retries_after_429(throttling_gmail):
+    server, service = throttling_gmail
+    server.throttle_next(2, retry_after=0.05)
+
+    message_id = await service.send_message("user@example.com", "Hi", "<p>Hi</p>")
+
+    assert message_id == server.sent[0]["id"]
+    assert server.throttled_count == 2
+    assert service.rate_limiter.throttle_count == 2
+
+@pytest.mark.asyncio
+async def test_send_batch_retries_only_throttled_items(throttling_gmail):
+    server, service = throttling_gmail
+    server.throttle_next(3, retry_after=0)
+
+    results = await service.send_batch(
+        [(f"user{i}@example.com", f"Hi {i}", "<p>Hi</p>") for i in range(5)]
+    )
+
+    assert all(message_id and error is None for message_id, error in results)
+    assert len(server.sent) == 5
+    assert server.batch_count == 2
+
+@pytest.mark.asyncio
+async def test_gives_up_after_retry_limit(throttling_gmail, monkeypatch):
+    server, service = throttling_gmail
+    monkeypatch.setattr(settings, "GMAIL_RATE_LIMIT_RETRIES", 1)
+    server.throttle_next(5, retry_after=0)
+
+    assert await service.send_message("user@example.com", "Hi", "<p>Hi</p>") is None
+    assert server.throttled_count == 2
@@ -0,0 +1,180 @@
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import email
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.core.config import settings
+from app.models.email import EmailRequest, EmailStatus, Priority
+from app.services.email import email_service
+from app.services.queue import EmailQueue, retry_delay
+from app.services.tracking import tracking_service
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_request(task_id: str = "1") -> EmailRequest:
+    return EmailRequest(
+        to="user@example.com",
+        subject="Retry me",
+        task_id=task_id,
+        task_title="Flaky upstream",
+        task_description="Resilience test",
+        priority=Priority.HIGH,
+    )
+
+def test_breaker_opens_then_lets_one_trial_through():
+    clock = Clock()
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.before_call()
+    assert rejected.value.retry_after == 10
+
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # The trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert (breaker.opened_count, breaker.rejected_count) == (1, 2)
+
+def test_retry_delay_is_jittered_and_capped():
+    for attempt in range(1, 10):
+        full = min(60.0, 2.0 * 2 ** (attempt - 1))
+        delays = [retry_delay(attempt, 2.0, 60.0) for _ in range(50)]
+        assert all(full / 2 <= delay <= full for delay in delays)
+        assert len(set(delays)) > 1
+
+def test_queue_holds_retries_until_due_and_replays_dead_letters(tmp_path):
+    path = str(tmp_path / "queue.db")
+    # A queue table from before retries existed
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE email_queue (id INTEGER PRIMARY KEY AUTOINCREMENT, tracking_id TEXT NOT NULL, "
+                 "priority INTEGER NOT NULL, enqueued_at REAL NOT NULL, sort_key REAL NOT NULL, "
+                 "state TEXT NOT NULL DEFAULT 'queued', payload TEXT NOT NULL)")
+    conn.execute("INSERT INTO email_queue (tracking_id, priority, enqueued_at, sort_key, payload) "
+                 "VALUES ('old', 2, 0, 0, ?)", (make_request("old").model_dump_json(),))
+    conn.commit()
+    conn.close()
+
+    queue = EmailQueue(path, aging_seconds=30.0)
+    queue.put("later", make_request("later"), attempts=2, not_before=4102444800, last_error="503")
+    dead_id = queue.dead_letter("dead", make_request("dead"), attempts=5, error="quota")
+    old = queue.claim()
+    assert (old.tracking_id, old.attempts) == ("old", 0)
+    assert queue.claim() is None
+    assert queue.stats()["retry_scheduled"] == 1
+
+    [dead] = queue.dead_letters()
+    assert (dead.id, dead.attempts, dead.last_error, dead.email_request.task_id) == (dead_id, 5, "quota", "dead")
+    assert queue.replay(12345) == []
+    assert [item.tracking_id for item in queue.replay(dead_id)] == ["dead"]
+    replayed = queue.claim()
+    assert (replayed.tracking_id, replayed.attempts) == ("dead", 0)
+    assert queue.dead_letters() == []
+    queue.close()
+
+@pytest.fixture
+def flaky_gmail(monkeypatch, tmp_path, fake_gmail):
+    fake_gmail.error_rate, fake_gmail.error_status = 1.0, 503
+    monkeypatch.setattr(settings, "EMAIL_RETRY_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "EMAIL_RETRY_BASE_DELAY", 0.0)
+    queue = EmailQueue(str(tmp_path / "queue.db"), aging_seconds=30.0)
+    monkeypatch.setattr("app.services.email.email_queue", queue)
+    monkeypatch.setattr(email_service, "breaker", CircuitBreaker("test", failure_threshold=3, reset_timeout=60))
+    fake_gmail.queue = queue
+    yield fake_gmail
+    queue.close()
+
+async def event_types(tracking_id: str):
+    return [event.event_type for event in await tracking_service.get_email_events(tracking_id)]
+
+@pytest.mark.asyncio
+async def test_transient_failures_retry_then_dead_letter(flaky_gmail):
+    queue = flaky_gmail.queue
+    response = await email_service.send_task_email(make_request())
+    assert (response.status, response.delivery_attempts) == (EmailStatus.PENDING, 1)
+    assert flaky_gmail.error_count == 1
+
+    retry = queue.claim()
+    assert (retry.tracking_id, retry.attempts, retry.last_error is not None) == (response.tracking_id, 1, True)
+    await email_service.process_queued(retry)
+    queue.complete(retry)
+    assert await event_types(response.tracking_id) == [EmailStatus.PENDING, EmailStatus.PENDING, EmailStatus.FAILED]
+    [dead] = email_service.list_dead_letters()
+    assert (dead.tracking_id, dead.attempts) == (response.tracking_id, 2)
+    assert (await tracking_service.get_status(response.tracking_id)).status == EmailStatus.FAILED
+
+    flaky_gmail.error_rate = 0.0
+    [replayed] = await email_service.replay_dead_letters(dead.id)
+    assert (replayed.status, replayed.delivery_attempts) == (EmailStatus.PENDING, 2)
+    status = await tracking_service.get_status(response.tracking_id)
+    assert (status.status, status.error) == (EmailStatus.PENDING, None)
+    item = queue.claim()
+    await email_service.process_queued(item)
+    queue.complete(item)
+    status = await tracking_service.get_status(response.tracking_id)
+    assert status.status == EmailStatus.SENT
+    assert status.message_id == flaky_gmail.sent[0]["id"]
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_and_defers_retries(flaky_gmail):
+    for i in range(3):
+        await email_service.send_task_email(make_request(str(i)))
+    assert email_service.breaker.state == OPEN
+    assert flaky_gmail.request_count == 3
+
+    rejected = await email_service.send_task_email(make_request("fast"))
+    assert rejected.status == EmailStatus.PENDING
+    assert flaky_gmail.request_count == 3
+    assert email_service.breaker.rejected_count == 1
+    # Its retry waits out the open circuit rather than hammering the upstream
+    assert flaky_gmail.queue.state_counts() == {"due": 3, "retry_scheduled": 1, "dead": 0}
+
+@pytest.mark.asyncio
+async def test_batch_retries_transient_items_and_dead_letters_permanent_ones(flaky_gmail):
+    responses = await email_service.send_batch_emails([make_request(f"t{i}") for i in range(3)])
+    assert [(r.status, r.delivery_attempts) for r in responses] == [(EmailStatus.PENDING, 1)] * 3
+    assert flaky_gmail.queue.state_counts() == {"due": 3, "retry_scheduled": 0, "dead": 0}
+
+    flaky_gmail.error_status = 400
+    responses = await email_service.send_batch_emails([make_request(f"p{i}") for i in range(2)])
+    assert [(r.status, r.delivery_attempts) for r in responses] == [(EmailStatus.FAILED, 1)] * 2
+    assert flaky_gmail.queue.state_counts()["dead"] == 2
+    # Only the throttled batch counted against the upstream
+    assert email_service.breaker.state == CLOSED
+
+def test_permanent_failure_is_dead_lettered_and_replayable_over_http(flaky_gmail):
+    flaky_gmail.error_status = 400
+    app = FastAPI()
+    app.include_router(email.router, prefix="/api/v1/email")
+    with TestClient(app) as client:
+        sent = client.post("/api/v1/email/send", json=make_request("permanent").model_dump(mode="json"))
+        assert sent.json()["status"] == EmailStatus.FAILED.value
+
+        page = client.get("/api/v1/email/dead-letters").json()
+        [dead] = page["dead_letters"]
+        assert (dead["task_id"], dead["attempts"], page["next_after"]) == ("permanent", 1, dead["id"])
+        assert "400" in dead["error"]
+        assert client.get("/api/v1/email/dead-letters", params={"after": dead["id"]}).json()["dead_letters"] == []
+
+        replayed = client.post(f"/api/v1/email/dead-letters/{dead['id']}/replay")
+        assert (replayed.status_code, replayed.json()["status"]) == (202, EmailStatus.PENDING.value)
+        assert client.post(f"/api/v1/email/dead-letters/{dead['id']}/replay").status_code == 404
+        assert client.post("/api/v1/email/dead-letters/replay").json() == []
@@ -0,0 +1,86 @@
+import multiprocessing
+from datetime import datetime
+
+import pytest
+
+from app.models.email import EmailStatus
+from app.services.tracking import EmailTrackingService
+from app.services.shared_tracking import SharedSQLiteTrackingStore
+from app.services.tracking_store import SQLiteTrackingStore, to_epoch
+
+NOW = to_epoch(datetime(2025, 3, 1, 12, 0, 0))
+
+def open_store(path: str) -> SharedSQLiteTrackingStore:
+    return SharedSQLiteTrackingStore(path, batch_size=1000, flush_interval=60)
+
+def worker_opens(path: str, worker: int, count: int) -> None:
+    """Simulates one uvicorn worker recording opens for shared emails."""
+    store = open_store(path)
+    store.add_events([
+        (f"email-{i % 10}", EmailStatus.OPENED, NOW + worker * 3600 + i, "ua", "1.2.3.4", None)
+        for i in range(count)
+    ])
+    store.close()
+
+def test_workers_see_one_global_view(tmp_path):
+    path = str(tmp_path / "tracking.db")
+    first, second = open_store(path), open_store(path)
+    first.add_events([(f"email-{i}", EmailStatus.SENT, NOW, None, None, None) for i in range(4)])
+    first.flush()
+    # The same email opened and clicked through two different workers
+    second.add_events([("email-0", EmailStatus.OPENED, NOW + 10, "ua", "ip", None)])
+    first.add_events([("email-0", EmailStatus.OPENED, NOW + 20, "ua", "ip", None)])
+    second.add_events([("email-1", EmailStatus.FAILED, NOW + 30, None, None, {"error": "quota"})])
+    second.flush()
+
+    for store in (first, second):
+        result = store.analytics_snapshot(now=NOW)
+        assert result.total_sent == 4
+        assert result.total_opened == 1
+        assert result.common_failures == {"quota": 1}
+        assert [e.event_type for e in store.get_events("email-0")] == [
+            EmailStatus.SENT, EmailStatus.OPENED, EmailStatus.OPENED
+        ]
+    first.close()
+    second.close()
+
+def test_concurrent_worker_processes(tmp_path):
+    path = str(tmp_path / "tracking.db")
+    open_store(path).close()
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=worker_opens, args=(path, w, 200)) for w in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    store = open_store(path)
+    result = store.analytics_snapshot(now=NOW)
+    store.close()
+
+    assert result.total_opened == 10
+    # 200 opens per worker, each worker in its own hour
+    assert len(result.peak_times) == 3
+
+@pytest.mark.asyncio
+async def test_service_backfills_existing_database(tmp_path):
+    path = str(tmp_path / "tracking.db")
+    plain = SQLiteTrackingStore(path)
+    plain.add_events([
+        ("a", EmailStatus.SENT, NOW, None, None, None),
+        ("a", EmailStatus.CLICKED, NOW + 5, None, None, None),
+    ])
+    plain.close()
+
+    service = EmailTrackingService(store=open_store(path))
+    service.start()
+    result = await service.get_analytics()
+    await service.stop()
+
+    assert result.total_sent == 1
+    assert result.total_clicked == 1
+    # Already built, so a restart does not count the events twice
+    reopened = open_store(path)
+    assert reopened.backfill_analytics() == 0
+    reopened.close()
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import email
+from app.models.email import EmailStatus
+from app.services.idempotency import IdempotencyCache
+from app.services.shared_tracking import SharedSQLiteTrackingStore
+from app.services.status_index import StatusIndex
+from app.services.tracking import EmailTrackingService
+from app.services.tracking_store import SQLiteTrackingStore, to_epoch
+
+NOW = to_epoch(datetime(2025, 3, 1, 12, 0, 0))
+
+EVENTS = [
+    ("t1", EmailStatus.PENDING, NOW, None),
+    ("t1", EmailStatus.SENT, NOW + 1, {"message_id": "m1"}),
+    ("t1", EmailStatus.CLICKED, NOW + 30, None),
+    ("t1", EmailStatus.OPENED, NOW + 20, None),
+    ("t1", EmailStatus.OPENED, NOW + 40, None),
+    ("t2", EmailStatus.PENDING, NOW, None),
+    ("t2", EmailStatus.FAILED, NOW + 2, {"error": "quota"}),
+]
+
+def test_summary_keeps_furthest_status_and_first_times():
+    index = StatusIndex()
+    for event in EVENTS:
+        index.record(*event)
+
+    summary = index.get_by_message_id("m1")
+    assert summary.tracking_id == "t1"
+    assert summary.status == EmailStatus.CLICKED
+    assert (summary.sent_at, summary.opened_at, summary.clicked_at) == (NOW + 1, NOW + 20, NOW + 30)
+    assert summary.last_event_at == NOW + 40
+    assert (summary.open_count, summary.click_count) == (2, 1)
+    failed = index.get("t2")
+    assert (failed.status, failed.error, failed.message_id) == (EmailStatus.FAILED, "quota", None)
+
+    index.discard("t1")
+    assert index.get_by_message_id("m1") is None
+    assert len(index) == 1
+
+def test_shared_store_status_matches_across_workers(tmp_path):
+    path = str(tmp_path / "tracking.db")
+    first = SharedSQLiteTrackingStore(path, batch_size=1000, flush_interval=60)
+    second = SharedSQLiteTrackingStore(path, batch_size=1000, flush_interval=60)
+    first.add_events([(tid, status, ts, None, None, md) for tid, status, ts, md in EVENTS[:3]])
+    second.add_events([(tid, status, ts, "ua", "ip", md) for tid, status, ts, md in EVENTS[3:]])
+    second.flush()
+
+    for store in (first, second):
+        summary = store.get_status_by_message_id("m1")
+        assert summary.status == EmailStatus.CLICKED
+        assert (summary.open_count, summary.opened_at) == (2, NOW + 20)
+        assert store.get_status("t2").error == "quota"
+    first.close()
+    second.close()
+
+@pytest.mark.asyncio
+async def test_index_is_rebuilt_from_stored_events():
+    store = SQLiteTrackingStore(":memory:", batch_size=1000, flush_interval=60)
+    store.add_events([(tid, status, ts, None, None, md) for tid, status, ts, md in EVENTS])
+    service = EmailTrackingService(store=store)
+    service.start()
+    try:
+        assert (await service.get_status_by_message_id("m1")).open_count == 2
+        assert (await service.get_status("t2")).status == EmailStatus.FAILED
+    finally:
+        await service.stop()
+
+@pytest.fixture
+def client(monkeypatch, fake_gmail):
+    monkeypatch.setattr(email, "idempotency_cache", IdempotencyCache(max_entries=100, ttl_seconds=60))
+    app = FastAPI()
+    app.include_router(email.router, prefix="/api/v1/email")
+    with TestClient(app) as client:
+        yield client
+
+def test_status_endpoint_reports_recorded_times(client):
+    sent = client.post("/api/v1/email/send", json={
+        "to": "user@example.com",
+        "subject": "Task assigned",
+        "task_id": "7",
+        "task_title": "Task 7",
+        "task_description": "Check my status",
+        "priority": 3,
+    }).json()
+
+    status = client.get(f"/api/v1/email/status/{sent['message_id']}")
+    assert status.status_code == 200
+    body = status.json()
+    assert body["status"] == "sent"
+    assert body["tracking_id"] == sent["tracking_id"]
+    assert body["message_id"] == sent["message_id"]
+    assert body["delivered_at"] is None
+
+    assert client.get(f"/api/v1/email/status/{sent['tracking_id']}").json()["status"] == "sent"
+    assert client.get("/api/v1/email/status/unknown").status_code == 404
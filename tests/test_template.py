@@ -0,0 +1,38 @@
+import os
+
+from app.core.config import settings
+from app.utils import template
+
+def test_production_mode_precompiles_to_bytecode_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TEMPLATE_MODE", "production")
+    monkeypatch.setattr(settings, "TEMPLATE_CACHE_DIR", str(tmp_path / "cache"))
+    env = template._create_environment()
+    monkeypatch.setattr(template, "env", env)
+
+    names = template.warmup_templates()
+
+    assert env.auto_reload is False
+    assert "email_templates/task_notification.html" in names
+    assert "base.html" in names
+    assert len(os.listdir(tmp_path / "cache")) == len(names)
+
+def test_development_mode_hot_reloads(monkeypatch):
+    monkeypatch.setattr(settings, "TEMPLATE_MODE", "development")
+
+    assert template._create_environment().auto_reload is True
+
+def test_render_records_per_template_timings():
+    html = template.render_template(
+        "email_templates/task_notification.html",
+        task_title="Write docs",
+        task_description="Describe the API",
+        priority=1,
+        tracking_id="abc",
+        tracking_url="http://localhost:8001",
+        task_url="#"
+    )
+
+    assert "Write docs" in html
+    stats = template.get_render_stats()["email_templates/task_notification.html"]
+    assert stats["count"] >= 1
+    assert stats["max_seconds"] > 0
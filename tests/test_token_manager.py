@@ -0,0 +1,91 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.core.token_manager import TokenManager
+
+class CountingRefresh:
+    """Stands in for Credentials.refresh, issuing a new one-hour token each call."""
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def install(self, manager: TokenManager) -> None:
+        credentials = manager.credentials
+
+        def refresh(request):
+            with self._lock:
+                self.calls += 1
+                call = self.calls
+            time.sleep(self.delay)
+            credentials.token = f"token-{call}"
+            credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+        credentials.refresh = refresh
+
+def test_concurrent_callers_share_one_refresh(tmp_path):
+    manager = TokenManager(str(tmp_path / "token.json"), refresh_margin=600)
+    refresh = CountingRefresh(delay=0.05)
+    refresh.install(manager)
+
+    threads = [threading.Thread(target=manager.ensure_fresh) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert refresh.calls == 1
+    assert manager.credentials.token == "token-1"
+    assert not manager.needs_refresh()
+
+def test_second_process_adopts_cached_token(tmp_path):
+    cache_path = str(tmp_path / "token.json")
+    first = TokenManager(cache_path, refresh_margin=600)
+    CountingRefresh().install(first)
+    first.ensure_fresh()
+
+    # A manager started after the refresh reads the token straight from the cache
+    second = TokenManager(cache_path, refresh_margin=600)
+    refresh = CountingRefresh()
+    refresh.install(second)
+    second.ensure_fresh()
+
+    assert refresh.calls == 0
+    assert second.credentials.token == first.credentials.token
+
+def test_stale_worker_adopts_token_refreshed_elsewhere(tmp_path):
+    cache_path = str(tmp_path / "token.json")
+    stale = TokenManager(cache_path, refresh_margin=600)
+    stale.credentials.token = "old"
+    stale.credentials.expiry = datetime.utcnow() + timedelta(seconds=60)
+    stale_refresh = CountingRefresh()
+    stale_refresh.install(stale)
+
+    other = TokenManager(cache_path, refresh_margin=600)
+    CountingRefresh().install(other)
+    other.ensure_fresh()
+
+    credentials = stale.credentials
+    stale.ensure_fresh()
+
+    assert stale_refresh.calls == 0
+    # Updated in place, so clients holding the object see the new token
+    assert stale.credentials is credentials
+    assert credentials.token == other.credentials.token
+
+def test_token_inside_margin_is_refreshed(tmp_path):
+    manager = TokenManager(str(tmp_path / "token.json"), refresh_margin=600)
+    refresh = CountingRefresh()
+    refresh.install(manager)
+    manager.ensure_fresh()
+    assert manager.seconds_until_refresh() > 2000
+
+    # Widen the margin past the token's one-hour lifetime, as if it were about to expire
+    manager.refresh_margin = 3700
+    assert manager.seconds_until_refresh() == 0
+    manager.ensure_fresh()
+
+    assert refresh.calls == 2
+    assert manager.credentials.token == "token-2"
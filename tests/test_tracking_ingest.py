@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import tracking
+from app.models.email import EmailStatus
+from app.services.ingest import TrackingIngestor
+from app.services.tracking import EmailTrackingService
+from app.services.tracking_store import InMemoryTrackingStore
+
+@pytest.fixture
+def ingestor(monkeypatch):
+    service = EmailTrackingService(store=InMemoryTrackingStore())
+    ingestor = TrackingIngestor(service, capacity=3, batch_size=2, flush_interval=60)
+    monkeypatch.setattr(tracking, "tracking_ingestor", ingestor)
+    monkeypatch.setattr(tracking, "tracking_service", service)
+    return ingestor
+
+@pytest.fixture
+def client(ingestor):
+    app = FastAPI()
+    app.include_router(tracking.router, prefix="/api/v1/tracking")
+    return TestClient(app)
+
+def test_pixel_is_buffered_and_uncacheable(client, ingestor):
+    response = client.get("/api/v1/tracking/track/abc/pixel", headers={"user-agent": "GoogleImageProxy"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/gif"
+    assert response.content == tracking.PIXEL_GIF
+    assert "no-store" in response.headers["cache-control"]
+    assert ingestor.pending == 1
+
+    events = client.get("/api/v1/tracking/events/abc").json()["events"]
+    assert [e["event_type"] for e in events] == ["opened"]
+    assert events[0]["user_agent"] == "GoogleImageProxy"
+    assert ingestor.pending == 0
+
+def test_click_redirects_and_records_url(client, ingestor):
+    response = client.get(
+        "/api/v1/tracking/track/abc/redirect",
+        params={"url": "https://example.com/task"},
+        follow_redirects=False
+    )
+
+    assert response.status_code == 307
+    assert response.headers["location"] == "https://example.com/task"
+    ingestor.flush()
+    records = ingestor.service._store.get_records("abc")
+    assert records[0].event_type == EmailStatus.CLICKED
+    assert records[0].metadata == {"clicked_url": "https://example.com/task"}
+
+def test_full_buffer_drops_instead_of_blocking(ingestor):
+    for _ in range(5):
+        ingestor.push("abc", EmailStatus.OPENED, None, None, None)
+
+    assert ingestor.pending == 3
+    assert ingestor.dropped == 2
+    assert ingestor.flush() == 3
+    assert ingestor.ingested == 3
+
+def test_failed_flush_keeps_events_for_the_next_one(ingestor, monkeypatch):
+    record_rows = ingestor.service.record_rows
+
+    def failing(rows):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ingestor.service, "record_rows", failing)
+    ingestor.push("abc", EmailStatus.OPENED, None, None, None)
+    ingestor.push("abc", EmailStatus.CLICKED, None, None, None)
+    assert ingestor.flush() == 0
+    assert (ingestor.pending, ingestor.ingested, ingestor.dropped) == (2, 0, 0)
+
+    monkeypatch.setattr(ingestor.service, "record_rows", record_rows)
+    assert ingestor.flush() == 2
+    records = ingestor.service._store.get_records("abc")
+    assert [r.event_type for r in records] == [EmailStatus.OPENED, EmailStatus.CLICKED]
+
+@pytest.mark.asyncio
+async def test_background_task_flushes_on_batch_size_and_stop(ingestor):
+    ingestor.start()
+    ingestor.push("abc", EmailStatus.OPENED, None, None, None)
+    ingestor.push("abc", EmailStatus.OPENED, None, None, None)  # reaches batch_size
+    for _ in range(20):
+        if ingestor.pending == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert ingestor.pending == 0
+
+    ingestor.push("abc", EmailStatus.CLICKED, None, None, None)
+    await ingestor.stop()
+    assert ingestor.pending == 0
+    assert len(ingestor.service._store.get_records("abc")) == 3
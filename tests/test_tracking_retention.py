@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.models.email import EmailStatus
+from app.services.shared_tracking import SharedSQLiteTrackingStore
+from app.services.tracking import EmailTrackingService
+from app.services.tracking_store import InMemoryTrackingStore, SQLiteTrackingStore, to_epoch
+
+NOW = to_epoch(datetime(2025, 3, 1, 12, 0, 0))
+DAY = 86400
+
+def make_store(kind: str, path: str):
+    if kind == "memory":
+        return InMemoryTrackingStore()
+    if kind == "sqlite":
+        return SQLiteTrackingStore(path, batch_size=1000, flush_interval=60)
+    return SharedSQLiteTrackingStore(path, batch_size=1000, flush_interval=60)
+
+@pytest.fixture(params=["memory", "sqlite", "shared"])
+def kind(request, monkeypatch):
+    monkeypatch.setattr(settings, "TRACKING_RETENTION_DAYS", 90.0)
+    monkeypatch.setattr(settings, "TRACKING_MAINTENANCE_INTERVAL", 0)
+    return request.param
+
+def proxy_opens(tracking_id: str, start: float, count: int):
+    """An image proxy fetching the pixel over and over."""
+    return [
+        (tracking_id, EmailStatus.OPENED, start + i, "GoogleImageProxy", "66.249.0.1", {"source": "pixel"})
+        for i in range(count)
+    ]
+
+@pytest.mark.asyncio
+async def test_repeated_opens_are_compacted_without_changing_counts(kind, tmp_path):
+    store = make_store(kind, str(tmp_path / "tracking.db"))
+    service = EmailTrackingService(store=store)
+    service.start()
+    service.record_rows([("a", EmailStatus.SENT, NOW, None, None, {"message_id": "m1"})])
+    service.record_rows(proxy_opens("a", NOW + 60, 50))
+    service.record_rows([("a", EmailStatus.OPENED, NOW + 90, "Mozilla", "10.0.0.1", {"source": "pixel"})])
+    service.record_rows([
+        ("a", EmailStatus.CLICKED, NOW + 120 + i, "Mozilla", "10.0.0.1", {"clicked_url": "https://x"})
+        for i in range(3)
+    ])
+    before = await service.get_analytics()
+
+    assert await service.run_maintenance(now=NOW) == (51, 0)
+    assert await service.run_maintenance(now=NOW) == (0, 0)
+
+    records = store.get_records("a")
+    assert len(records) == 4
+    proxy = next(r for r in records if r.user_agent == "GoogleImageProxy")
+    assert proxy.timestamp == NOW + 60
+    assert proxy.metadata == {
+        "source": "pixel", "count": "50",
+        "first_seen": "2025-03-01T12:01:00", "last_seen": "2025-03-01T12:01:49",
+    }
+
+    # A restart rebuilds the same analytics and status from the compacted events
+    await service.stop()
+    if kind != "memory":
+        store = make_store(kind, str(tmp_path / "tracking.db"))
+    restarted = EmailTrackingService(store=store)
+    restarted.start()
+    assert await restarted.get_analytics() == before
+    summary = await restarted.get_status_by_message_id("m1")
+    assert (summary.open_count, summary.click_count) == (51, 3)
+    assert summary.last_event_at == NOW + 122
+    await restarted.stop()
+
+@pytest.mark.asyncio
+async def test_old_emails_are_evicted_but_still_counted(kind, tmp_path):
+    store = make_store(kind, str(tmp_path / "tracking.db"))
+    service = EmailTrackingService(store=store)
+    service.start()
+    old, recent = NOW - 100 * DAY, NOW - DAY
+    service.record_rows([
+        ("old", EmailStatus.SENT, old, None, None, {"message_id": "m-old"}),
+        ("old", EmailStatus.OPENED, old + 5, "Mozilla", "10.0.0.1", None),
+        ("fresh", EmailStatus.SENT, recent, None, None, {"message_id": "m-fresh"}),
+        ("late", EmailStatus.SENT, old, None, None, None),
+        ("late", EmailStatus.OPENED, recent, "Mozilla", "10.0.0.2", None),
+    ])
+
+    assert await service.run_maintenance(now=NOW) == (0, 1)
+
+    assert store.get_records("old") == []
+    assert await service.get_status_by_message_id("m-old") is None
+    assert (await service.get_status_by_message_id("m-fresh")).status == EmailStatus.SENT
+    analytics = await service.get_analytics()
+    assert (analytics.total_sent, analytics.total_opened) == (3, 2)
+    await service.stop()
+
+    if kind != "memory":
+        restarted = EmailTrackingService(store=make_store(kind, str(tmp_path / "tracking.db")))
+        restarted.start()
+        analytics = await restarted.get_analytics()
+        assert (analytics.total_sent, analytics.total_opened) == (3, 2)
+        await restarted.stop()
+
+def test_eviction_releases_interned_values():
+    store = InMemoryTrackingStore()
+    store.add_events([
+        (f"old-{i}", EmailStatus.OPENED, NOW - 100 * DAY, f"agent-{i}", f"10.0.{i}.1", {"n": str(i)})
+        for i in range(100)
+    ])
+    store.add_events([("fresh", EmailStatus.OPENED, NOW, "Mozilla", "10.0.0.1", {"source": "pixel"})])
+
+    assert len(store.evict(NOW - 90 * DAY)) == 100
+
+    assert len(store._user_agents.values) == 2
+    assert store.get_records("fresh")[0].metadata == {"source": "pixel"}
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+import pytest
+
+from app.models.email import EmailEvent, EmailStatus
+from app.services.tracking import EmailTrackingService
+from app.services.tracking_store import InMemoryTrackingStore, SQLiteTrackingStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = InMemoryTrackingStore()
+    else:
+        store = SQLiteTrackingStore(str(tmp_path / "tracking.db"), batch_size=3, flush_interval=60)
+    yield store
+    store.close()
+
+def event(event_type: EmailStatus, offset: int = 0, **kwargs) -> EmailEvent:
+    return EmailEvent(
+        event_type=event_type,
+        timestamp=datetime(2025, 2, 20, 18, 0, 0) + timedelta(seconds=offset),
+        **kwargs
+    )
+
+@pytest.mark.asyncio
+async def test_events_round_trip(store):
+    service = EmailTrackingService(store=store)
+    tracking_id = await service.create_tracking_id()
+    await service.add_event(tracking_id, event(EmailStatus.PENDING, metadata={"task_id": "1"}))
+    await service.add_event(tracking_id, event(EmailStatus.SENT, 1, metadata={"message_id": "m1"}))
+    await service.add_event(
+        tracking_id,
+        event(EmailStatus.OPENED, 2, user_agent="Mozilla", ip_address="10.0.0.1")
+    )
+
+    events = await service.get_email_events(tracking_id)
+
+    assert [e.event_type for e in events] == [EmailStatus.PENDING, EmailStatus.SENT, EmailStatus.OPENED]
+    assert events[0].metadata == {"task_id": "1"}
+    assert events[2].timestamp == datetime(2025, 2, 20, 18, 0, 2)
+    assert events[2].user_agent == "Mozilla"
+    assert await service.get_email_events("unknown") == []
+
+@pytest.mark.asyncio
+async def test_analytics_counts_unique_emails(store):
+    service = EmailTrackingService(store=store)
+    for i in range(4):
+        tracking_id = await service.create_tracking_id()
+        await service.add_event(tracking_id, event(EmailStatus.SENT, i))
+        if i < 2:
+            await service.add_event(tracking_id, event(EmailStatus.OPENED, i))
+            await service.add_event(tracking_id, event(EmailStatus.OPENED, i + 10))
+        if i == 0:
+            await service.add_event(tracking_id, event(EmailStatus.CLICKED, i))
+
+    analytics = await service.get_analytics()
+
+    assert analytics.total_sent == 4
+    assert analytics.total_opened == 2
+    assert analytics.total_clicked == 1
+    assert analytics.average_open_rate == 0.5
+
+def test_sqlite_store_persists_across_reopen(tmp_path):
+    path = str(tmp_path / "tracking.db")
+    first = SQLiteTrackingStore(path, batch_size=100, flush_interval=60)
+    first.register("abc", datetime(2025, 2, 20))
+    first.add_events([("abc", EmailStatus.SENT, 1740000000.0, None, None, None)])
+    first.close()  # flushes the buffered batch
+
+    second = SQLiteTrackingStore(path)
+    assert [e.event_type for e in second.get_events("abc")] == [EmailStatus.SENT]
+    mode = second._connect().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+    second.close()
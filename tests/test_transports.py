@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.core.mime import MessageBuilder
+from app.core.transports import SmtpTransport
+from app.models.email import EmailRequest, EmailStatus
+from app.services.email import email_service
+from tests.fake_smtp import FakeSmtpServer
+
+def make_transport(server: FakeSmtpServer, **kwargs) -> SmtpTransport:
+    kwargs.setdefault("pool_size", 2)
+    return SmtpTransport(
+        server.host, server.port, username="relay", password="secret", use_tls=False,
+        message_builder=MessageBuilder("Task Manager", "tasks@example.com"), **kwargs
+    )
+
+@pytest.mark.asyncio
+async def test_pooled_connections_carry_many_messages():
+    with FakeSmtpServer(username="relay", password="secret") as server:
+        transport = make_transport(server)
+        ids = await asyncio.gather(*(
+            transport.send_message(f"user{i}@example.com", f"Task {i}", f"<p>Task {i}</p>") for i in range(20)
+        ))
+        ids.append(await transport.send_message("late@example.com", "Later", "<p>Reuses an idle connection</p>"))
+        transport.shutdown()
+
+    assert all(ids) and len(set(ids)) == 21
+    assert server.session_count == transport.connections_opened <= 2
+    assert transport.open_connections == 0
+    by_id = {m["message"]["Message-ID"].strip("<>"): m for m in server.sent}
+    assert set(by_id) == set(ids)
+    first = by_id[ids[0]]
+    assert (first["from"], first["to"], first["message"]["Subject"]) == ("tasks@example.com", ["user0@example.com"],
+                                                                         "Task 0")
+
+@pytest.mark.asyncio
+async def test_batch_survives_dropped_sessions_and_refused_recipients():
+    with FakeSmtpServer(username="relay", password="secret", drop_after=3) as server:
+        transport = make_transport(server, pool_size=1, max_messages=4)
+        emails = [(f"user{i}@example.com", f"Task {i}", "<p>Batch</p>") for i in range(10)]
+        emails[4] = ("rejected@example.com", "Nope", "<p>Refused</p>")
+        results = await transport.send_batch(emails)
+        transport.shutdown()
+
+    assert [error is None for _, error in results] == [i != 4 for i in range(10)]
+    assert "no such user" in str(results[4][1])
+    assert sorted(m["to"][0] for m in server.sent) == sorted(to for to, _, _ in emails if to != "rejected@example.com")
+    # The server drops a session after 3 messages; each drop costs a reconnect, not a failed send
+    assert max(sum(1 for m in server.sent if m["session"] == s) for s in range(1, server.session_count + 1)) == 3
+
+@pytest.mark.asyncio
+async def test_bad_credentials_fail_the_send():
+    with FakeSmtpServer(username="relay", password="other") as server:
+        transport = make_transport(server)
+        assert await transport.send_message("user@example.com", "Hi", "<p>Hi</p>") is None
+        transport.shutdown()
+    assert server.sent == []
+
+@pytest.mark.asyncio
+async def test_email_service_sends_through_smtp(monkeypatch):
+    with FakeSmtpServer(username="relay", password="secret") as server:
+        transport = make_transport(server)
+        monkeypatch.setattr("app.services.email.email_transport", transport)
+        response = await email_service.send_task_email(EmailRequest(
+            to="user@example.com",
+            subject="Task assigned",
+            task_id="42",
+            task_title="Ship it",
+            task_description="Over SMTP",
+            priority=2,
+        ))
+        transport.shutdown()
+
+    assert response.status == EmailStatus.SENT
+    [sent] = server.sent
+    assert sent["message"]["Message-ID"] == f"<{response.message_id}>"
+    summary = await email_service.get_email_status(response.message_id)
+    assert summary.tracking_id == response.tracking_id